@@ -1,20 +1,48 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import xml.etree.ElementTree as ET
+import json
+import math
+import os
 import re
+import time
 
-from data.xml_tienda import (
-    init_all, add_recurso, add_categoria, add_config,
-    add_cliente, add_instancia
-)
-from models.entidades import parse_float
+from data import codec_xml
+from data.agregados import DIMENSIONES
+from data.almacen import get_almacen
+from data.inventario import get_inventario
+from servicios.carga import CargaConfig, CargaConsumos, DATE_RX
+from servicios.costos import actualizar_costo_recurso, get_modelo_costos
+from servicios.facturacion import facturar
+from servicios import metricas, perfilado
+from models.entidades import parse_float, to_dict
 
 app = Flask(__name__)
 CORS(app)
+# sólo si PERFIL_MUESTREO o PERFIL_CABECERA lo habilitan (ver servicios/perfilado.py)
+perfilado.instalar(app)
 
-DATE_RX = re.compile(r'(\b\d{2}/\d{2}/\d{4}\b)')
-NIT_RX = re.compile(r'^\d+-([0-9]|K)$', re.IGNORECASE)
+# Almacén configurado con ALMACEN=xml|sqlite; al arrancar se reconstruyen
+# sus índices (xml) o se asegura el esquema (sqlite)
+get_almacen().preparar()
+
+# listados: tamaño de página por defecto y máximo, y entidades por bloque leído del almacén
+LISTA_LIMITE = int(os.environ.get("LISTA_LIMITE", "100"))
+LISTA_LIMITE_MAX = int(os.environ.get("LISTA_LIMITE_MAX", "10000"))
+LISTA_BLOQUE = int(os.environ.get("LISTA_BLOQUE", "500"))
+
+@app.before_request
+def _inicio_solicitud():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _fin_solicitud(response):
+    t0 = g.pop("t0", None)
+    if t0 is not None:
+        # la plantilla de la ruta (no la URL) para no crear una serie por id
+        ruta = request.url_rule.rule if request.url_rule is not None else "(sin ruta)"
+        metricas.HTTP_DURACION.observar(time.perf_counter() - t0, ruta, request.method, str(response.status_code))
+    return response
 
 @app.route("/api/health", methods=["GET"])
 def health():
@@ -22,7 +50,8 @@ def health():
 
 @app.route("/api/init", methods=["POST"])
 def api_init():
-    res = init_all()
+    res = get_almacen().init_all()
+    get_modelo_costos().limpiar()
     return jsonify(res), 200
 
 @app.route("/api/config", methods=["POST"])
@@ -55,133 +84,210 @@ def api_config():
         return jsonify({"error": "Falta archivo XML (file)"}), 400
 
     xml_file = request.files["file"]
+
+    # El documento se lee en streaming y se arma en memoria; cada XML destino
+    # se escribe una sola vez al cerrar la transacción. Si el XML está mal
+    # formado a mitad de camino, la transacción se revierte completa.
+    carga = CargaConfig()
     try:
-        tree = ET.parse(xml_file)
-    except Exception as e:
+        with get_almacen().transaccion():
+            carga.procesar(xml_file.stream)
+            t0 = time.perf_counter()
+        escritura = time.perf_counter() - t0  # cierre de la transacción: XML a disco
+    except codec_xml.ParseError as e:
         return jsonify({"error": f"XML inválido: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"No se pudo guardar la configuración: {e}"}), 500
+
+    for fase, seg in carga.fases.items():
+        metricas.CONFIG_FASE.observar(seg, fase)
+    metricas.CONFIG_FASE.observar(escritura, "escritura")
+    return jsonify(carga.resultado()), 200
+
+@app.route("/api/consumo", methods=["POST"])
+def api_consumo():
+    """
+    Recibe un lote XML de consumos:
+    <consumos>
+      <consumo instancia_id="" recurso_id="" horas="1.75" fecha_hora="dd/mm/yyyy hh:mm"/>
+    </consumos>
+    """
+    if "file" not in request.files:
+        return jsonify({"error": "Falta archivo XML (file)"}), 400
+
+    carga = CargaConsumos()
+    try:
+        carga.procesar(request.files["file"].stream)
+    except codec_xml.ParseError as e:
+        # lo ya anexado antes del error queda registrado
+        res = carga.resultado()
+        res["error"] = f"XML inválido: {e}"
+        return jsonify(res), 400
 
-    root = tree.getroot()
-
-    # Mapas por nombre -> id para poder referenciar por nombre en el XML de entrada
-    nombre_recurso_id = {}
-    nombre_categoria_id = {}
-    nombre_config_id = {}
-
-    cnt = {"recursos": 0, "categorias": 0, "configuraciones": 0, "clientes": 0, "instancias": 0}
-    errores = []
-
-    # --------- Recursos ---------
-    for r in root.findall("./recursos/recurso"):
-        try:
-            nombre = (r.get("nombre") or "").strip()
-            tipo = (r.get("tipo") or "").strip()
-            costo = parse_float(r.get("costo_hora") or "0")
-            if tipo not in ("Hardware", "Software"):
-                raise ValueError("tipo debe ser Hardware o Software")
-            rid = add_recurso(nombre, tipo, costo)
-            nombre_recurso_id[nombre] = rid
-            cnt["recursos"] += 1
-        except Exception as ex:
-            errores.append(f"recurso '{r.get('nombre')}': {ex}")
-
-<<<<<<< HEAD
+    res = carga.resultado()
+    if carga.invalidos:
+        # los consumos válidos del lote quedan registrados; los inválidos no llegan al log
+        res["error"] = f"{carga.invalidos} consumo(s) con horas o fecha_hora inválidas"
+        return jsonify(res), 400
+    return jsonify(res), 200
+
+@app.route("/api/facturar", methods=["POST"])
+def api_facturar():
+    """
+    Ejecuta el ciclo de facturación de un rango de fechas.
+    Body JSON (o formulario): {"fecha_inicio": "dd/mm/yyyy", "fecha_fin": "dd/mm/yyyy"}
+    """
+    body = request.get_json(silent=True) or request.form
+    fecha_inicio = (body.get("fecha_inicio") or "").strip()
+    fecha_fin = (body.get("fecha_fin") or "").strip()
+    if not (DATE_RX.fullmatch(fecha_inicio) and DATE_RX.fullmatch(fecha_fin)):
+        return jsonify({"error": "fecha_inicio y fecha_fin requeridas (dd/mm/yyyy)"}), 400
+    try:
+        res = facturar(fecha_inicio, fecha_fin)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(res), 200
+
+@app.route("/api/<any(clientes, instancias, consumos, facturas):coleccion>", methods=["GET"])
+def api_listado(coleccion):
+    """
+    Listado por páginas, en orden de id. Query: ?despues=<cursor>&limite=N
+    Responde {"items": [...], "siguiente": cursor | null}; el cursor es el
+    último id entregado y se pasa como `despues` para pedir la página que sigue.
+    La respuesta se genera y envía por bloques (sin armarla entera en memoria);
+    el primer bloque se lee antes del 200, así un error se responde como tal y
+    no como un JSON cortado.
+    """
+    try:
+        despues = int(request.args.get("despues") or 0)
+        limite = int(request.args.get("limite") or LISTA_LIMITE)
+    except ValueError:
+        return jsonify({"error": "despues y limite deben ser enteros"}), 400
+    if limite < 1 or limite > LISTA_LIMITE_MAX:
+        return jsonify({"error": f"limite debe estar entre 1 y {LISTA_LIMITE_MAX}"}), 400
+    al = get_almacen()
+    primero = al.pagina(coleccion, despues, min(LISTA_BLOQUE, limite))
+
+    def generar():
+        yield f'{{"coleccion": "{coleccion}", "items": ['
+        entregados, ultimo, sep = 0, despues, ""
+        while entregados < limite:
+            pedido = min(LISTA_BLOQUE, limite - entregados)
+            bloque = primero if entregados == 0 else al.pagina(coleccion, ultimo, pedido)
+            if bloque:
+                yield sep + ",".join(json.dumps(to_dict(x), ensure_ascii=False) for x in bloque)
+                sep = ","
+                entregados += len(bloque)
+                ultimo = bloque[-1].id
+            if len(bloque) < pedido:
+                break
+        # con la página llena puede haber más (la siguiente quizá venga vacía)
+        yield f'], "siguiente": {json.dumps(ultimo if entregados == limite else None)}}}'
+
+    return Response(generar(), mimetype="application/json")
+
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    return Response(metricas.exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/api/reportes/<dimension>", methods=["GET"])
+def api_reporte(dimension):
+    """
+    Uso y ventas por categoria | configuracion | recurso | mes, leídos de los
+    agregados (no recorre consumos ni facturas).
+    Query: ?desde=yyyy-mm&hasta=yyyy-mm (opcionales, inclusive)
+    """
+    if dimension not in DIMENSIONES:
+        return jsonify({"error": f"dimensión inválida (usar {', '.join(DIMENSIONES)})"}), 404
+    desde = request.args.get("desde") or None
+    hasta = request.args.get("hasta") or None
+    if any(m and not re.fullmatch(r"\d{4}-\d{2}", m) for m in (desde, hasta)):
+        return jsonify({"error": "desde y hasta deben ser yyyy-mm"}), 400
+    filas = get_almacen().reporte(dimension, desde, hasta)
+    return jsonify({"dimension": dimension, "desde": desde, "hasta": hasta, "filas": filas}), 200
+
+@app.route("/api/reportes/<dimension>/<int:id_>", methods=["GET"])
+def api_reporte_detalle(dimension, id_):
+    """Serie mensual de una categoría, configuración o recurso."""
+    if dimension not in DIMENSIONES or dimension == "mes":
+        return jsonify({"error": "dimensión inválida (usar categoria, configuracion o recurso)"}), 404
+    return jsonify({"dimension": dimension, "id": id_, "meses": get_almacen().reporte_detalle(dimension, id_)}), 200
+
+# --------- Costos (modelo memoizado, ver servicios/costos.py) ---------
+@app.route("/api/costos", methods=["GET"])
+def api_costos():
+    """Aciertos, fallos, desalojos e invalidaciones del modelo de costos."""
+    return jsonify(get_modelo_costos().estadisticas()), 200
+
+@app.route("/api/costos/<any(configuraciones, instancias):tipo>/<int:id_>", methods=["GET"])
+def api_costo(tipo, id_):
+    """Costo por hora de una configuración (precio_base + recursos) o de una instancia."""
+    modelo = get_modelo_costos()
+    costo = modelo.costo_configuracion(id_) if tipo == "configuraciones" else modelo.costo_instancia(id_)
+    if costo is None:
+        return jsonify({"error": "Configuración no encontrada" if tipo == "configuraciones"
+                        else "Instancia no encontrada"}), 404
+    return jsonify({"tipo": tipo, "id": id_, "costo_hora": round(costo, 4)}), 200
+
+@app.route("/api/recursos/<int:id_>", methods=["PUT"])
+def api_recurso_costo(id_):
+    """Cambia el costo_hora de un recurso. Body JSON: {"costo_hora": n}"""
+    body = request.get_json(silent=True) or {}
+    costo = parse_float(body.get("costo_hora"), None)
+    if costo is None or not math.isfinite(costo) or costo < 0:
+        return jsonify({"error": "costo_hora requerido (número >= 0)"}), 400
+    if not actualizar_costo_recurso(id_, costo):
+        return jsonify({"error": "Recurso no encontrado"}), 404
+    return jsonify({"id": id_, "costo_hora": costo}), 200
+
+# --------- Productos (inventario.json) ---------
+@app.route("/api/productos", methods=["GET"])
+def api_productos():
+    return jsonify(get_inventario().listar()), 200
+
+@app.route("/api/productos", methods=["POST"])
+def api_producto_crear():
+    try:
+        p = get_inventario().crear(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(p), 201
+
+@app.route("/api/productos/<id_>", methods=["GET"])
+def api_producto(id_):
+    p = get_inventario().obtener(id_)
+    if p is None:
+        return jsonify({"error": "Producto no encontrado"}), 404
+    return jsonify(p), 200
+
+@app.route("/api/productos/<id_>", methods=["PUT"])
+def api_producto_actualizar(id_):
+    try:
+        p = get_inventario().actualizar(id_, request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if p is None:
+        return jsonify({"error": "Producto no encontrado"}), 404
+    return jsonify(p), 200
+
+# ruta original, la usan clientes existentes: acepta el cuerpo sin
+# Content-Type JSON y responde con sus textos de error de siempre
 @app.put("/productos/<id>")
 def actualizar(id):
-    body = request.get_json(force=True)
-    data = cargar()
-    i = next((i for i, p in enumerate(data) if p["id"] == id), None)
-    if i is None:
+    try:
+        p = get_inventario().actualizar(id, request.get_json(force=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if p is None:
         return jsonify({"error": "No encontrado"}), 404
-    # VALIDACION DE VALORES NEGATIVOS ANTES DE GUARDAR
-    if "precio" in body and float(body["precio"]) < 0:
-        return jsonify({"error": "El precio no puede ser negativo"}), 400
-    if "cantidad" in body and int(body["cantidad"]) < 0:
-        return jsonify({"error": "La cantidad no puede ser negativa"}), 400
-    # actualiza los campos
-    for k in [
-        "nombre",
-        "categoria",
-        "descripcion",
-        "precio",
-        "cantidad",
-        "fecha_vencimiento",
-    ]:
-        if k in body:
-            data[i][k] = body[k]
-    guardar(data)
-    return jsonify(data[i])
-=======
-    # --------- Categorías ---------
-    for c in root.findall("./categorias/categoria"):
-        try:
-            nombre = (c.get("nombre") or "").strip()
-            descripcion = (c.get("descripcion") or "").strip()
-            cid = add_categoria(nombre, descripcion)
-            nombre_categoria_id[nombre] = cid
-            cnt["categorias"] += 1
-        except Exception as ex:
-            errores.append(f"categoria '{c.get('nombre')}': {ex}")
->>>>>>> 795109fd4728d28b4643b24318f2ab706c16595f
-
-    # --------- Configuraciones ---------
-    for cfg in root.findall("./configuraciones/configuracion"):
-        try:
-            nombre = (cfg.get("nombre") or "").strip()
-            cat_nombre = (cfg.get("categoria") or "").strip()
-            precio_base = parse_float(cfg.get("precio_base") or "0")
-            if cat_nombre not in nombre_categoria_id:
-                raise ValueError(f"categoría '{cat_nombre}' no registrada")
-            recursos_elems = cfg.findall("./recursos/recurso")
-            recursos_ids = []
-            for rr in recursos_elems:
-                rn = (rr.get("nombre") or "").strip()
-                if rn not in nombre_recurso_id:
-                    raise ValueError(f"recurso '{rn}' no registrado")
-                recursos_ids.append(nombre_recurso_id[rn])
-            cfg_id = add_config(nombre, nombre_categoria_id[cat_nombre], precio_base, recursos_ids)
-            nombre_config_id[nombre] = cfg_id
-            cnt["configuraciones"] += 1
-        except Exception as ex:
-            errores.append(f"configuracion '{cfg.get('nombre')}': {ex}")
-
-    # --------- Clientes + Instancias ---------
-    for cl in root.findall("./clientes/cliente"):
-        try:
-            nombre = (cl.get("nombre") or "").strip()
-            nit = (cl.get("nit") or "").strip()
-            if not NIT_RX.match(nit):
-                raise ValueError("NIT no cumple el formato general 0000000-0/K")
-            cliente_id = add_cliente(nombre, nit)
-            cnt["clientes"] += 1
-
-            for ins in cl.findall("./instancias/instancia"):
-                try:
-                    cfg_nombre = (ins.get("configuracion") or "").strip()
-                    estado = (ins.get("estado") or "Vigente").strip()
-                    fecha_inicio = (ins.get("fecha_inicio") or "").strip()
-                    fecha_fin = (ins.get("fecha_fin") or "").strip() or None
-
-                    if estado not in ("Vigente", "Cancelada"):
-                        raise ValueError("estado inválido (Vigente|Cancelada)")
-
-                    if not DATE_RX.search(fecha_inicio):
-                        raise ValueError("fecha_inicio no válida (dd/mm/yyyy)")
-
-                    if estado == "Cancelada" and not (fecha_fin and DATE_RX.search(fecha_fin)):
-                        raise ValueError("fecha_fin requerida si estado=Cancelada")
-
-                    if cfg_nombre not in nombre_config_id:
-                        raise ValueError(f"configuracion '{cfg_nombre}' no registrada")
-
-                    add_instancia(cliente_id, nombre_config_id[cfg_nombre], estado, fecha_inicio, fecha_fin)
-                    cnt["instancias"] += 1
-                except Exception as exi:
-                    errores.append(f"instancia cliente '{nombre}': {exi}")
-
-        except Exception as exc:
-            errores.append(f"cliente '{cl.get('nombre')}': {exc}")
-
-    return jsonify({"cargados": cnt, "errores": errores}), 200
+    return jsonify(p)
+
+@app.route("/api/productos/<id_>", methods=["DELETE"])
+def api_producto_eliminar(id_):
+    if not get_inventario().eliminar(id_):
+        return jsonify({"error": "Producto no encontrado"}), 404
+    return jsonify({"eliminado": id_}), 200
 
 if __name__ == "__main__":
     # python app.py
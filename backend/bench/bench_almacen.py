@@ -0,0 +1,85 @@
+# backend/bench/bench_almacen.py
+"""
+Compara los almacenes xml y sqlite con la misma carga: alta de clientes e
+instancias, consumos por lotes, búsquedas puntuales y consulta por rango.
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_almacen [consumos ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from data import xml_tienda
+from data.almacen import AlmacenXML
+from data.almacen_sqlite import AlmacenSQLite
+
+LOTE = 5000
+
+
+def _fecha(k: int) -> str:
+    return f"{k % 28 + 1:02d}/{k % 12 + 1:02d}/2024 {k % 24:02d}:00"
+
+
+def _cronometrar(res: dict, nombre: str, n: int, fn):
+    t0 = time.perf_counter()
+    valor = fn()
+    seg = time.perf_counter() - t0
+    res[nombre] = {"n": n, "segundos": round(seg, 4), "us_por_op": round(seg / max(n, 1) * 1e6, 2)}
+    return valor
+
+
+def medir(almacen, n_consumos: int, clientes: int = 200, instancias_por_cliente: int = 5,
+          recursos: int = 20) -> dict:
+    res = {"bench": "almacen", "almacen": almacen.nombre, "consumos": n_consumos}
+    almacen.init_all()
+
+    def catalogo():
+        rids = [almacen.add_recurso(f"R{k}", "Hardware", 1.0 + k) for k in range(recursos)]
+        cat = almacen.add_categoria("General")
+        return rids, almacen.add_config("Base", cat, 10.0, rids[:5])
+
+    rids, cfg = _cronometrar(res, "catalogo", recursos + 2, catalogo)
+
+    def altas():
+        iids = []
+        with almacen.transaccion():
+            for c in range(clientes):
+                cid = almacen.add_cliente(f"Cliente {c}", f"{100000 + c}-{c % 10}")
+                for _ in range(instancias_por_cliente):
+                    iids.append(almacen.add_instancia(cid, cfg, "Vigente", "01/01/2024"))
+        return iids
+
+    iids = _cronometrar(res, "clientes_instancias", clientes * (instancias_por_cliente + 1), altas)
+
+    def consumos():
+        for a in range(0, n_consumos, LOTE):
+            almacen.add_consumos([(iids[k % len(iids)], rids[k % len(rids)], 1.5, _fecha(k))
+                                  for k in range(a, min(a + LOTE, n_consumos))])
+
+    _cronometrar(res, "add_consumos", n_consumos, consumos)
+
+    busquedas = 2000
+    _cronometrar(res, "cliente_por_nit", busquedas,
+                 lambda: [almacen.cliente_por_nit(f"{100000 + k % clientes}-{k % clientes % 10}")
+                          for k in range(busquedas)])
+    _cronometrar(res, "existe_instancia", busquedas,
+                 lambda: [almacen.existe_instancia(iids[k % len(iids)]) for k in range(busquedas)])
+    _cronometrar(res, "consumos_de_instancia", 200,
+                 lambda: [almacen.consumos_de_instancia(iids[k], "01/03/2024", "30/04/2024") for k in range(200)])
+    cols = _cronometrar(res, "consumos_rango", 1,
+                        lambda: almacen.consumos_rango("01/03/2024", "31/05/2024"))
+    res["consumos_rango"]["filas"] = int(len(cols["id"]))
+    return res
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [10_000, 100_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = tmp
+        for n in tamanos:
+            sqlite = AlmacenSQLite(os.path.join(tmp, "bench.sqlite3"))
+            for almacen in (AlmacenXML(), sqlite):
+                print(json.dumps(medir(almacen, n)))
+            sqlite.cerrar()
@@ -0,0 +1,110 @@
+# backend/bench/bench_cache.py
+"""
+Arranque con y sin la caché binaria de los XML (data/cache_xml.py).
+  arranque  cargar_indices() + secuencias en un proceso nuevo, sobre datos de
+            distinto tamaño: sin caché (XML_CACHE=0, parse de todo), con caché
+            válida y con la caché vencida (el XML cambió: se vuelve a leer).
+            Incluye la carga de cada colección (origen y ms) y el tiempo de la
+            primera consulta por índice (cliente_por_nit).
+Cada medición corre en un proceso aparte. Trabaja en un directorio temporal
+(no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_cache [clientes ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CLIENTES = (1_000, 10_000, 50_000)
+INSTANCIAS_POR_CLIENTE = 2
+CONSUMOS_POR_INSTANCIA = 2
+
+
+def _hijo(carpeta: str, cache: bool, *args) -> dict:
+    env = dict(os.environ, XML_CACHE="1" if cache else "0")
+    r = subprocess.run([sys.executable, "-m", "bench.bench_cache", "_hijo", carpeta, *args], env=env,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       capture_output=True, text=True, check=True)
+    return json.loads(r.stdout.strip().splitlines()[-1]) if r.stdout.strip() else {}
+
+
+# --------- En el proceso hijo ---------
+def _datos(n: int) -> dict:
+    from data import xml_tienda
+    xml_tienda.init_all()
+    with xml_tienda.transaccion():
+        r = xml_tienda.add_recurso("cpu", "Hardware", 2.5)
+        cat = xml_tienda.add_categoria("web", "d")
+        cfg = xml_tienda.add_config("cfg", cat, 10, [r])
+        for c in range(n):
+            cl = xml_tienda.add_cliente(f"Cliente {c}", f"N{c}-1")
+            for _ in range(INSTANCIAS_POR_CLIENTE):
+                xml_tienda.add_instancia(cl, cfg, "Vigente", "01/01/2024")
+    instancias = n * INSTANCIAS_POR_CLIENTE
+    xml_tienda.add_consumos([(1 + i % instancias, r, 1.5, f"{1 + i % 28:02d}/01/2024 10:00")
+                             for i in range(instancias * CONSUMOS_POR_INSTANCIA)])
+    xml_tienda.compactar_consumos()
+    xml_tienda.cargar_indices()
+    return {}  # al salir quedan los XML y sus cachés
+
+
+def _arranque(n: int) -> dict:
+    from data import xml_tienda
+    t0 = time.perf_counter()
+    cargas = xml_tienda.cargar_indices()
+    xml_tienda.get_secuencias()
+    arranque = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ok = xml_tienda.cliente_por_nit(f"N{n - 1}-1") == n
+    consulta = time.perf_counter() - t0
+    cargas = xml_tienda.reporte_carga()  # con lo que leyó la consulta
+    res = {"arranque_s": round(arranque, 4), "primera_consulta_s": round(consulta, 4), "ok": ok,
+           "colecciones": {k: {"origen": v["origen"], "ms": v["ms"], "parse_ms": v["parse_ms"]}
+                           for k, v in cargas.items()}}
+    print(json.dumps(res), flush=True)
+    os._exit(0)  # sin reescribir cachés: cada corrida mide el mismo estado
+
+
+def _vencer(_: int) -> dict:
+    """Reescribe los XML con el mismo contenido: cambia el mtime y la caché deja de valer."""
+    from data import xml_tienda
+    for key in xml_tienda.FILES:
+        path = os.path.join(xml_tienda.DATA_DIR, xml_tienda.FILES[key])
+        if os.path.exists(path):
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    return {}
+
+
+def hijo(carpeta: str, paso: str, arg: str = "0") -> None:
+    from data import xml_tienda
+    xml_tienda.DATA_DIR = carpeta
+    res = {"datos": _datos, "arranque": _arranque, "vencer": _vencer}[paso](int(arg))
+    print(json.dumps(res), flush=True)
+
+
+# --------- Mediciones ---------
+def arranque(n: int) -> list:
+    res = []
+    with tempfile.TemporaryDirectory() as tmp:
+        _hijo(tmp, True, "datos", str(n))
+        mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if f.endswith(".xml")) / 1e6
+        cache_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if f.endswith(".cache")) / 1e6
+        for modo, cache in (("sin_cache", False), ("cache", True), ("cache_vencida", True)):
+            if modo == "cache_vencida":
+                _hijo(tmp, True, "vencer")
+            r = dict(bench="cache.arranque", clientes=n, xml_mb=round(mb, 2), cache_mb=round(cache_mb, 2),
+                     modo=modo, **_hijo(tmp, cache, "arranque", str(n)))
+            print(json.dumps(r), flush=True)
+            res.append(r)
+    return res
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["_hijo"]:
+        hijo(*sys.argv[2:])
+    else:
+        for n in [int(x) for x in sys.argv[1:]] or CLIENTES:
+            arranque(n)
@@ -0,0 +1,75 @@
+# backend/bench/bench_carga.py
+"""
+Validación de la sección <clientes> de /api/config: en el proceso vs en el
+pool de procesos. Mide sólo validar_clientes (lo que se paraleliza) y la
+carga completa con CargaConfig, y verifica que ambos modos dan lo mismo.
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_carga [clientes ...]
+"""
+import io
+import json
+import sys
+import tempfile
+import time
+
+from data import xml_tienda
+from servicios import carga
+
+
+def documento(n: int, instancias: int = 3) -> bytes:
+    partes = [b'<config><recursos><recurso nombre="cpu" tipo="Hardware" costo_hora="2.5"/></recursos>'
+              b'<categorias><categoria nombre="web" descripcion="d"/></categorias><configuraciones>']
+    partes += [b'<configuracion nombre="cfg%d" categoria="web" precio_base="10">'
+               b'<recursos><recurso nombre="cpu"/></recursos></configuracion>' % k for k in range(20)]
+    partes.append(b'</configuraciones><clientes>')
+    for c in range(n):
+        nit = b"%d-%d" % (100000 + c, c % 10) if c % 50 else b"malo"
+        partes.append(b'<cliente nombre="Cliente %d" nit="%s"><instancias>' % (c, nit))
+        for k in range(instancias):
+            estado = b"Cancelada" if (c + k) % 7 == 0 else b"Vigente"
+            partes.append(b'<instancia configuracion="cfg%d" estado="%s" fecha_inicio="01/01/2024"/>'
+                          % ((c + k) % 21, estado))
+        partes.append(b'</instancias></cliente>')
+    partes.append(b'</clientes></config>')
+    return b"".join(partes)
+
+
+def _carga(doc: bytes, paralela_min: int):
+    carga.CARGA_PARALELA_MIN = paralela_min
+    xml_tienda.init_all()
+    c = carga.CargaConfig()
+    t0 = time.perf_counter()
+    with xml_tienda.transaccion():
+        c.procesar(io.BytesIO(doc))
+    return time.perf_counter() - t0, c.resultado()
+
+
+def medir(n: int) -> dict:
+    doc = documento(n)
+    cfg = {f"cfg{k}": k + 1 for k in range(20)}
+    clientes = [carga.datos_cliente(e) for e in xml_tienda.ET.fromstring(doc).find("clientes")]
+
+    t0 = time.perf_counter()
+    serial = carga.validar_clientes(clientes, cfg)
+    t_serial = time.perf_counter() - t0
+    pool = carga._get_pool()
+    pool.submit(int).result()  # arranque de los procesos fuera de la medición
+    t0 = time.perf_counter()
+    b = carga.CARGA_BLOQUE
+    futuros = [pool.submit(carga.validar_clientes, clientes[i:i + b], cfg) for i in range(0, n, b)]
+    paralelo = [r for f in futuros for r in f.result()]
+    t_pool = time.perf_counter() - t0
+
+    t_carga_serial, r1 = _carga(doc, n + 1)
+    t_carga_pool, r2 = _carga(doc, 1)
+    return {"bench": "carga.clientes", "clientes": n, "procesos": carga.CARGA_PROCESOS,
+            "validar_serial_s": round(t_serial, 4), "validar_pool_s": round(t_pool, 4),
+            "carga_serial_s": round(t_carga_serial, 4), "carga_pool_s": round(t_carga_pool, 4),
+            "iguales": serial == paralelo and r1 == r2}
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = tmp
+        for n in [int(x) for x in sys.argv[1:]] or [10_000, 50_000]:
+            print(json.dumps(medir(n)))
@@ -0,0 +1,96 @@
+# backend/bench/bench_codec.py
+"""
+Parse y serialización de XML con cada codec de data/codec_xml.py (lxml si
+está instalado, y ElementTree), sobre los archivos que deja /api/config +
+/api/consumo con datos de bench/generador.py y sobre los documentos de
+entrada. Imprime MB/s por archivo y codec, y verifica que los dos codecs
+escriben los mismos bytes.
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_codec [escala ...]   (p.ej. 1k 10k)
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench import generador
+from bench.generador import Escala
+from data import codec_xml, xml_tienda
+
+REPETICIONES = 3
+
+
+def _codecs() -> list:
+    codecs = [codec_xml.CodecStdlib()]
+    try:
+        codecs.append(codec_xml.CodecLxml())
+    except ImportError:
+        pass
+    return codecs
+
+
+def _mejor(fn) -> tuple:
+    """Mejor tiempo de REPETICIONES corridas y el resultado de la última."""
+    mejor = None
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        res = fn()
+        t = time.perf_counter() - t0
+        mejor = t if mejor is None else min(mejor, t)
+    return mejor, res
+
+
+def _archivos(escala: str, tmp: str) -> list:
+    """Carga la escala por la API y devuelve los XML resultantes (y los de entrada)."""
+    import app as app_mod  # después de elegir la carpeta
+    c = app_mod.app.test_client()
+    e = Escala(escala)
+    entrada = []
+    for nombre, bloques in ((f"config-{escala}.xml", generador.documento_config(e)),
+                            (f"consumos-{escala}.xml", generador.lote_consumos(e))):
+        path = os.path.join(tmp, nombre)
+        generador.a_archivo(bloques, path)
+        entrada.append(path)
+    c.post("/api/init")
+    for path, ruta in zip(entrada, ("/api/config", "/api/consumo")):
+        with open(path, "rb") as f:
+            r = c.post(ruta, data={"file": (f, os.path.basename(path))}, content_type="multipart/form-data")
+        if r.status_code != 200:
+            raise RuntimeError(f"{ruta}: {r.status_code} {r.get_data(as_text=True)[:200]}")
+    datos = sorted(os.path.join(xml_tienda.DATA_DIR, f) for f in os.listdir(xml_tienda.DATA_DIR)
+                   if f.endswith(".xml"))
+    return entrada + datos
+
+
+def medir(escala: str, tmp: str) -> list:
+    res = []
+    for path in _archivos(escala, tmp):
+        with open(path, "rb") as f:
+            original = f.read()
+        mb = len(original) / 1e6
+        salidas = {}
+        for cod in _codecs():
+            t_parse, tree = _mejor(lambda: cod.parse(io.BytesIO(original)))
+            t_ser, salida = _mejor(lambda: cod.tostring(tree))
+            salidas[cod.nombre] = salida
+            res.append({"bench": "codec", "escala": escala, "archivo": os.path.basename(path),
+                        "codec": cod.nombre, "mb": round(mb, 3),
+                        "parse_s": round(t_parse, 4), "parse_mb_s": round(mb / t_parse, 1) if t_parse else None,
+                        "serializar_s": round(t_ser, 4), "serializar_mb_s": round(mb / t_ser, 1) if t_ser else None})
+        iguales = len(set(salidas.values())) == 1
+        for r in res[-len(salidas):]:
+            r["iguales"] = iguales
+            # los archivos de datos los escribió el codec activo: se reescriben igual
+            r["sin_cambios"] = salidas[r["codec"]] == original if path.startswith(xml_tienda.DATA_DIR) else None
+            print(json.dumps(r, ensure_ascii=False), flush=True)
+    return res
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = os.path.join(tmp, "data")
+        os.makedirs(xml_tienda.DATA_DIR)
+        for escala in sys.argv[1:] or ["1k", "10k"]:
+            medir(escala, tmp)
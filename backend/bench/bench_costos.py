@@ -0,0 +1,87 @@
+# backend/bench/bench_costos.py
+"""
+Modelo de costos memoizado (servicios/costos.py) contra calcular el costo
+de la instancia en cada fila de consumo (configuración + costo de cada
+recurso desde el almacén). Por escala y capacidad del LRU: filas/s, tasa de
+aciertos y desalojos; y lo que cuesta invalidar al cambiar el precio de un
+recurso (entradas afectadas y tiempo).
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_costos [escala ...]   (p.ej. 1k 10k)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench import generador
+from bench.generador import Escala
+from data import xml_tienda
+
+FILAS = 200_000
+CAPACIDADES = (100, 1_000, 100_000)
+
+
+def _cargar(escala: str, tmp: str) -> None:
+    import app as app_mod  # después de elegir la carpeta
+    c = app_mod.app.test_client()
+    path = os.path.join(tmp, f"config-{escala}.xml")
+    generador.a_archivo(generador.documento_config(Escala(escala)), path)
+    c.post("/api/init")
+    with open(path, "rb") as f:
+        r = c.post("/api/config", data={"file": (f, os.path.basename(path))}, content_type="multipart/form-data")
+    if r.status_code != 200:
+        raise RuntimeError(f"/api/config: {r.status_code} {r.get_data(as_text=True)[:200]}")
+
+
+def _directo(almacen, iid: int) -> float:
+    cfg = almacen.configuracion(almacen.configuracion_de_instancia(iid))
+    return cfg.precio_base + sum(almacen.costo_recurso(r) or 0.0 for r in cfg.recursos)
+
+
+def medir(escala: str, tmp: str) -> list:
+    from data.almacen import get_almacen
+    from servicios.costos import ModeloCostos
+    _cargar(escala, tmp)
+    almacen = get_almacen()
+    filas = [iid for iid, _, _, _ in generador.registros_consumo(escala, FILAS)]
+    existentes = set(almacen.cliente_de_instancias())
+    filas = [i for i in filas if i in existentes]
+    res = []
+
+    t0 = time.perf_counter()
+    esperado = [_directo(almacen, i) for i in filas]
+    seg = time.perf_counter() - t0
+    res.append({"bench": "costos.filas", "escala": escala, "modo": "directo", "filas": len(filas),
+                "segundos": round(seg, 4), "filas_por_seg": round(len(filas) / seg)})
+
+    for cap in CAPACIDADES:
+        modelo = ModeloCostos(almacen, cap)
+        t0 = time.perf_counter()
+        obtenido = [modelo.costo_instancia(i) for i in filas]
+        seg = time.perf_counter() - t0
+        est = modelo.estadisticas()
+        res.append({"bench": "costos.filas", "escala": escala, "modo": "memoizado", "capacidad": cap,
+                    "filas": len(filas), "segundos": round(seg, 4), "filas_por_seg": round(len(filas) / seg),
+                    "tasa_aciertos": est["tasa_aciertos"], "desalojos": est["desalojos"],
+                    "iguales": obtenido == esperado})
+
+    # cambio de precio: sólo se olvida lo que depende del recurso
+    e = Escala(escala)
+    for rid in (1, e.recursos // 2 or 1):
+        t0 = time.perf_counter()
+        n = modelo.invalidar_recurso(rid)
+        seg = time.perf_counter() - t0
+        res.append({"bench": "costos.invalidar", "escala": escala, "recurso": rid, "invalidadas": n,
+                    "entradas_antes": modelo.estadisticas()["entradas"] + n, "ms": round(seg * 1000, 3)})
+    for r in res:
+        print(json.dumps(r), flush=True)
+    return res
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = os.path.join(tmp, "data")
+        os.makedirs(xml_tienda.DATA_DIR)
+        for escala in sys.argv[1:] or ["1k", "10k"]:
+            medir(escala, tmp)
@@ -0,0 +1,127 @@
+# backend/bench/bench_diario.py
+"""
+Política diario (WAL) contra política commit, y arranque tras un corte.
+  escritura  add_cliente concurrente con cada política (ops/s)
+  arranque   con datos base de distinto tamaño y R operaciones recientes sólo
+             en el diario (el proceso se corta sin instantánea): tiempo de
+             recuperar (leer el diario y poner las secuencias al día) y de la
+             primera lectura de la colección (parse del XML + reaplicar).
+Cada medición corre en un proceso aparte (la política se elige al arrancar).
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_diario [hilos ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASES = (1_000, 10_000, 100_000)
+RECIENTES = (100, 1_000, 10_000)
+OPERACIONES = 400
+
+
+def _hijo(politica: str, carpeta: str, *args) -> dict:
+    env = dict(os.environ, XML_FLUSH=politica, XML_FLUSH_MS="600000", XML_DIARIO_MAX="1000000")
+    r = subprocess.run([sys.executable, "-m", "bench.bench_diario", "_hijo", carpeta, *args], env=env,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       capture_output=True, text=True, check=True)
+    return json.loads(r.stdout.strip().splitlines()[-1]) if r.stdout.strip() else {}
+
+
+# --------- En el proceso hijo ---------
+def _escritura(hilos: int) -> dict:
+    from data import xml_tienda
+    xml_tienda.init_all()
+    por_hilo = OPERACIONES // hilos
+
+    def trabajo(h: int):
+        for k in range(por_hilo):
+            xml_tienda.add_cliente(f"Cliente {h}-{k}", f"{h:03d}{k:05d}-1")
+
+    ths = [threading.Thread(target=trabajo, args=(h,)) for h in range(hilos)]
+    t0 = time.perf_counter()
+    for t in ths:
+        t.start()
+    for t in ths:
+        t.join()
+    seg = time.perf_counter() - t0
+    return {"operaciones": por_hilo * hilos, "segundos": round(seg, 4), "ops_por_seg": round(por_hilo * hilos / seg, 1)}
+
+
+def _base(n: int) -> dict:
+    from data import xml_tienda
+    xml_tienda.init_all()
+    with xml_tienda.transaccion():
+        for c in range(n):
+            xml_tienda.add_cliente(f"Cliente {c}", f"B{c}-1")
+    return {}  # al salir se escribe la instantánea
+
+
+def _recientes(r: int) -> None:
+    from data import xml_tienda
+    for c in range(r):
+        xml_tienda.add_cliente(f"Reciente {c}", f"R{c}-1")
+    os._exit(0)  # corte: lo reciente queda sólo en el diario
+
+
+def _arranque() -> dict:
+    from data import codec_xml, xml_tienda
+    t0 = time.perf_counter()
+    sec = xml_tienda.get_secuencias()
+    recuperar = time.perf_counter() - t0
+    pendientes = len(xml_tienda.get_repo().diario.registros)
+    siguiente = sec.actual("cliente") + 1
+    t0 = time.perf_counter()
+    xml_tienda.get_repo().coleccion("clientes_instancias")
+    primera = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    codec_xml.parse(os.path.join(xml_tienda.DATA_DIR, "clientes_instancias.xml"))
+    parse = time.perf_counter() - t0
+    res = {"pendientes": pendientes, "recuperar_s": round(recuperar, 4), "primera_lectura_s": round(primera, 4),
+           "parse_xml_s": round(parse, 4), "reaplicar_s": round(max(primera - parse, 0.0), 4),
+           "siguiente_id": siguiente}
+    print(json.dumps(res), flush=True)
+    os._exit(0)  # sin instantánea: cada corrida mide el mismo estado
+
+
+def hijo(carpeta: str, paso: str, arg: str = "0") -> None:
+    from data import xml_tienda
+    xml_tienda.DATA_DIR = carpeta
+    res = {"escritura": _escritura, "base": _base, "recientes": _recientes,
+           "arranque": lambda _: _arranque()}[paso](int(arg))
+    print(json.dumps(res), flush=True)
+
+
+# --------- Mediciones ---------
+def escritura(hilos: int) -> list:
+    res = []
+    for politica in ("commit", "diario"):
+        with tempfile.TemporaryDirectory() as tmp:
+            r = dict(bench="diario.escritura", politica=politica, hilos=hilos, **_hijo(politica, tmp, "escritura", str(hilos)))
+        print(json.dumps(r), flush=True)
+        res.append(r)
+    return res
+
+
+def arranque(base: int, recientes: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        _hijo("diario", tmp, "base", str(base))
+        _hijo("diario", tmp, "recientes", str(recientes))
+        r = dict(bench="diario.arranque", base=base, recientes=recientes, **_hijo("diario", tmp, "arranque"))
+        r["ok"] = r["pendientes"] == recientes and r["siguiente_id"] == base + recientes + 1
+    print(json.dumps(r), flush=True)
+    return r
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["_hijo"]:
+        hijo(*sys.argv[2:])
+    else:
+        for h in [int(x) for x in sys.argv[1:]] or [1, 8]:
+            escritura(h)
+        for b in BASES:
+            for r in RECIENTES:
+                arranque(b, r)
@@ -0,0 +1,48 @@
+# backend/bench/bench_escritura.py
+"""
+Inserciones concurrentes con política commit: N hilos llamando add_cliente.
+Con group commit las operaciones por segundo deberían subir con los hilos
+(varios commits se resuelven en una sola escritura + fsync).
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):  python -m bench.bench_escritura [hilos ...]
+"""
+import json
+import sys
+import tempfile
+import threading
+import time
+
+from data import xml_tienda
+
+OPERACIONES = 400
+
+
+def medir(hilos: int, operaciones: int = OPERACIONES) -> dict:
+    xml_tienda.init_all()
+    escritor = xml_tienda.get_repo()._escritor
+    pasadas0, pedidos0 = escritor.pasadas, escritor.pedidos
+    por_hilo = operaciones // hilos
+
+    def trabajo(h: int):
+        for k in range(por_hilo):
+            xml_tienda.add_cliente(f"Cliente {h}-{k}", f"{h:03d}{k:05d}-1")
+
+    ths = [threading.Thread(target=trabajo, args=(h,)) for h in range(hilos)]
+    t0 = time.perf_counter()
+    for t in ths:
+        t.start()
+    for t in ths:
+        t.join()
+    seg = time.perf_counter() - t0
+    n = por_hilo * hilos
+    pasadas = escritor.pasadas - pasadas0
+    return {"bench": "escritura.group_commit", "hilos": hilos, "operaciones": n,
+            "segundos": round(seg, 4), "ops_por_seg": round(n / seg, 1),
+            "escrituras": pasadas, "commits_por_escritura": round((escritor.pedidos - pedidos0) / max(pasadas, 1), 2)}
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = tmp
+        for h in [int(x) for x in sys.argv[1:]] or [1, 2, 4, 8, 16]:
+            print(json.dumps(medir(h)))
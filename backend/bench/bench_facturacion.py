@@ -0,0 +1,40 @@
+# backend/bench/bench_facturacion.py
+"""
+Benchmark del motor de facturación (agrupación vectorizada).
+Uso (desde backend/):  python -m bench.bench_facturacion [filas ...]
+Imprime una línea JSON por tamaño; ns/fila debería mantenerse casi constante.
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from servicios.facturacion import agrupar
+
+
+def datos(n: int, clientes: int = 1000, instancias_por_cliente: int = 5, recursos: int = 50, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    instancia = rng.integers(1, clientes * instancias_por_cliente + 1, n)
+    cliente = (instancia - 1) // instancias_por_cliente + 1
+    recurso = rng.integers(1, recursos + 1, n)
+    horas = rng.random(n) * 2
+    costo = np.r_[np.nan, rng.random(recursos) * 10]
+    return cliente, instancia, recurso, horas, costo
+
+
+def medir(n: int, repeticiones: int = 3) -> dict:
+    cols = datos(n)
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        grupos = agrupar(*cols)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return {"bench": "facturacion.agrupar", "filas": n, "grupos": int(len(grupos[0])),
+            "segundos": round(mejor, 6), "ns_por_fila": round(mejor / n * 1e9, 1)}
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for n in tamanos:
+        print(json.dumps(medir(n)))
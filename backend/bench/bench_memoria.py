@@ -0,0 +1,69 @@
+# backend/bench/bench_memoria.py
+"""
+Memoria de N consumos / líneas de factura según la representación:
+dataclass con __dict__ (como estaban antes), dataclass con slots y columnas
+numpy (como las guardan las particiones de consumos, data/particiones.py).
+Uso (desde backend/):  python -m bench.bench_memoria [n ...]
+"""
+import json
+import sys
+import tracemalloc
+from dataclasses import make_dataclass
+
+import numpy as np
+
+from data.particiones import COLUMNAS
+from models.entidades import Consumo, LineaFactura, ts_fecha_hora
+
+# Equivalentes sin slots de las dataclasses originales
+ConsumoDict = make_dataclass("ConsumoDict", ["id", "instancia_id", "recurso_id", "horas", "fecha_hora", "facturado"])
+LineaDict = make_dataclass("LineaDict", ["id", "factura_id", "instancia_id", "recurso_id", "horas", "monto"])
+
+CONSUMO_COLUMNAS = COLUMNAS + (("facturado", "i1"),)
+LINEA_COLUMNAS = (("id", "<i8"), ("factura_id", "<i8"), ("instancia_id", "<i8"),
+                  ("recurso_id", "<i8"), ("horas", "<f8"), ("monto", "<f8"))
+
+
+def _fecha(k: int) -> str:
+    return f"{k % 28 + 1:02d}/{k % 12 + 1:02d}/2024 {k % 24:02d}:00"
+
+
+def _columnas(tipos, filas) -> dict:
+    """Un arreglo tipado por campo; fecha_hora ya como timestamp."""
+    return {n: np.asarray([f[k] for f in filas], dtype=t) for k, (n, t) in enumerate(tipos)}
+
+
+def _medir(construir) -> int:
+    tracemalloc.start()
+    obj = construir()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return actual
+
+
+def medir(n: int) -> list:
+    consumo = lambda cls, k: cls(k, k % 5000, k % 50, 1.5, _fecha(k), False)
+    linea = lambda cls, k: cls(k, k // 10, k % 5000, k % 50, 1.5, 3.75)
+    casos = {
+        ("consumo", "dataclass"): lambda: [consumo(ConsumoDict, k) for k in range(n)],
+        ("consumo", "slots"): lambda: [consumo(Consumo, k) for k in range(n)],
+        ("consumo", "columnar"): lambda: _columnas(
+            CONSUMO_COLUMNAS, [(k, k % 5000, k % 50, 1.5, ts_fecha_hora(_fecha(k)), 0) for k in range(n)]),
+        ("linea", "dataclass"): lambda: [linea(LineaDict, k) for k in range(n)],
+        ("linea", "slots"): lambda: [linea(LineaFactura, k) for k in range(n)],
+        ("linea", "columnar"): lambda: _columnas(
+            LINEA_COLUMNAS, [(k, k // 10, k % 5000, k % 50, 1.5, 3.75) for k in range(n)]),
+    }
+    res = []
+    for (entidad, repr_), construir in casos.items():
+        b = _medir(construir)
+        res.append({"bench": "memoria", "entidad": entidad, "repr": repr_, "n": n,
+                    "bytes": b, "bytes_por_fila": round(b / n, 1)})
+    return res
+
+
+if __name__ == "__main__":
+    for n in [int(x) for x in sys.argv[1:]] or [10_000, 100_000]:
+        for r in medir(n):
+            print(json.dumps(r))
@@ -0,0 +1,200 @@
+# backend/bench/bench_suite.py
+"""
+Suite de benchmarks del backend sobre datos sintéticos (bench/generador.py):
+cada add_* del almacén, /api/config y /api/consumo completos por el test
+client de Flask, búsquedas y reportes. Imprime una línea JSON por medición
+con la versión del código, para comparar corridas entre versiones.
+Trabaja en un directorio temporal (no toca backend/data).
+Uso (desde backend/):
+    python -m bench.bench_suite [--escalas 1k,10k] [--almacen xml|sqlite]
+                                [--salida res.jsonl] [--comparar base.jsonl]
+  --salida    agrega los resultados a un archivo JSONL
+  --comparar  agrega a cada resultado el cambio (%) contra una corrida anterior
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from bench import generador
+from bench.generador import Escala
+from data import almacen, xml_tienda
+from data.agregados import DIMENSIONES
+
+LOTE_CONSUMOS = 1000
+MUESTRA_BUSQUEDAS = 1000
+OPS_COMMIT = 50  # add_cliente con un commit (fsync) por llamada
+REPETICIONES_REPORTE = 20
+PAGINA = 100  # entidades por página en los listados
+
+
+def _version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or "?"
+    except (OSError, subprocess.SubprocessError):
+        return "?"
+
+
+class Suite:
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.base = {"version": _version(), "python": platform.python_version(), "almacen": tipo,
+                     "fecha": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self.resultados: List[Dict] = []
+
+    def registrar(self, bench: str, escala: str, n: int, segundos: float, **extra) -> Dict:
+        r = dict(self.base, bench=bench, escala=escala, n=n, segundos=round(segundos, 6),
+                 ops_por_seg=round(n / segundos, 1) if segundos > 0 else None, **extra)
+        self.resultados.append(r)
+        print(json.dumps(r, ensure_ascii=False), flush=True)
+        return r
+
+    def medir(self, bench: str, escala: str, n: int, fn: Callable[[], object], **extra) -> object:
+        t0 = time.perf_counter()
+        res = fn()
+        self.registrar(bench, escala, n, time.perf_counter() - t0, **extra)
+        return res
+
+    # --------- add_* ---------
+    def inserciones(self, escala: str) -> None:
+        e = Escala(escala)
+        al = almacen.get_almacen()
+        al.init_all()
+        rng = random.Random(e.semilla)
+        with al.transaccion():
+            recs = self.medir("add_recurso", escala, e.recursos, lambda: [
+                al.add_recurso(f"rec{r}", generador.TIPOS_RECURSO[r % 2], rng.randint(10, 5000) / 100)
+                for r in range(e.recursos)])
+            cats = self.medir("add_categoria", escala, e.categorias, lambda: [
+                al.add_categoria(f"cat{c}", f"Categoría {c}") for c in range(e.categorias)])
+            cfg = self.medir("add_config", escala, e.configuraciones, lambda: [
+                al.add_config(e.nombre_config(k), cats[k % e.categorias], rng.randint(100, 100000) / 100,
+                              [recs[r] for r in e.recursos_de_config(k)])
+                for k in range(e.configuraciones)])
+            clientes = self.medir("add_cliente", escala, e.clientes, lambda: [
+                al.add_cliente(f"Cliente {c}", e.nit(c)) for c in range(e.clientes)])
+            self.medir("add_instancia", escala, e.instancias, lambda: [
+                al.add_instancia(cid, cfg[rng.randrange(e.configuraciones)], "Vigente", "01/01/2024")
+                for cid in clientes for _ in range(e.instancias_por_cliente)])
+        registros = list(generador.registros_consumo(e))
+
+        def consumos():
+            for i in range(0, len(registros), LOTE_CONSUMOS):
+                al.add_consumos(registros[i:i + LOTE_CONSUMOS])
+        self.medir("add_consumos", escala, len(registros), consumos, lote=LOTE_CONSUMOS)
+
+        n = min(OPS_COMMIT, e.clientes)
+        self.medir("add_cliente.commit", escala, n, lambda: [
+            al.add_cliente(f"Extra {c}", f"X{c}-{escala}") for c in range(n)])
+
+    # --------- Requests completos ---------
+    def requests(self, escala: str, tmp: str) -> None:
+        import app as app_mod  # después de elegir almacén y carpeta
+        c = app_mod.app.test_client()
+        e = Escala(escala)
+        doc = os.path.join(tmp, f"config-{escala}.xml")
+        tam = generador.a_archivo(generador.documento_config(e), doc)
+        cons = os.path.join(tmp, f"consumos-{escala}.xml")
+        tam_c = generador.a_archivo(generador.lote_consumos(e), cons)
+
+        def subir(ruta: str, path: str):
+            with open(path, "rb") as f:
+                r = c.post(ruta, data={"file": (f, os.path.basename(path))}, content_type="multipart/form-data")
+            if r.status_code != 200:
+                raise RuntimeError(f"{ruta}: {r.status_code} {r.get_data(as_text=True)[:200]}")
+            return r.get_json()
+
+        c.post("/api/init")
+        for bench, ruta, path, bytes_ in (("api_config", "/api/config", doc, tam),
+                                          ("api_consumo", "/api/consumo", cons, tam_c)):
+            t0 = time.perf_counter()
+            res = subir(ruta, path)
+            self.registrar(bench, escala, e.clientes, time.perf_counter() - t0, bytes=bytes_,
+                           cargados=res["cargados"], errores=len(res["errores"]))
+
+    # --------- Búsquedas y reportes ---------
+    def consultas(self, escala: str) -> None:
+        e = Escala(escala)
+        al = almacen.get_almacen()
+        rng = random.Random(e.semilla + 2)
+        nits = [e.nit(rng.randrange(e.clientes)) for _ in range(MUESTRA_BUSQUEDAS)]
+        cfgs = [e.nombre_config(rng.randrange(e.configuraciones)) for _ in range(MUESTRA_BUSQUEDAS)]
+        ids = [rng.randint(1, e.instancias) for _ in range(MUESTRA_BUSQUEDAS)]
+        m = MUESTRA_BUSQUEDAS
+        clientes = self.medir("cliente_por_nit", escala, m, lambda: [al.cliente_por_nit(x) for x in nits])
+        self.medir("configuracion_por_nombre", escala, m, lambda: [al.configuracion_por_nombre(x) for x in cfgs])
+        self.medir("existe_instancia", escala, m, lambda: [al.existe_instancia(x) for x in ids])
+        self.medir("instancias_de_cliente", escala, m, lambda: [al.instancias_de_cliente(x or 0) for x in clientes])
+        self.medir("consumos_de_instancia", escala, m, lambda: [
+            al.consumos_de_instancia(x, "01/01/2024 00:00", "31/01/2024 23:59") for x in ids])
+        for dim in DIMENSIONES:
+            self.medir(f"reporte.{dim}", escala, REPETICIONES_REPORTE, lambda: [
+                al.reporte(dim) for _ in range(REPETICIONES_REPORTE)])
+        # páginas con cursores al azar: el costo no debería crecer con la colección
+        # (la primera página que llega al log de consumos lo compacta; queda fuera)
+        al.pagina("consumos", e.clientes, 1)
+        for col, total in (("clientes", e.clientes), ("instancias", e.instancias), ("consumos", e.clientes)):
+            cursores = [rng.randrange(total) for _ in range(REPETICIONES_REPORTE)]
+            self.medir(f"pagina.{col}", escala, REPETICIONES_REPORTE, lambda: [
+                al.pagina(col, x, PAGINA) for x in cursores], pagina=PAGINA)
+
+    def correr(self, escala: str, tmp: str) -> None:
+        self.inserciones(escala)
+        self.requests(escala, tmp)
+        self.consultas(escala)
+
+
+def comparar(resultados: List[Dict], path: str) -> None:
+    """Agrega base_ops_por_seg y cambio_pct según una corrida anterior (JSONL)."""
+    base = {}
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                r = json.loads(linea)
+                base[(r["bench"], r["escala"], r["almacen"], r["n"])] = r  # la última corrida gana
+    for r in resultados:
+        b = base.get((r["bench"], r["escala"], r["almacen"], r["n"]))
+        if b and b.get("ops_por_seg") and r.get("ops_por_seg"):
+            r["base_version"] = b.get("version")
+            r["base_ops_por_seg"] = b["ops_por_seg"]
+            r["cambio_pct"] = round((r["ops_por_seg"] / b["ops_por_seg"] - 1) * 100, 1)
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--escalas", default="1k,10k")
+    p.add_argument("--almacen", choices=("xml", "sqlite"), default="xml")
+    p.add_argument("--salida")
+    p.add_argument("--comparar")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_tienda.DATA_DIR = tmp
+        almacen.ALMACEN = args.almacen
+        almacen.SQLITE_PATH = os.path.join(tmp, "bench.sqlite3")
+        suite = Suite(args.almacen)
+        for escala in args.escalas.split(","):
+            suite.correr(escala.strip(), tmp)
+
+    if args.comparar:
+        comparar(suite.resultados, args.comparar)
+        for r in suite.resultados:
+            if "cambio_pct" in r:
+                print(json.dumps({k: r[k] for k in ("bench", "escala", "ops_por_seg", "base_ops_por_seg",
+                                                    "cambio_pct")}), file=sys.stderr)
+    if args.salida:
+        with open(args.salida, "a", encoding="utf-8") as f:
+            for r in suite.resultados:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
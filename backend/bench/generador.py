@@ -0,0 +1,118 @@
+# backend/bench/generador.py
+"""
+Datos sintéticos deterministas para benchmarks y pruebas de escala: el
+mismo tamaño y semilla producen siempre los mismos bytes.
+    documento_config(escala)  -> XML para /api/config (en bloques, sin armarlo entero)
+    lote_consumos(escala)     -> XML para /api/consumo
+    registros_consumo(escala) -> tuplas para add_consumos
+El tamaño es la cantidad de clientes; "1k", "10k", "100k" y "1M" también valen.
+"""
+import random
+from typing import Iterator, List, Tuple
+
+ESCALAS = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+SEMILLA = 20240101
+
+TIPOS_RECURSO = ("Hardware", "Software")
+ESTADOS = ("Vigente", "Vigente", "Vigente", "Cancelada")
+
+
+def tamano(escala) -> int:
+    return ESCALAS[escala] if escala in ESCALAS else int(escala)
+
+
+class Escala:
+    """Cantidad de cada entidad para n clientes."""
+
+    def __init__(self, escala, semilla: int = SEMILLA):
+        self.clientes = tamano(escala)
+        self.recursos = max(5, min(500, self.clientes // 100))
+        self.categorias = max(3, min(50, self.clientes // 1000))
+        self.configuraciones = max(5, min(2000, self.clientes // 50))
+        self.instancias_por_cliente = 2
+        self.instancias = self.clientes * self.instancias_por_cliente
+        self.semilla = semilla
+
+    def nit(self, c: int) -> str:
+        return f"{1000000 + c}-{c % 10}"
+
+    def nombre_config(self, k: int) -> str:
+        return f"cfg{k}"
+
+    def recursos_de_config(self, k: int) -> List[int]:
+        """Índices (0..recursos-1) de los recursos de la configuración k."""
+        rng = random.Random(self.semilla * 31 + k)
+        return sorted(rng.sample(range(self.recursos), min(self.recursos, 1 + k % 4)))
+
+
+def documento_config(escala, semilla: int = SEMILLA, bloque: int = 1000) -> Iterator[bytes]:
+    """Documento de /api/config en bloques de `bloque` clientes."""
+    e = escala if isinstance(escala, Escala) else Escala(escala, semilla)
+    rng = random.Random(e.semilla)
+    partes = ["<config><recursos>"]
+    for r in range(e.recursos):
+        partes.append(f'<recurso nombre="rec{r}" tipo="{TIPOS_RECURSO[r % 2]}" '
+                      f'costo_hora="{rng.randint(10, 5000) / 100}"/>')
+    partes.append("</recursos><categorias>")
+    for c in range(e.categorias):
+        partes.append(f'<categoria nombre="cat{c}" descripcion="Categoría {c}"/>')
+    partes.append("</categorias><configuraciones>")
+    for k in range(e.configuraciones):
+        recs = "".join(f'<recurso nombre="rec{r}"/>' for r in e.recursos_de_config(k))
+        partes.append(f'<configuracion nombre="{e.nombre_config(k)}" categoria="cat{k % e.categorias}" '
+                      f'precio_base="{rng.randint(100, 100000) / 100}"><recursos>{recs}</recursos></configuracion>')
+    partes.append("</configuraciones><clientes>")
+    yield "".join(partes).encode("utf-8")
+
+    partes = []
+    for c in range(e.clientes):
+        ins = []
+        for _ in range(e.instancias_por_cliente):
+            estado = ESTADOS[rng.randrange(len(ESTADOS))]
+            fin = ' fecha_fin="31/12/2024"' if estado == "Cancelada" else ""
+            ins.append(f'<instancia configuracion="{e.nombre_config(rng.randrange(e.configuraciones))}" '
+                       f'estado="{estado}" fecha_inicio="{1 + c % 28:02d}/{1 + c % 12:02d}/2024"{fin}/>')
+        ins = "".join(ins)
+        partes.append(f'<cliente nombre="Cliente {c}" nit="{e.nit(c)}"><instancias>{ins}</instancias></cliente>')
+        if len(partes) >= bloque:
+            yield "".join(partes).encode("utf-8")
+            partes = []
+    partes.append("</clientes></config>")
+    yield "".join(partes).encode("utf-8")
+
+
+def registros_consumo(escala, n: int = None, semilla: int = SEMILLA,
+                      mes: int = 1, anio: int = 2024) -> Iterator[Tuple[int, int, float, str]]:
+    """
+    (instancia_id, recurso_id, horas, fecha_hora) suponiendo ids 1..N en el
+    orden del documento (base recién inicializada). Por defecto un consumo
+    por cliente.
+    """
+    e = escala if isinstance(escala, Escala) else Escala(escala, semilla)
+    rng = random.Random(e.semilla + 1)
+    for _ in range(e.clientes if n is None else n):
+        yield (rng.randint(1, e.instancias), rng.randint(1, e.recursos), rng.randint(1, 800) / 100,
+               f"{rng.randint(1, 28):02d}/{mes:02d}/{anio} {rng.randint(0, 23):02d}:{rng.randrange(0, 60, 15):02d}")
+
+
+def lote_consumos(escala, n: int = None, semilla: int = SEMILLA, bloque: int = 5000, **kw) -> Iterator[bytes]:
+    """Documento de /api/consumo con los mismos registros que registros_consumo()."""
+    yield b"<consumos>"
+    partes = []
+    for iid, rid, horas, fecha in registros_consumo(escala, n, semilla, **kw):
+        partes.append(f'<consumo instancia_id="{iid}" recurso_id="{rid}" horas="{horas}" fecha_hora="{fecha}"/>')
+        if len(partes) >= bloque:
+            yield "".join(partes).encode("utf-8")
+            partes = []
+    partes.append("</consumos>")
+    yield "".join(partes).encode("utf-8")
+
+
+def a_archivo(bloques: Iterator[bytes], path: str) -> int:
+    """Vuelca un documento a disco; devuelve los bytes escritos."""
+    total = 0
+    with open(path, "wb") as f:
+        for b in bloques:
+            f.write(b)
+            total += len(b)
+    return total
@@ -0,0 +1,277 @@
+# backend/data/agregados.py
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from data import codec_xml
+from data.archivos import escribir_atomico, firma
+from models.entidades import Factura
+
+# Totales materializados para los reportes de uso y ventas. Cada celda es
+# (dimensión, id, mes 'yyyy-mm') -> métricas; en la dimensión "mes" el id es 0.
+#   consumos, horas, costo      -> de cada consumo, por el mes de su fecha_hora
+#                                  (costo = horas * costo_hora del recurso)
+#   facturado_horas, facturado  -> de cada línea facturada, por el mes de la factura
+DIMENSIONES = ("categoria", "configuracion", "recurso", "mes")
+METRICAS = ("consumos", "horas", "costo", "facturado_horas", "facturado")
+
+Clave = Tuple[str, int, str]
+Deltas = Dict[Clave, List[float]]
+
+
+def mes_de(fecha: str) -> str:
+    """'dd/mm/yyyy[ hh:mm]' -> 'yyyy-mm'."""
+    s = fecha.strip()
+    return f"{s[6:10]}-{s[3:5]}"
+
+
+def _sumar(destino: Deltas, claves: Iterable[Clave], valores: List[float]) -> None:
+    for clave in claves:
+        acc = destino.get(clave)
+        if acc is None:
+            destino[clave] = list(valores)
+        else:
+            for k, v in enumerate(valores):
+                acc[k] += v
+
+
+def _memo(f: Callable[[int], int]) -> Callable[[int], int]:
+    cache: Dict[int, int] = {}
+
+    def g(x: int) -> int:
+        if x not in cache:
+            cache[x] = f(x)
+        return cache[x]
+    return g
+
+
+def _claves(cfg: int, cat: int, rid: int, mes: str) -> Tuple[Clave, ...]:
+    return ("categoria", cat, mes), ("configuracion", cfg, mes), ("recurso", rid, mes), ("mes", 0, mes)
+
+
+def deltas_consumos(registros: Iterable[Tuple[int, int, float, str]],
+                    config_de: Callable[[int], int], categoria_de: Callable[[int], int],
+                    costo_de: Callable[[int], float]) -> Deltas:
+    """
+    Aporte de consumos (instancia_id, recurso_id, horas, fecha_hora). Los
+    callables resuelven instancia -> configuración -> categoría y el costo por
+    hora del recurso; se consultan una vez por id.
+    """
+    config_de, categoria_de, costo_de = _memo(config_de), _memo(categoria_de), _memo(costo_de)
+    deltas: Deltas = {}
+    for iid, rid, horas, fecha in registros:
+        cfg = config_de(iid)
+        _sumar(deltas, _claves(cfg, categoria_de(cfg), rid, mes_de(fecha)),
+               [1, horas, horas * costo_de(rid), 0.0, 0.0])
+    return deltas
+
+
+def deltas_facturas(facturas: Iterable[Factura], config_de: Callable[[int], int],
+                    categoria_de: Callable[[int], int]) -> Deltas:
+    """Aporte de las líneas de facturas ya emitidas."""
+    config_de, categoria_de = _memo(config_de), _memo(categoria_de)
+    deltas: Deltas = {}
+    for f in facturas:
+        mes = mes_de(f.fecha)
+        for ln in f.lineas:
+            cfg = config_de(ln.instancia_id)
+            _sumar(deltas, _claves(cfg, categoria_de(cfg), ln.recurso_id, mes),
+                   [0, 0.0, 0.0, ln.horas, ln.monto])
+    return deltas
+
+
+def deltas_costo(registros: Iterable[Tuple[int, int, float, str]], recurso_id: int, diferencia: float,
+                 config_de: Callable[[int], int], categoria_de: Callable[[int], int]) -> Deltas:
+    """Corrección de `costo` de los consumos de un recurso cuyo costo_hora cambió en `diferencia`."""
+    config_de, categoria_de = _memo(config_de), _memo(categoria_de)
+    deltas: Deltas = {}
+    for iid, rid, horas, fecha in registros:
+        if rid == recurso_id:
+            cfg = config_de(iid)
+            _sumar(deltas, _claves(cfg, categoria_de(cfg), rid, mes_de(fecha)),
+                   [0, 0.0, horas * diferencia, 0.0, 0.0])
+    return deltas
+
+
+def combinar(a: Deltas, b: Deltas) -> Deltas:
+    """Suma b sobre a (modifica y devuelve a)."""
+    for clave, valores in b.items():
+        _sumar(a, (clave,), valores)
+    return a
+
+
+def diferencias(esperado: Deltas, actual: Deltas, tolerancia: float = 1e-6) -> List[Dict]:
+    """Celdas en que dos juegos de agregados no coinciden (con tolerancia relativa)."""
+    res = []
+    for clave in sorted(esperado.keys() | actual.keys()):
+        a = esperado.get(clave, [0] * len(METRICAS))
+        b = actual.get(clave, [0] * len(METRICAS))
+        if any(abs(x - y) > tolerancia * max(1.0, abs(x)) for x, y in zip(a, b)):
+            dim, id_, mes = clave
+            res.append({"dimension": dim, "id": id_, "mes": mes,
+                        "esperado": dict(zip(METRICAS, a)), "actual": dict(zip(METRICAS, b))})
+    return res
+
+
+def fila_reporte(valores: List[float], **extra) -> Dict:
+    fila = dict(extra)
+    fila["consumos"] = int(valores[0])
+    for nombre, v in zip(METRICAS[1:], valores[1:]):
+        fila[nombre] = round(v, 4)
+    return fila
+
+
+class Agregados:
+    """
+    Agregados en memoria con su copia en un XML propio. Se actualizan de a
+    lotes (aplicar) y recuerdan hasta qué id de consumo y de factura
+    incluyen; al cargarse, lo que quedó afuera (p.ej. un corte entre la
+    escritura de los datos y la de este archivo) se suma con `pendientes`.
+    """
+
+    TIPOS = ("consumo", "factura")
+
+    def __init__(self, path: str, tope: Callable[[str], int],
+                 pendientes: Callable[[str, int], Deltas], lock=None):
+        self.path = path
+        self._tope = tope  # tipo -> último id entregado por las secuencias
+        self._pendientes = pendientes  # (tipo, desde_id) -> aporte de los ids > desde_id
+        # dimensión -> id -> mes -> métricas
+        self._celdas: Dict[str, Dict[int, Dict[str, List[float]]]] = {d: {} for d in DIMENSIONES}
+        self.hasta: Dict[str, int] = {t: 0 for t in self.TIPOS}
+        self._firma = None
+        self._cargado = False
+        self.sucio = False
+        self.lock = lock or threading.RLock()
+
+    # --------- Carga ---------
+    def _cargar(self) -> None:
+        # otro proceso pudo reescribir el archivo: se relee si cambió en disco
+        # (lo no guardado sólo puede venir de ponerse al día, que se repite)
+        if self._cargado and firma(self.path) == self._firma:
+            return
+        self._firma = firma(self.path)
+        self._celdas = {d: {} for d in DIMENSIONES}
+        self.hasta = {t: 0 for t in self.TIPOS}
+        if self._firma is not None:
+            try:
+                root = codec_xml.parse(self.path).getroot()
+                for t in self.TIPOS:
+                    self.hasta[t] = int(root.get(t, "0"))
+                for e in root.findall("./celda"):
+                    self._celdas[e.get("dimension")].setdefault(int(e.get("id")), {})[e.get("mes")] = [
+                        float(e.get(m, "0")) for m in METRICAS]
+            except (*codec_xml.ParseError, ValueError, KeyError):
+                self._celdas = {d: {} for d in DIMENSIONES}
+                self.hasta = {t: 0 for t in self.TIPOS}  # dañado: se recalcula todo
+        self._cargado = True
+        for t in self.TIPOS:
+            tope = self._tope(t)
+            if self.hasta[t] < tope:
+                self._sumar(self._pendientes(t, self.hasta[t]))
+                self.hasta[t] = tope
+                self.sucio = True
+
+    def _sumar(self, deltas: Deltas) -> None:
+        for (dim, id_, mes), valores in deltas.items():
+            _sumar(self._celdas[dim].setdefault(id_, {}), (mes,), valores)
+
+    def cargar(self) -> None:
+        """Carga y se pone al día con los datos (con los costos de ahora)."""
+        with self.lock:
+            self._cargar()
+
+    # --------- Actualización ---------
+    def ajustar(self, deltas: Deltas) -> None:
+        """Suma una corrección sobre lo ya incluido (p.ej. un cambio de costo_hora)."""
+        with self.lock:
+            self._cargar()
+            self._sumar(deltas)
+            self.sucio = True
+
+    def aplicar(self, deltas: Deltas, tipo: str, hasta_id: int) -> None:
+        """Suma el aporte de un lote cuyo mayor id de `tipo` es hasta_id."""
+        with self.lock:
+            self._cargar()
+            if hasta_id <= self.hasta[tipo]:
+                return  # ya incluido (se sumó al cargar)
+            self._sumar(deltas)
+            self.hasta[tipo] = hasta_id
+            self.sucio = True
+
+    def reemplazar(self, deltas: Deltas, hasta: Dict[str, int]) -> None:
+        with self.lock:
+            self._celdas = {d: {} for d in DIMENSIONES}
+            self._sumar(deltas)
+            self.hasta = {t: hasta.get(t, 0) for t in self.TIPOS}
+            self._firma = firma(self.path)
+            self._cargado = True
+            self.sucio = True
+
+    def reiniciar(self) -> None:
+        with self.lock:
+            self._celdas = {d: {} for d in DIMENSIONES}
+            self.hasta = {t: 0 for t in self.TIPOS}
+            self._cargado = True
+            self.sucio = False
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._firma = None
+
+    # --------- Persistencia ---------
+    def instantanea(self) -> Optional[Tuple[str, bytes]]:
+        """(ruta, contenido) a escribir si hubo cambios; los da por guardados."""
+        with self.lock:
+            if not self.sucio:
+                return None
+            root = codec_xml.Element("agregados", {t: str(self.hasta[t]) for t in self.TIPOS})
+            for (dim, id_, mes), valores in sorted(self._planas().items()):
+                attrs = {"dimension": dim, "id": str(id_), "mes": mes}
+                attrs.update((m, repr(v)) for m, v in zip(METRICAS, valores))
+                codec_xml.SubElement(root, "celda", attrs)
+            self.sucio = False
+            return self.path, codec_xml.tostring(root)
+
+    def guardar(self) -> None:
+        with self.lock:
+            datos = self.instantanea()
+            if datos is not None:
+                escribir_atomico(*datos)
+                self._firma = firma(self.path)  # lo propio no obliga a releer
+
+    # --------- Consultas ---------
+    def _planas(self) -> Deltas:
+        return {(dim, id_, mes): list(v)
+                for dim, por_id in self._celdas.items()
+                for id_, por_mes in por_id.items() for mes, v in por_mes.items()}
+
+    def celdas(self) -> Deltas:
+        with self.lock:
+            self._cargar()
+            return self._planas()
+
+    def reporte(self, dimension: str, desde: str = None, hasta: str = None) -> List[Dict]:
+        """Totales por id de la dimensión entre dos meses 'yyyy-mm' (inclusive)."""
+        def en_rango(mes: str) -> bool:
+            return not ((desde and mes < desde) or (hasta and mes > hasta))
+
+        with self.lock:
+            self._cargar()
+            if dimension == "mes":
+                return [fila_reporte(v, mes=mes) for mes, v in sorted(self._celdas["mes"].get(0, {}).items())
+                        if en_rango(mes)]
+            filas = []
+            for id_, por_mes in sorted(self._celdas[dimension].items()):
+                tot = None
+                for mes, v in por_mes.items():
+                    if en_rango(mes):
+                        tot = list(v) if tot is None else [a + b for a, b in zip(tot, v)]
+                if tot is not None:
+                    filas.append(fila_reporte(tot, id=id_))
+            return filas
+
+    def detalle(self, dimension: str, id_: int) -> List[Dict]:
+        """Serie mensual de un id de la dimensión."""
+        with self.lock:
+            self._cargar()
+            return [fila_reporte(v, mes=mes) for mes, v in sorted(self._celdas[dimension].get(id_, {}).items())]
@@ -0,0 +1,327 @@
+# backend/data/almacen.py
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, ContextManager, Dict, List, Optional, Tuple
+
+from data import xml_tienda
+from data.agregados import Deltas
+from models.entidades import Configuracion, Factura
+
+# Motor de almacenamiento: xml (archivos de backend/data) | sqlite
+ALMACEN = os.environ.get("ALMACEN", "xml")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(xml_tienda.DATA_DIR, "tienda.sqlite3"))
+
+_almacen = None
+
+log = logging.getLogger(__name__)
+
+
+class Almacen(ABC):
+    """
+    Interfaz común de almacenamiento. El resto del backend (carga de
+    configuración, consumos, facturación) sólo habla con esta clase.
+    """
+
+    nombre = ""
+
+    def preparar(self) -> None:
+        """Se llama al arrancar el backend (índices, esquema, etc.)."""
+
+    @abstractmethod
+    def init_all(self) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    def transaccion(self) -> ContextManager:
+        ...
+
+    @abstractmethod
+    def exclusivo(self) -> ContextManager:
+        """Bloque de lectura-modificación sin otros escritores (hilos ni procesos)."""
+
+    # --------- Inserciones ---------
+    @abstractmethod
+    def add_recurso(self, nombre: str, tipo: str, costo_hora: float) -> int:
+        ...
+
+    @abstractmethod
+    def add_categoria(self, nombre: str, descripcion: str = "") -> int:
+        ...
+
+    @abstractmethod
+    def add_config(self, nombre: str, categoria_id: int, precio_base: float, recursos: List[int]) -> int:
+        ...
+
+    @abstractmethod
+    def add_cliente(self, nombre: str, nit: str) -> int:
+        ...
+
+    @abstractmethod
+    def add_instancia(self, cliente_id: int, configuracion_id: int, estado: str,
+                      fecha_inicio: str, fecha_fin: str = None) -> int:
+        ...
+
+    @abstractmethod
+    def add_consumos(self, registros: List[Tuple[int, int, float, str]]) -> List[int]:
+        ...
+
+    # --------- Consultas ---------
+    @abstractmethod
+    def existe_instancia(self, instancia_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def existe_recurso(self, recurso_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def cliente_por_nit(self, nit: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def configuracion_por_nombre(self, nombre: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def instancias_de_cliente(self, cliente_id: int) -> List[int]:
+        ...
+
+    @abstractmethod
+    def instancias_de_configuracion(self, configuracion_id: int) -> List[int]:
+        ...
+
+    @abstractmethod
+    def consumos_de_instancia(self, instancia_id: int, desde: str = None, hasta: str = None) -> List[int]:
+        ...
+
+    @abstractmethod
+    def configuracion(self, configuracion_id: int) -> Optional[Configuracion]:
+        ...
+
+    @abstractmethod
+    def configuracion_de_instancia(self, instancia_id: int) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def costo_recurso(self, recurso_id: int) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def cambios_costos(self, desde: int) -> Tuple[int, List[Optional[int]]]:
+        """
+        Cambios de costo_hora (de cualquier proceso) posteriores a la posición
+        `desde`: (posición nueva, recurso_id de cada uno; None = todo cambió,
+        p.ej. un init). Con desde=0 devuelve todos.
+        """
+
+    # --------- Cambios ---------
+    @abstractmethod
+    def actualizar_costo_recurso(self, recurso_id: int, costo_hora: float) -> bool:
+        """Cambia el costo_hora de un recurso (y lo anota en cambios_costos); False si no existe."""
+
+    # --------- Facturación ---------
+    @abstractmethod
+    def reservar_ids(self, tipo: str, n: int) -> range:
+        ...
+
+    @abstractmethod
+    def costos_recursos(self) -> Dict[int, float]:
+        ...
+
+    @abstractmethod
+    def nits_clientes(self) -> Dict[int, str]:
+        ...
+
+    @abstractmethod
+    def cliente_de_instancias(self) -> Dict[int, int]:
+        ...
+
+    @abstractmethod
+    def consumos_rango(self, desde: str, hasta: str) -> Dict[str, Any]:
+        """Columnas numpy id/instancia_id/recurso_id/horas/fecha_ts/facturado."""
+
+    @abstractmethod
+    def registrar_facturacion(self, facturas: List[Factura], cols: Dict[str, Any], filas) -> None:
+        ...
+
+    # --------- Reportes (agregados mantenidos en cada inserción y facturación) ---------
+    @abstractmethod
+    def reporte(self, dimension: str, desde: str = None, hasta: str = None) -> List[Dict[str, Any]]:
+        """Totales por id de categoria|configuracion|recurso (o por mes) entre meses 'yyyy-mm'."""
+
+    @abstractmethod
+    def reporte_detalle(self, dimension: str, id_: int) -> List[Dict[str, Any]]:
+        """Serie mensual de un id de la dimensión."""
+
+    @abstractmethod
+    def agregados(self) -> Deltas:
+        """Los agregados tal como están guardados."""
+
+    @abstractmethod
+    def calcular_agregados(self) -> Tuple[Deltas, Dict[str, int]]:
+        """Agregados recalculados desde los datos, y hasta qué ids de consumo/factura cubren."""
+
+    @abstractmethod
+    def reemplazar_agregados(self, celdas: Deltas, hasta: Dict[str, int]) -> None:
+        ...
+
+    # --------- Listados ---------
+    @abstractmethod
+    def pagina(self, coleccion: str, despues: int = 0, limite: int = 100) -> List[Any]:
+        """Hasta `limite` entidades de clientes|instancias|consumos|facturas con id > despues, por id."""
+
+    # --------- Migración ---------
+    @abstractmethod
+    def exportar(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def importar(self, datos: Dict[str, Any]) -> Dict[str, int]:
+        ...
+
+
+class AlmacenXML(Almacen):
+    """Los XML de backend/data (formato del enunciado) vía data/xml_tienda.py."""
+
+    nombre = "xml"
+
+    def preparar(self) -> None:
+        for key, carga in xml_tienda.cargar_indices().items():
+            if carga["ms"] is None:
+                log.info("colección %s: sin caché, se lee en el primer uso (%s bytes)", key, carga["bytes"])
+            else:
+                log.info("colección %s: %s en %.1f ms (%s bytes)", key, carga["origen"], carga["ms"], carga["bytes"])
+
+    def init_all(self) -> Dict[str, str]:
+        return xml_tienda.init_all()
+
+    def transaccion(self) -> ContextManager:
+        return xml_tienda.transaccion()
+
+    def exclusivo(self) -> ContextManager:
+        return xml_tienda.exclusivo()
+
+    def add_recurso(self, nombre, tipo, costo_hora):
+        return xml_tienda.add_recurso(nombre, tipo, costo_hora)
+
+    def add_categoria(self, nombre, descripcion=""):
+        return xml_tienda.add_categoria(nombre, descripcion)
+
+    def add_config(self, nombre, categoria_id, precio_base, recursos):
+        return xml_tienda.add_config(nombre, categoria_id, precio_base, recursos)
+
+    def add_cliente(self, nombre, nit):
+        return xml_tienda.add_cliente(nombre, nit)
+
+    def add_instancia(self, cliente_id, configuracion_id, estado, fecha_inicio, fecha_fin=None):
+        return xml_tienda.add_instancia(cliente_id, configuracion_id, estado, fecha_inicio, fecha_fin)
+
+    def add_consumos(self, registros):
+        return xml_tienda.add_consumos(registros)
+
+    def existe_instancia(self, instancia_id):
+        return xml_tienda.existe_instancia(instancia_id)
+
+    def existe_recurso(self, recurso_id):
+        return xml_tienda.existe_recurso(recurso_id)
+
+    def cliente_por_nit(self, nit):
+        return xml_tienda.cliente_por_nit(nit)
+
+    def configuracion_por_nombre(self, nombre):
+        return xml_tienda.configuracion_por_nombre(nombre)
+
+    def instancias_de_cliente(self, cliente_id):
+        return xml_tienda.instancias_de_cliente(cliente_id)
+
+    def instancias_de_configuracion(self, configuracion_id):
+        return xml_tienda.instancias_de_configuracion(configuracion_id)
+
+    def consumos_de_instancia(self, instancia_id, desde=None, hasta=None):
+        return xml_tienda.consumos_de_instancia(instancia_id, desde, hasta)
+
+    def configuracion(self, configuracion_id):
+        return xml_tienda.configuracion(configuracion_id)
+
+    def configuracion_de_instancia(self, instancia_id):
+        return xml_tienda.configuracion_de_instancia(instancia_id)
+
+    def costo_recurso(self, recurso_id):
+        return xml_tienda.costo_recurso(recurso_id)
+
+    def cambios_costos(self, desde):
+        return xml_tienda.cambios_costos(desde)
+
+    def actualizar_costo_recurso(self, recurso_id, costo_hora):
+        return xml_tienda.actualizar_costo_recurso(recurso_id, costo_hora)
+
+    def reservar_ids(self, tipo, n):
+        return xml_tienda.reservar_ids(tipo, n)
+
+    def costos_recursos(self):
+        return xml_tienda.costos_recursos()
+
+    def nits_clientes(self):
+        return xml_tienda.nits_clientes()
+
+    def cliente_de_instancias(self):
+        return xml_tienda.cliente_de_instancias()
+
+    def consumos_rango(self, desde, hasta):
+        xml_tienda.compactar_consumos()  # lo pendiente en el log también cuenta
+        return xml_tienda.consumos_rango(desde, hasta)
+
+    def registrar_facturacion(self, facturas, cols, filas):
+        xml_tienda.registrar_facturacion(facturas, cols, filas)
+
+    def reporte(self, dimension, desde=None, hasta=None):
+        return xml_tienda.get_agregados().reporte(dimension, desde, hasta)
+
+    def reporte_detalle(self, dimension, id_):
+        return xml_tienda.get_agregados().detalle(dimension, id_)
+
+    def agregados(self):
+        return xml_tienda.get_agregados().celdas()
+
+    def calcular_agregados(self):
+        return xml_tienda.calcular_agregados()
+
+    def reemplazar_agregados(self, celdas, hasta):
+        xml_tienda.reemplazar_agregados(celdas, hasta)
+
+    def pagina(self, coleccion, despues=0, limite=100):
+        return xml_tienda.pagina(coleccion, despues, limite)
+
+    def exportar(self):
+        return xml_tienda.exportar_entidades()
+
+    def importar(self, datos):
+        return xml_tienda.importar_entidades(datos)
+
+
+def _tras_fork() -> None:
+    global _almacen
+    _almacen = None  # una conexión SQLite no se comparte con el proceso hijo
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def crear_almacen(tipo: str = None) -> Almacen:
+    tipo = tipo or ALMACEN
+    if tipo == "xml":
+        return AlmacenXML()
+    if tipo == "sqlite":
+        from data.almacen_sqlite import AlmacenSQLite
+        return AlmacenSQLite(SQLITE_PATH)
+    raise ValueError(f"almacén desconocido: {tipo} (xml|sqlite)")
+
+
+def get_almacen() -> Almacen:
+    """Almacén configurado (variable de entorno ALMACEN), compartido por el proceso."""
+    global _almacen
+    if _almacen is None:
+        _almacen = crear_almacen()
+    return _almacen
@@ -0,0 +1,474 @@
+# backend/data/almacen_sqlite.py
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from data.agregados import METRICAS, combinar, deltas_consumos, deltas_costo, deltas_facturas, fila_reporte
+from data.almacen import Almacen
+from models.entidades import (
+    Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, LineaFactura,
+    ts_fecha_hora, fecha_hora_de_ts
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recursos (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, tipo TEXT NOT NULL, costo_hora REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categorias (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, descripcion TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS configuraciones (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, categoria_id INTEGER NOT NULL, precio_base REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_configuraciones_nombre ON configuraciones (nombre);
+CREATE TABLE IF NOT EXISTS configuracion_recursos (
+    configuracion_id INTEGER NOT NULL, orden INTEGER NOT NULL, recurso_id INTEGER NOT NULL,
+    PRIMARY KEY (configuracion_id, orden)
+);
+CREATE INDEX IF NOT EXISTS ix_configuracion_recursos_recurso ON configuracion_recursos (recurso_id);
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, nit TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS instancias (
+    id INTEGER PRIMARY KEY, cliente_id INTEGER NOT NULL, configuracion_id INTEGER NOT NULL,
+    estado TEXT NOT NULL, fecha_inicio TEXT NOT NULL, fecha_fin TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_instancias_cliente ON instancias (cliente_id);
+CREATE INDEX IF NOT EXISTS ix_instancias_configuracion ON instancias (configuracion_id);
+CREATE TABLE IF NOT EXISTS consumos (
+    id INTEGER PRIMARY KEY, instancia_id INTEGER NOT NULL, recurso_id INTEGER NOT NULL,
+    horas REAL NOT NULL, fecha_ts INTEGER NOT NULL, facturado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_consumos_instancia_fecha ON consumos (instancia_id, fecha_ts);
+CREATE INDEX IF NOT EXISTS ix_consumos_fecha ON consumos (fecha_ts);
+CREATE TABLE IF NOT EXISTS facturas (
+    id INTEGER PRIMARY KEY, numero TEXT NOT NULL, cliente_id INTEGER NOT NULL, nit TEXT NOT NULL,
+    fecha TEXT NOT NULL, total REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_facturas_cliente ON facturas (cliente_id);
+CREATE TABLE IF NOT EXISTS lineas_factura (
+    id INTEGER PRIMARY KEY, factura_id INTEGER NOT NULL, instancia_id INTEGER NOT NULL,
+    recurso_id INTEGER NOT NULL, horas REAL NOT NULL, monto REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_lineas_factura ON lineas_factura (factura_id);
+CREATE TABLE IF NOT EXISTS secuencias (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS agregados (
+    dimension TEXT NOT NULL, clave INTEGER NOT NULL, mes TEXT NOT NULL,
+    consumos INTEGER NOT NULL, horas REAL NOT NULL, costo REAL NOT NULL,
+    facturado_horas REAL NOT NULL, facturado REAL NOT NULL,
+    PRIMARY KEY (dimension, clave, mes)
+) WITHOUT ROWID;
+-- cambios de costo_hora (recurso_id NULL = todo, por init/importar); init no la vacía
+CREATE TABLE IF NOT EXISTS cambios_costos (seq INTEGER PRIMARY KEY AUTOINCREMENT, recurso_id INTEGER);
+"""
+
+TABLAS = ("recursos", "categorias", "configuraciones", "configuracion_recursos", "clientes",
+          "instancias", "consumos", "facturas", "lineas_factura", "secuencias", "agregados")
+
+# tipo de secuencia -> tabla de donde se reconstruye el máximo id
+TABLA_DE = {
+    "recurso": "recursos", "categoria": "categorias", "configuracion": "configuraciones",
+    "cliente": "clientes", "instancia": "instancias", "consumo": "consumos",
+    "factura": "facturas", "linea": "lineas_factura",
+}
+
+
+class AlmacenSQLite(Almacen):
+    """
+    Almacén en SQLite (modo WAL). Una sola conexión compartida protegida por
+    un lock: SQLite admite un escritor a la vez y así se evita el costo de
+    abrir conexiones por request.
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._nivel = 0
+        self.con = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA foreign_keys=OFF")
+        self.con.executescript(ESQUEMA)
+
+    # --------- Transacciones ---------
+    @contextmanager
+    def transaccion(self):
+        """BEGIN/COMMIT en el nivel externo; SAVEPOINT en los anidados (un error
+        en una inserción deshace sólo esa inserción)."""
+        with self.lock:
+            nivel = self._nivel
+            self.con.execute("BEGIN IMMEDIATE" if nivel == 0 else f"SAVEPOINT sp{nivel}")
+            self._nivel += 1
+            try:
+                yield self
+            except BaseException:
+                self._nivel -= 1
+                if nivel == 0:
+                    self.con.execute("ROLLBACK")
+                else:
+                    self.con.execute(f"ROLLBACK TO sp{nivel}")
+                    self.con.execute(f"RELEASE sp{nivel}")
+                raise
+            self._nivel -= 1
+            self.con.execute("COMMIT" if nivel == 0 else f"RELEASE sp{nivel}")
+
+    def exclusivo(self):
+        return self.transaccion()  # BEGIN IMMEDIATE ya excluye a otros escritores
+
+    def init_all(self) -> Dict[str, str]:
+        with self.transaccion():
+            for t in TABLAS:
+                self.con.execute(f"DELETE FROM {t}")
+            self.con.execute("INSERT INTO cambios_costos (recurso_id) VALUES (NULL)")
+        return {"status": "ok", "message": "Base de datos inicializada"}
+
+    # --------- Secuencias ---------
+    def reservar_ids(self, tipo: str, n: int) -> range:
+        if n < 1:
+            raise ValueError("n debe ser >= 1")
+        with self.transaccion():
+            fila = self.con.execute("SELECT valor FROM secuencias WHERE nombre = ?", (tipo,)).fetchone()
+            if fila is None:
+                valor = self.con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLA_DE[tipo]}").fetchone()[0]
+            else:
+                valor = fila[0]
+            self.con.execute("INSERT OR REPLACE INTO secuencias (nombre, valor) VALUES (?, ?)", (tipo, valor + n))
+        return range(valor + 1, valor + n + 1)
+
+    def _siguiente(self, tipo: str) -> int:
+        return self.reservar_ids(tipo, 1).start
+
+    # --------- Inserciones ---------
+    def add_recurso(self, nombre, tipo, costo_hora):
+        with self.transaccion():
+            rid = self._siguiente("recurso")
+            self.con.execute("INSERT INTO recursos VALUES (?, ?, ?, ?)", (rid, nombre, tipo, costo_hora))
+        return rid
+
+    def add_categoria(self, nombre, descripcion=""):
+        with self.transaccion():
+            cid = self._siguiente("categoria")
+            self.con.execute("INSERT INTO categorias VALUES (?, ?, ?)", (cid, nombre, descripcion))
+        return cid
+
+    def add_config(self, nombre, categoria_id, precio_base, recursos):
+        with self.transaccion():
+            cfg_id = self._siguiente("configuracion")
+            self.con.execute("INSERT INTO configuraciones VALUES (?, ?, ?, ?)",
+                             (cfg_id, nombre, categoria_id, precio_base))
+            self.con.executemany("INSERT INTO configuracion_recursos VALUES (?, ?, ?)",
+                                 [(cfg_id, k, r) for k, r in enumerate(recursos)])
+        return cfg_id
+
+    def add_cliente(self, nombre, nit):
+        with self.transaccion():
+            if self.cliente_por_nit(nit) is not None:
+                raise ValueError(f"NIT {nit} ya registrado")
+            cid = self._siguiente("cliente")
+            self.con.execute("INSERT INTO clientes VALUES (?, ?, ?)", (cid, nombre, nit))
+        return cid
+
+    def add_instancia(self, cliente_id, configuracion_id, estado, fecha_inicio, fecha_fin=None):
+        with self.transaccion():
+            if self.con.execute("SELECT 1 FROM clientes WHERE id = ?", (cliente_id,)).fetchone() is None:
+                raise ValueError("Cliente no existe")
+            iid = self._siguiente("instancia")
+            self.con.execute("INSERT INTO instancias VALUES (?, ?, ?, ?, ?, ?)",
+                             (iid, cliente_id, configuracion_id, estado, fecha_inicio, fecha_fin))
+        return iid
+
+    def add_consumos(self, registros):
+        if not registros:
+            return []
+        for _, _, h, _ in registros:
+            if not math.isfinite(float(h)) or float(h) < 0:
+                raise ValueError(f"horas inválidas: {h!r}")
+        with self.transaccion():
+            ids = self.reservar_ids("consumo", len(registros))
+            self.con.executemany(
+                "INSERT INTO consumos (id, instancia_id, recurso_id, horas, fecha_ts) VALUES (?, ?, ?, ?, ?)",
+                [(cid, int(i), int(r), float(h), ts_fecha_hora(f)) for cid, (i, r, h, f) in zip(ids, registros)])
+            self._sumar_agregados(deltas_consumos(
+                ((int(i), int(r), float(h), f) for i, r, h, f in registros),
+                self._config_de_instancia, self._categoria_de_config, self._costo_de_recurso))
+        return list(ids)
+
+    # --------- Consultas ---------
+    def _uno(self, sql: str, params: tuple) -> Optional[Any]:
+        with self.lock:
+            fila = self.con.execute(sql, params).fetchone()
+        return None if fila is None else fila[0]
+
+    def _lista(self, sql: str, params: tuple) -> List[Any]:
+        with self.lock:
+            return [f[0] for f in self.con.execute(sql, params)]
+
+    def existe_instancia(self, instancia_id):
+        return self._uno("SELECT 1 FROM instancias WHERE id = ?", (int(instancia_id),)) is not None
+
+    def existe_recurso(self, recurso_id):
+        return self._uno("SELECT 1 FROM recursos WHERE id = ?", (int(recurso_id),)) is not None
+
+    def cliente_por_nit(self, nit):
+        return self._uno("SELECT id FROM clientes WHERE nit = ?", (nit.strip(),))
+
+    def configuracion_por_nombre(self, nombre):
+        return self._uno("SELECT id FROM configuraciones WHERE nombre = ? ORDER BY id DESC LIMIT 1", (nombre,))
+
+    def instancias_de_cliente(self, cliente_id):
+        return self._lista("SELECT id FROM instancias WHERE cliente_id = ? ORDER BY id", (int(cliente_id),))
+
+    def instancias_de_configuracion(self, configuracion_id):
+        return self._lista("SELECT id FROM instancias WHERE configuracion_id = ? ORDER BY id",
+                           (int(configuracion_id),))
+
+    def consumos_de_instancia(self, instancia_id, desde=None, hasta=None):
+        d = ts_fecha_hora(desde) if desde else -2 ** 62
+        h = ts_fecha_hora(hasta) if hasta else 2 ** 62
+        return self._lista("SELECT id FROM consumos WHERE instancia_id = ? AND fecha_ts BETWEEN ? AND ? "
+                           "ORDER BY fecha_ts, id", (int(instancia_id), d, h))
+
+    def configuracion(self, configuracion_id):
+        with self.lock:
+            fila = self.con.execute("SELECT id, nombre, categoria_id, precio_base FROM configuraciones WHERE id = ?",
+                                    (int(configuracion_id),)).fetchone()
+            if fila is None:
+                return None
+            recursos = [r for r, in self.con.execute(
+                "SELECT recurso_id FROM configuracion_recursos WHERE configuracion_id = ? ORDER BY orden", (fila[0],))]
+        return Configuracion(*fila, recursos)
+
+    def configuracion_de_instancia(self, instancia_id):
+        return self._uno("SELECT configuracion_id FROM instancias WHERE id = ?", (int(instancia_id),))
+
+    def costo_recurso(self, recurso_id):
+        return self._uno("SELECT costo_hora FROM recursos WHERE id = ?", (int(recurso_id),))
+
+    def cambios_costos(self, desde):
+        with self.lock:
+            filas = self.con.execute("SELECT seq, recurso_id FROM cambios_costos WHERE seq > ? ORDER BY seq",
+                                     (desde,)).fetchall()
+        return (filas[-1][0] if filas else desde), [r for _, r in filas]
+
+    # --------- Cambios ---------
+    def actualizar_costo_recurso(self, recurso_id, costo_hora):
+        # el costo de los agregados pasa al precio nuevo en la misma transacción
+        with self.transaccion():
+            viejo = self._uno("SELECT costo_hora FROM recursos WHERE id = ?", (int(recurso_id),))
+            if viejo is None:
+                return False
+            self.con.execute("UPDATE recursos SET costo_hora = ? WHERE id = ?", (costo_hora, int(recurso_id)))
+            self.con.execute("INSERT INTO cambios_costos (recurso_id) VALUES (?)", (int(recurso_id),))
+            consumos = [(i, r, h, fecha_hora_de_ts(ts)) for i, r, h, ts in self.con.execute(
+                "SELECT instancia_id, recurso_id, horas, fecha_ts FROM consumos WHERE recurso_id = ?",
+                (int(recurso_id),))]
+            self._sumar_agregados(deltas_costo(consumos, int(recurso_id), costo_hora - viejo,
+                                               self._config_de_instancia, self._categoria_de_config))
+        return True
+
+    # --------- Facturación ---------
+    def costos_recursos(self):
+        with self.lock:
+            return dict(self.con.execute("SELECT id, costo_hora FROM recursos"))
+
+    def nits_clientes(self):
+        with self.lock:
+            return dict(self.con.execute("SELECT id, nit FROM clientes"))
+
+    def cliente_de_instancias(self):
+        with self.lock:
+            return dict(self.con.execute("SELECT id, cliente_id FROM instancias"))
+
+    def consumos_rango(self, desde, hasta):
+        d = ts_fecha_hora(desde)
+        h = ts_fecha_hora(hasta) + (86399 if len(hasta.strip()) <= 10 else 59)
+        with self.lock:
+            filas = self.con.execute(
+                "SELECT id, instancia_id, recurso_id, horas, fecha_ts, facturado FROM consumos "
+                "WHERE fecha_ts BETWEEN ? AND ? ORDER BY fecha_ts, id", (d, h)).fetchall()
+        cols = list(zip(*filas)) if filas else [()] * 6
+        return {
+            "id": np.asarray(cols[0], dtype=np.int64), "instancia_id": np.asarray(cols[1], dtype=np.int64),
+            "recurso_id": np.asarray(cols[2], dtype=np.int64), "horas": np.asarray(cols[3], dtype=np.float64),
+            "fecha_ts": np.asarray(cols[4], dtype=np.int64), "facturado": np.asarray(cols[5], dtype=np.int8),
+        }
+
+    def registrar_facturacion(self, facturas, cols, filas):
+        with self.transaccion():
+            self.con.executemany("INSERT INTO facturas VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(f.id, f.numero, f.cliente_id, f.nit, f.fecha, f.total) for f in facturas])
+            self.con.executemany("INSERT INTO lineas_factura VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(ln.id, ln.factura_id, ln.instancia_id, ln.recurso_id, ln.horas, ln.monto)
+                                  for f in facturas for ln in f.lineas])
+            self.con.executemany("UPDATE consumos SET facturado = 1 WHERE id = ?",
+                                 [(int(cid),) for cid in cols["id"][filas]])
+            self._sumar_agregados(deltas_facturas(facturas, self._config_de_instancia, self._categoria_de_config))
+
+    # --------- Reportes ---------
+    # los agregados se actualizan en la misma transacción que los datos
+    _SUMAS = ", ".join(f"SUM({m})" for m in METRICAS)
+
+    def _config_de_instancia(self, instancia_id: int) -> int:
+        return self._uno("SELECT configuracion_id FROM instancias WHERE id = ?", (instancia_id,)) or 0
+
+    def _categoria_de_config(self, configuracion_id: int) -> int:
+        return self._uno("SELECT categoria_id FROM configuraciones WHERE id = ?", (configuracion_id,)) or 0
+
+    def _costo_de_recurso(self, recurso_id: int) -> float:
+        return self._uno("SELECT costo_hora FROM recursos WHERE id = ?", (recurso_id,)) or 0.0
+
+    def _sumar_agregados(self, deltas) -> None:
+        actualizar = ", ".join(f"{m} = {m} + excluded.{m}" for m in METRICAS)
+        self.con.executemany(
+            f"INSERT INTO agregados VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            f"ON CONFLICT (dimension, clave, mes) DO UPDATE SET {actualizar}",
+            [(dim, id_, mes, *valores) for (dim, id_, mes), valores in deltas.items()])
+
+    def reporte(self, dimension, desde=None, hasta=None):
+        rango = (desde or "0000-00", hasta or "9999-99")
+        with self.lock:
+            if dimension == "mes":
+                return [fila_reporte(v, mes=mes) for mes, *v in self.con.execute(
+                    f"SELECT mes, {self._SUMAS} FROM agregados WHERE dimension = 'mes' "
+                    "AND mes BETWEEN ? AND ? GROUP BY mes ORDER BY mes", rango)]
+            return [fila_reporte(v, id=id_) for id_, *v in self.con.execute(
+                f"SELECT clave, {self._SUMAS} FROM agregados WHERE dimension = ? "
+                "AND mes BETWEEN ? AND ? GROUP BY clave ORDER BY clave", (dimension, *rango))]
+
+    def reporte_detalle(self, dimension, id_):
+        with self.lock:
+            return [fila_reporte(v, mes=mes) for mes, *v in self.con.execute(
+                f"SELECT mes, {', '.join(METRICAS)} FROM agregados WHERE dimension = ? AND clave = ? "
+                "ORDER BY mes", (dimension, int(id_)))]
+
+    def agregados(self):
+        with self.lock:
+            return {(dim, id_, mes): list(v) for dim, id_, mes, *v in self.con.execute("SELECT * FROM agregados")}
+
+    def calcular_agregados(self):
+        with self.lock:
+            consumos = [(i, r, h, fecha_hora_de_ts(ts)) for i, r, h, ts in self.con.execute(
+                "SELECT instancia_id, recurso_id, horas, fecha_ts FROM consumos")]
+            facturas = {fid: Factura(fid, "", 0, "", fecha, 0.0) for fid, fecha in self.con.execute(
+                "SELECT id, fecha FROM facturas")}
+            for fila in self.con.execute("SELECT * FROM lineas_factura"):
+                if fila[1] in facturas:
+                    facturas[fila[1]].lineas.append(LineaFactura(*fila))
+            celdas = combinar(
+                deltas_consumos(consumos, self._config_de_instancia, self._categoria_de_config,
+                                self._costo_de_recurso),
+                deltas_facturas(facturas.values(), self._config_de_instancia, self._categoria_de_config))
+            hasta = {"consumo": self._uno("SELECT COALESCE(MAX(id), 0) FROM consumos", ()),
+                     "factura": self._uno("SELECT COALESCE(MAX(id), 0) FROM facturas", ())}
+        return celdas, hasta
+
+    def reemplazar_agregados(self, celdas, hasta):
+        with self.transaccion():
+            self.con.execute("DELETE FROM agregados")
+            self._sumar_agregados(celdas)
+
+    # --------- Listados ---------
+    def pagina(self, coleccion, despues=0, limite=100):
+        args = (int(despues), int(limite))
+        with self.lock:
+            if coleccion == "clientes":
+                return [Cliente(*f) for f in self.con.execute(
+                    "SELECT * FROM clientes WHERE id > ? ORDER BY id LIMIT ?", args)]
+            if coleccion == "instancias":
+                return [Instancia(*f) for f in self.con.execute(
+                    "SELECT * FROM instancias WHERE id > ? ORDER BY id LIMIT ?", args)]
+            if coleccion == "consumos":
+                return [Consumo(i, ins, r, h, fecha_hora_de_ts(ts), bool(fa)) for i, ins, r, h, ts, fa in
+                        self.con.execute("SELECT * FROM consumos WHERE id > ? ORDER BY id LIMIT ?", args)]
+            if coleccion == "facturas":
+                facturas = [Factura(*f) for f in self.con.execute(
+                    "SELECT * FROM facturas WHERE id > ? ORDER BY id LIMIT ?", args)]
+                if facturas:
+                    por_id = {f.id: f for f in facturas}
+                    for fila in self.con.execute(
+                            "SELECT * FROM lineas_factura WHERE factura_id BETWEEN ? AND ? ORDER BY id",
+                            (facturas[0].id, facturas[-1].id)):
+                        if fila[1] in por_id:
+                            por_id[fila[1]].lineas.append(LineaFactura(*fila))
+                return facturas
+        raise KeyError(coleccion)
+
+    # --------- Migración ---------
+    def exportar(self):
+        def consulta(sql):
+            with self.lock:
+                return self.con.execute(sql).fetchall()
+
+        def configuraciones():
+            recs: Dict[int, List[int]] = {}
+            for cfg_id, rid in consulta("SELECT configuracion_id, recurso_id FROM configuracion_recursos "
+                                        "ORDER BY configuracion_id, orden"):
+                recs.setdefault(cfg_id, []).append(rid)
+            for fila in consulta("SELECT id, nombre, categoria_id, precio_base FROM configuraciones ORDER BY id"):
+                yield Configuracion(*fila, recursos=recs.get(fila[0], []))
+
+        def facturas():
+            lineas: Dict[int, List[LineaFactura]] = {}
+            for fila in consulta("SELECT * FROM lineas_factura ORDER BY id"):
+                lineas.setdefault(fila[1], []).append(LineaFactura(*fila))
+            for fila in consulta("SELECT * FROM facturas ORDER BY id"):
+                yield Factura(*fila, lineas=lineas.get(fila[0], []))
+
+        return {
+            "recursos": (Recurso(*f) for f in consulta("SELECT * FROM recursos ORDER BY id")),
+            "categorias": (Categoria(*f) for f in consulta("SELECT * FROM categorias ORDER BY id")),
+            "configuraciones": configuraciones(),
+            "clientes": (Cliente(*f) for f in consulta("SELECT * FROM clientes ORDER BY id")),
+            "instancias": (Instancia(*f) for f in consulta("SELECT * FROM instancias ORDER BY id")),
+            "consumos": (Consumo(i, ins, r, h, fecha_hora_de_ts(ts), bool(fa))
+                         for i, ins, r, h, ts, fa in consulta("SELECT * FROM consumos ORDER BY id")),
+            "facturas": facturas(),
+        }
+
+    def importar(self, datos):
+        cnt = {}
+        with self.transaccion():
+            self.init_all()
+
+            def cargar(clave: str, sql: str, filas):
+                filas = list(filas)
+                self.con.executemany(sql, filas)
+                cnt[clave] = len(filas)
+
+            cargar("recursos", "INSERT INTO recursos VALUES (?, ?, ?, ?)",
+                   ((r.id, r.nombre, r.tipo, r.costo_hora) for r in datos.get("recursos", ())))
+            cargar("categorias", "INSERT INTO categorias VALUES (?, ?, ?)",
+                   ((c.id, c.nombre, c.descripcion) for c in datos.get("categorias", ())))
+            cfgs = list(datos.get("configuraciones", ()))
+            cargar("configuraciones", "INSERT INTO configuraciones VALUES (?, ?, ?, ?)",
+                   ((c.id, c.nombre, c.categoria_id, c.precio_base) for c in cfgs))
+            self.con.executemany("INSERT INTO configuracion_recursos VALUES (?, ?, ?)",
+                                 [(c.id, k, r) for c in cfgs for k, r in enumerate(c.recursos)])
+            cargar("clientes", "INSERT INTO clientes VALUES (?, ?, ?)",
+                   ((c.id, c.nombre, c.nit) for c in datos.get("clientes", ())))
+            cargar("instancias", "INSERT INTO instancias VALUES (?, ?, ?, ?, ?, ?)",
+                   ((i.id, i.cliente_id, i.configuracion_id, i.estado, i.fecha_inicio, i.fecha_fin)
+                    for i in datos.get("instancias", ())))
+            cargar("consumos", "INSERT INTO consumos VALUES (?, ?, ?, ?, ?, ?)",
+                   ((c.id, c.instancia_id, c.recurso_id, c.horas, ts_fecha_hora(c.fecha_hora), int(c.facturado))
+                    for c in datos.get("consumos", ())))
+            facts = list(datos.get("facturas", ()))
+            cargar("facturas", "INSERT INTO facturas VALUES (?, ?, ?, ?, ?, ?)",
+                   ((f.id, f.numero, f.cliente_id, f.nit, f.fecha, f.total) for f in facts))
+            self.con.executemany("INSERT INTO lineas_factura VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(ln.id, f.id, ln.instancia_id, ln.recurso_id, ln.horas, ln.monto)
+                                  for f in facts for ln in f.lineas])
+            # las secuencias se reconstruyen desde MAX(id) en el primer uso
+            self.con.execute("DELETE FROM secuencias")
+            self.reemplazar_agregados(*self.calcular_agregados())
+        return cnt
+
+    def cerrar(self) -> None:
+        with self.lock:
+            self.con.close()
@@ -0,0 +1,114 @@
+# backend/data/archivos.py
+import os
+from typing import Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Identifica una versión de un archivo en disco: (st_ino, st_size, st_mtime_ns)
+Firma = Optional[Tuple[int, int, int]]
+
+
+def firma(path: str) -> Firma:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _fsync_dir(carpeta: str) -> None:
+    if fcntl is None:
+        return  # en Windows no se puede abrir un directorio
+    fd = os.open(carpeta or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def escribir_varios(archivos: Iterable[Tuple[str, bytes]]) -> None:
+    """
+    Escribe cada (ruta, bytes) en un temporal con fsync y recién cuando todos
+    están en disco los renombra sobre el original. Un corte deja cada archivo
+    completo: o la versión anterior o la nueva, nunca uno truncado.
+    """
+    pendientes = []
+    try:
+        for path, datos in archivos:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            pendientes.append((tmp, path))
+            with open(tmp, "wb") as fh:
+                fh.write(datos)
+                fh.flush()
+                os.fsync(fh.fileno())
+    except BaseException:
+        for tmp, _ in pendientes:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    for tmp, path in pendientes:
+        os.replace(tmp, path)
+    for carpeta in {os.path.dirname(path) for _, path in pendientes}:
+        _fsync_dir(carpeta)
+
+
+def escribir_atomico(path: str, datos: bytes) -> None:
+    escribir_varios([(path, datos)])
+
+
+class BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos sobre un archivo (flock; msvcrt en Windows)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    @property
+    def tomado(self) -> bool:
+        return self._fh is not None
+
+    def tomar(self, esperar: bool = True) -> bool:
+        """Toma el bloqueo; con esperar=False devuelve False si otro lo tiene."""
+        if self._fh is not None:
+            return True
+        fh = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    fh.close()
+                    return False
+            else:
+                fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not esperar:
+                            fh.close()
+                            return False
+                        continue  # LK_LOCK se rinde a los ~10 s; se sigue esperando
+        except BaseException:
+            fh.close()
+            raise
+        self._fh = fh
+        return True
+
+    def soltar(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            fh.close()
@@ -0,0 +1,65 @@
+# backend/data/cache_xml.py
+"""
+Caché binaria junto a cada XML del repositorio (<archivo>.xml.cache): el
+estado derivado de la colección (índices secundarios, máximo id por tag)
+en formato marshal, que se carga mucho más rápido que parsear el XML y
+reconstruirlo. Vale sólo para la versión exacta del XML: tamaño, mtime y
+hash del contenido tienen que coincidir; si no, se ignora.
+"""
+import hashlib
+import marshal
+import os
+from typing import Any, Optional, Tuple
+
+from data.archivos import Firma, escribir_atomico
+
+SUFIJO = ".cache"
+FORMATO = 1  # se sube si cambia lo que se guarda
+
+
+def hash_de(datos: bytes) -> str:
+    return hashlib.blake2b(datos, digest_size=16).hexdigest()
+
+
+def hash_archivo(path: str, bloque: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def leer(path_xml: str, fir: Firma) -> Optional[Tuple[Any, str]]:
+    """(datos, hash del XML) si la caché corresponde al XML en disco; si no, None."""
+    if fir is None:
+        return None
+    try:
+        with open(path_xml + SUFIJO, "rb") as f:
+            contenido = f.read()  # marshal.load(f) lee de a poco: mucho más lento
+        formato, tam, mtime, hash_xml, datos = marshal.loads(contenido)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None  # no está, está dañada o es de otra versión de Python
+    if formato != FORMATO or tam != fir[1] or mtime != fir[2]:
+        return None
+    try:
+        if hash_archivo(path_xml) != hash_xml:
+            return None
+    except OSError:
+        return None
+    return datos, hash_xml
+
+
+def empaquetar(fir: Firma, hash_xml: str, datos: Any) -> bytes:
+    """Contenido de la caché para esa versión del XML (firma y hash)."""
+    return marshal.dumps((FORMATO, fir[1], fir[2], hash_xml, datos))
+
+
+def escribir(path_xml: str, contenido: bytes) -> None:
+    escribir_atomico(path_xml + SUFIJO, contenido)
+
+
+def borrar(path_xml: str) -> None:
+    try:
+        os.remove(path_xml + SUFIJO)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,110 @@
+# backend/data/codec_xml.py
+"""
+Lectura y escritura de XML detrás de una sola interfaz. Si lxml está
+instalado se usa (parser y serializador en C); si no, xml.etree.ElementTree.
+La salida es byte a byte la de ElementTree con la declaración utf-8, así
+que los archivos no cambian al pasar de un codec al otro.
+
+  XML_CODEC  auto (lxml si está) | lxml | stdlib
+
+Los árboles en memoria son del codec activo: los elementos nuevos se crean
+con Element/SubElement de este módulo, no con los de ElementTree.
+"""
+import os
+import re
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as _lxml
+except ImportError:
+    _lxml = None
+
+XML_CODEC = os.environ.get("XML_CODEC", "auto")
+
+DECLARACION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+
+class CodecStdlib:
+    """xml.etree.ElementTree (el parser es expat en C; el serializador es Python)."""
+
+    nombre = "stdlib"
+    ParseError = (ET.ParseError,)
+    Element = staticmethod(ET.Element)
+    SubElement = staticmethod(ET.SubElement)
+    ElementTree = staticmethod(ET.ElementTree)
+
+    def parse(self, fuente):
+        return ET.parse(fuente)
+
+    def iterparse(self, fuente, events=("end",)):
+        return ET.iterparse(fuente, events=events)
+
+    def tostring(self, elem) -> bytes:
+        """Elemento o árbol -> bytes utf-8 con declaración."""
+        if hasattr(elem, "getroot"):
+            elem = elem.getroot()
+        return ET.tostring(elem, encoding="utf-8", xml_declaration=True)
+
+
+class CodecLxml:
+    """lxml (libxml2): parse y serialización en C, con la salida de ElementTree."""
+
+    nombre = "lxml"
+
+    # ElementTree escribe <a /> tanto sin texto como con texto "", y \t en
+    # atributos como &#09;; libxml2 escribe <a/>, <a></a> y &#9;
+    _VACIO = re.compile(rb"<([^\s/>!?]+)((?:\s[^>]*)?)></\1>")
+
+    def __init__(self):
+        if _lxml is None:
+            raise ImportError("lxml no está instalado")
+        # como ElementTree: sin comentarios ni instrucciones de proceso y sin
+        # resolver entidades externas; huge_tree para archivos grandes
+        self._opciones = dict(remove_comments=True, remove_pis=True, resolve_entities=False,
+                              no_network=True, huge_tree=True)
+        self._parser = _lxml.XMLParser(**self._opciones)
+        self.ParseError = (_lxml.ParseError, ET.ParseError)
+        self.Element = _lxml.Element
+        self.SubElement = _lxml.SubElement
+        self.ElementTree = _lxml.ElementTree
+
+    def parse(self, fuente):
+        return _lxml.parse(fuente, self._parser)
+
+    def iterparse(self, fuente, events=("end",)):
+        return _lxml.iterparse(fuente, events=events, **self._opciones)
+
+    def tostring(self, elem) -> bytes:
+        if hasattr(elem, "getroot"):
+            elem = elem.getroot()
+        cuerpo = _lxml.tostring(elem, encoding="utf-8", xml_declaration=False)
+        if b"&#13;" in cuerpo:
+            # \r en un texto: ElementTree lo deja tal cual y libxml2 no; caso
+            # raro, se serializa con ElementTree para no cambiar los bytes
+            return ET.tostring(ET.fromstring(cuerpo), encoding="utf-8", xml_declaration=True)
+        cuerpo = self._VACIO.sub(rb"<\1\2 />", cuerpo.replace(b"/>", b" />")).replace(b"&#9;", b"&#09;")
+        return DECLARACION + cuerpo
+
+
+def crear(nombre: str = None):
+    nombre = nombre or XML_CODEC
+    if nombre == "auto":
+        return CodecLxml() if _lxml is not None else CodecStdlib()
+    if nombre == "lxml":
+        return CodecLxml()
+    if nombre == "stdlib":
+        return CodecStdlib()
+    raise ValueError(f"codec XML desconocido: {nombre} (auto|lxml|stdlib)")
+
+
+codec = crear()
+
+# interfaz del codec activo
+nombre = codec.nombre
+ParseError = codec.ParseError
+Element = codec.Element
+SubElement = codec.SubElement
+ElementTree = codec.ElementTree
+parse = codec.parse
+iterparse = codec.iterparse
+tostring = codec.tostring
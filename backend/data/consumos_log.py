@@ -0,0 +1,122 @@
+# backend/data/consumos_log.py
+import os
+import re
+import threading
+from typing import Callable, Iterator, List, Tuple
+
+# Registro de consumo en el log: (id, instancia_id, recurso_id, horas, fecha_hora)
+RegistroConsumo = Tuple[int, int, int, float, str]
+
+SEG_RX = re.compile(r'^seg-(\d+)\.log$')
+
+
+class LogConsumos:
+    """
+    Log de sólo-anexar para consumos. Cada lote se escribe al final del
+    segmento activo (una línea por consumo) y se sincroniza a disco; el
+    costo depende del tamaño del lote y no del historial. Los segmentos
+    cerrados se compactan después hacia consumos.xml.
+    """
+
+    def __init__(self, carpeta: str, max_bytes_segmento: int = 8 * 1024 * 1024):
+        self.carpeta = carpeta
+        self.max_bytes_segmento = max_bytes_segmento
+        self.lock = threading.RLock()
+        self._activo = None  # número del segmento donde se anexa
+        self.pendientes = 0  # registros aún no compactados (aprox. desde el arranque)
+
+    # --------- Segmentos ---------
+    def _path(self, n: int) -> str:
+        return os.path.join(self.carpeta, f"seg-{n:06d}.log")
+
+    def segmentos(self) -> List[int]:
+        if not os.path.isdir(self.carpeta):
+            return []
+        nums = []
+        for nombre in os.listdir(self.carpeta):
+            m = SEG_RX.match(nombre)
+            if m:
+                nums.append(int(m.group(1)))
+        return sorted(nums)
+
+    def _segmento_activo(self) -> int:
+        if self._activo is None:
+            os.makedirs(self.carpeta, exist_ok=True)
+            segs = self.segmentos()
+            # nunca se sigue un segmento de una corrida anterior: si quedó una
+            # línea a medias por un corte, queda aislada al final de ese segmento
+            self._activo = segs[-1] + 1 if segs else 1
+        return self._activo
+
+    def rotar(self) -> List[int]:
+        """Cierra el segmento activo y devuelve los segmentos cerrados (inmutables)."""
+        with self.lock:
+            actual = self._segmento_activo()
+            if os.path.exists(self._path(actual)):
+                self._activo = actual + 1
+            return [n for n in self.segmentos() if n < self._activo]
+
+    # --------- Escritura ---------
+    def anexar(self, registros: List[RegistroConsumo]) -> None:
+        if not registros:
+            return
+        lineas = "".join(
+            f"{cid}\t{iid}\t{rid}\t{horas}\t{fecha}\n" for cid, iid, rid, horas, fecha in registros
+        )
+        with self.lock:
+            path = self._path(self._segmento_activo())
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lineas)
+                f.flush()
+                os.fsync(f.fileno())
+                tam = f.tell()
+            if tam >= self.max_bytes_segmento:
+                self._activo += 1
+            self.pendientes += len(registros)
+
+    # --------- Lectura ---------
+    def leer(self, segs: List[int] = None) -> Iterator[RegistroConsumo]:
+        for n in (self.segmentos() if segs is None else segs):
+            try:
+                f = open(self._path(n), encoding="utf-8")
+            except FileNotFoundError:
+                continue  # lo borró una compactación de otro proceso
+            with f:
+                for linea in f:
+                    partes = linea.rstrip("\n").split("\t")
+                    if len(partes) != 5:
+                        continue  # línea incompleta por un corte a media escritura
+                    cid, iid, rid, horas, fecha = partes
+                    try:
+                        registro = (int(cid), int(iid), int(rid), float(horas), fecha)
+                    except ValueError:
+                        continue
+                    yield registro
+
+    def max_id(self) -> int:
+        return max((r[0] for r in self.leer()), default=0)
+
+    # --------- Compactación ---------
+    def compactar(self, volcar: Callable[[List[RegistroConsumo], List[int]], None]) -> int:
+        """
+        Pasa los segmentos cerrados a `volcar(registros, segmentos)` (que los
+        agrega a consumos.xml) y luego los borra. `volcar` debe ser idempotente,
+        así un corte entre la escritura y el borrado no duplica consumos.
+        """
+        segs = self.rotar()
+        if not segs:
+            return 0
+        registros = list(self.leer(segs))
+        volcar(registros, segs)
+        for n in segs:
+            os.remove(self._path(n))
+        with self.lock:
+            self.pendientes = max(0, self.pendientes - len(registros))
+        return len(registros)
+
+    def reiniciar(self) -> None:
+        with self.lock:
+            for n in self.segmentos():
+                os.remove(self._path(n))
+            self._activo = None
+            self.pendientes = 0
@@ -0,0 +1,206 @@
+# backend/data/diario.py
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from data.archivos import escribir_atomico
+
+SEG_RX = re.compile(r'^seg-(\d+)\.log$')
+PUNTO_FILE = "punto"  # lsn hasta el que llegan los XML en disco
+
+
+class Diario:
+    """
+    Diario de escritura anticipada (WAL) del repositorio XML. Cada cambio se
+    anexa como una línea JSON con un número de secuencia (lsn); los commits
+    esperan el fsync del diario, no la escritura de los XML. Los XML hacen de
+    instantánea: al escribirlos se guarda en `punto` el lsn que cubren y los
+    segmentos ya cubiertos se borran. Al arrancar se aplican sobre los XML
+    los registros con lsn mayor que el punto.
+    """
+
+    def __init__(self, carpeta: str, max_bytes_segmento: int = 8 * 1024 * 1024):
+        self.carpeta = carpeta
+        self.max_bytes_segmento = max_bytes_segmento
+        self.lock = threading.RLock()
+        self._sync = threading.Lock()  # fsync y cierre del segmento; se toma después de self.lock
+        self._fh = None  # segmento activo abierto
+        self._activo: Optional[int] = None
+        self._cerrados: List[Tuple[int, int]] = []  # (segmento, último lsn) escritos por este proceso
+        self.lsn = 0  # último lsn asignado
+        self.sincronizado = 0  # último lsn en disco
+        self.punto = 0
+        self.registros: List[Dict] = []  # pendientes de instantánea (lsn > punto), en orden
+        self._firma = None
+        self.recargar()
+
+    # --------- Segmentos ---------
+    def _path(self, n: int) -> str:
+        return os.path.join(self.carpeta, f"seg-{n:06d}.log")
+
+    @property
+    def path_punto(self) -> str:
+        return os.path.join(self.carpeta, PUNTO_FILE)
+
+    def segmentos(self) -> List[int]:
+        if not os.path.isdir(self.carpeta):
+            return []
+        return sorted(int(m.group(1)) for m in map(SEG_RX.match, os.listdir(self.carpeta)) if m)
+
+    def _estado_disco(self):
+        try:
+            punto = os.stat(self.path_punto).st_mtime_ns
+        except FileNotFoundError:
+            punto = None
+        return punto, tuple((n, os.path.getsize(self._path(n))) for n in self.segmentos())
+
+    # --------- Carga ---------
+    def recargar(self) -> bool:
+        """
+        Vuelve a leer el punto y los segmentos (al arrancar o si otro proceso
+        pudo escribirlos). Devuelve True si cambió algo respecto de la última vez.
+        """
+        with self.lock:
+            estado = self._estado_disco()
+            if estado == self._firma:
+                return False
+            self._cerrar_activo()
+            try:
+                with open(self.path_punto, encoding="utf-8") as f:
+                    self.punto = int(f.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                self.punto = 0
+            self.registros = []
+            self._cerrados = []
+            maximo = self.punto
+            for n in self.segmentos():
+                ultimo = 0
+                for reg in self._leer(n):
+                    ultimo = reg["lsn"]
+                    if reg["lsn"] > self.punto:
+                        self.registros.append(reg)
+                maximo = max(maximo, ultimo)
+                self._cerrados.append((n, ultimo))
+            self.registros.sort(key=lambda r: r["lsn"])
+            self.lsn = self.sincronizado = max(self.lsn, maximo)
+            self._firma = estado
+            return True
+
+    def _leer(self, n: int) -> Iterator[Dict]:
+        with open(self._path(n), "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    return  # línea a medias por un corte: es el final del segmento
+                try:
+                    reg = json.loads(linea)
+                    int(reg["lsn"])
+                except (ValueError, KeyError, TypeError):
+                    return
+                yield reg
+
+    def claves(self) -> Set[str]:
+        """Colecciones con registros pendientes ("*" = todas, por un init)."""
+        with self.lock:
+            return {r["col"] for r in self.registros}
+
+    def de(self, key: str) -> List[Dict]:
+        """Registros pendientes que afectan a una colección, en orden."""
+        with self.lock:
+            return [r for r in self.registros if r["col"] in (key, "*")]
+
+    # --------- Escritura ---------
+    def anexar(self, col: str, op: str, **datos) -> int:
+        """Agrega un registro (sin fsync; ver sincronizar) y devuelve su lsn."""
+        with self.lock:
+            if self._fh is None:
+                os.makedirs(self.carpeta, exist_ok=True)
+                segs = self.segmentos()
+                # como en el log de consumos: nunca se sigue un segmento ajeno o
+                # de una corrida anterior, que puede terminar en una línea a medias
+                self._activo = segs[-1] + 1 if segs else 1
+                self._fh = open(self._path(self._activo), "ab")
+            self.lsn += 1
+            reg = dict(datos, lsn=self.lsn, col=col, op=op)
+            self._fh.write((json.dumps(reg, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+            self.registros.append(reg)
+            if self._fh.tell() >= self.max_bytes_segmento:
+                self._cerrar_activo()
+            return self.lsn
+
+    @property
+    def sin_sincronizar(self) -> bool:
+        return self.sincronizado < self.lsn
+
+    def sincronizar(self) -> int:
+        """fsync de lo anexado hasta ahora; devuelve el lsn que quedó en disco."""
+        with self.lock:
+            fh, hasta = self._fh, self.lsn
+            if fh is not None:
+                fh.flush()
+        if fh is not None and hasta > self.sincronizado:
+            # sin el lock: otros hilos siguen anexando mientras dura el fsync
+            with self._sync:
+                if not fh.closed:  # si se cerró, el cierre ya hizo el fsync
+                    os.fsync(fh.fileno())
+        with self.lock:
+            self.sincronizado = max(self.sincronizado, hasta)
+        return hasta
+
+    def _cerrar_activo(self) -> None:
+        if self._fh is None:
+            return
+        with self._sync:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._fh.close()
+        self._cerrados.append((self._activo, self.lsn))
+        self.sincronizado = max(self.sincronizado, self.lsn)
+        self._fh = None
+        self._activo = None
+
+    # --------- Instantáneas ---------
+    def rotar(self) -> int:
+        """Cierra el segmento activo y devuelve el lsn que cubre una instantánea tomada ahora."""
+        with self.lock:
+            self._cerrar_activo()
+            return self.lsn
+
+    def instantanea(self, lsn: int) -> Tuple[str, bytes]:
+        """(ruta, contenido) del punto; se escribe al final, después de los XML."""
+        return self.path_punto, str(lsn).encode("ascii")
+
+    def truncar(self, lsn: int) -> None:
+        """Los XML ya cubren hasta `lsn`: se olvidan esos registros y sus segmentos."""
+        with self.lock:
+            self.punto = max(self.punto, lsn)
+            self.registros = [r for r in self.registros if r["lsn"] > self.punto]
+            quedan = []
+            for n, ultimo in self._cerrados:
+                if ultimo <= self.punto and n != self._activo:
+                    try:
+                        os.remove(self._path(n))
+                    except FileNotFoundError:
+                        pass
+                else:
+                    quedan.append((n, ultimo))
+            self._cerrados = quedan
+            self._firma = self._estado_disco()
+
+    def reiniciar(self) -> None:
+        """Borra todos los segmentos: los XML recién inicializados son el nuevo punto de partida."""
+        with self.lock:
+            self._cerrar_activo()
+            for n in self.segmentos():
+                os.remove(self._path(n))
+            os.makedirs(self.carpeta, exist_ok=True)
+            escribir_atomico(*self.instantanea(self.lsn))
+            self.punto = self.lsn
+            self.registros = []
+            self._cerrados = []
+            self._firma = self._estado_disco()
+
+    def cerrar(self) -> None:
+        with self.lock:
+            self._cerrar_activo()
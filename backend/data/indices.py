@@ -0,0 +1,172 @@
+# backend/data/indices.py
+import bisect
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.entidades import ts_fecha_hora
+
+
+def _int(s, default: int = -1) -> int:
+    try:
+        return int(s)
+    except (TypeError, ValueError):
+        return default
+
+
+class IdsOrdenados:
+    """Ids en orden ascendente, para paginar con cursor (el último id visto) en O(log n)."""
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._ids: List[int] = sorted(ids)
+
+    def agregar(self, id_: int) -> None:
+        # los ids salen de secuencias: casi siempre van al final
+        if not self._ids or self._ids[-1] < id_:
+            self._ids.append(id_)
+        else:
+            i = bisect.bisect_left(self._ids, id_)
+            if i == len(self._ids) or self._ids[i] != id_:
+                self._ids.insert(i, id_)
+
+    def despues(self, id_: int, limite: int) -> List[int]:
+        i = bisect.bisect_right(self._ids, id_)
+        return self._ids[i:i + limite]
+
+    def ultimo(self) -> int:
+        return self._ids[-1] if self._ids else 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class IndiceClientes:
+    """
+    Índices hash sobre clientes_instancias.xml. No guarda elementos salvo
+    el de cada instancia, que se arma en el primer instancia() (así el
+    índice se puede restaurar de la caché sin leer el XML).
+    """
+
+    def __init__(self, root: Optional[ET.Element] = None):
+        self.por_nit: Dict[str, int] = {}
+        self.cliente_de_instancia: Dict[int, int] = {}
+        self.config_de_instancia: Dict[int, int] = {}
+        self.instancias_por_cliente: Dict[int, List[int]] = {}
+        self.instancias_por_config: Dict[int, List[int]] = {}
+        self.ids_instancias = IdsOrdenados()
+        self._elementos: Optional[Dict[int, ET.Element]] = None
+        if root is not None:
+            self._elementos = {}
+            for cl in root.findall("./cliente"):
+                cid = _int(cl.get("id"))
+                self.agregar_cliente(cid, cl.findtext("nit") or "")
+                for ins in cl.findall("./instancias/instancia"):
+                    self.agregar_instancia(ins, cid)
+
+    def agregar_cliente(self, cliente_id: int, nit: str) -> None:
+        self.por_nit[nit.upper()] = cliente_id
+        self.instancias_por_cliente.setdefault(cliente_id, [])
+
+    def agregar_instancia(self, ins: ET.Element, cliente_id: int) -> None:
+        iid = _int(ins.get("id"))
+        cfg_id = _int(ins.findtext("configuracion_id"))
+        if self._elementos is not None:
+            self._elementos[iid] = ins
+        self.ids_instancias.agregar(iid)
+        self.cliente_de_instancia[iid] = cliente_id
+        self.config_de_instancia[iid] = cfg_id
+        self.instancias_por_cliente.setdefault(cliente_id, []).append(iid)
+        self.instancias_por_config.setdefault(cfg_id, []).append(iid)
+
+    def instancia(self, instancia_id: int, root: ET.Element) -> Optional[ET.Element]:
+        if self._elementos is None:
+            self._elementos = {_int(ins.get("id")): ins for ins in root.iterfind("./cliente/instancias/instancia")}
+        return self._elementos.get(instancia_id)
+
+    # --------- Caché ---------
+    def estado(self) -> tuple:
+        return (self.por_nit, self.cliente_de_instancia, self.config_de_instancia, self.instancias_por_cliente,
+                self.instancias_por_config, self.ids_instancias._ids)
+
+    @classmethod
+    def desde_estado(cls, estado: tuple) -> "IndiceClientes":
+        idx = cls()
+        (idx.por_nit, idx.cliente_de_instancia, idx.config_de_instancia, idx.instancias_por_cliente,
+         idx.instancias_por_config, ids) = estado
+        idx.ids_instancias = IdsOrdenados(ids)
+        return idx
+
+
+class IndiceConfiguraciones:
+    """Configuraciones por nombre."""
+
+    def __init__(self, root: Optional[ET.Element] = None):
+        self.por_nombre: Dict[str, int] = {}
+        if root is not None:
+            for cfg in root.findall("./configuracion"):
+                self.agregar(_int(cfg.get("id")), cfg.findtext("nombre") or "")
+
+    def agregar(self, cfg_id: int, nombre: str) -> None:
+        self.por_nombre[nombre] = cfg_id
+
+    def estado(self) -> dict:
+        return self.por_nombre
+
+    @classmethod
+    def desde_estado(cls, estado: dict) -> "IndiceConfiguraciones":
+        idx = cls()
+        idx.por_nombre = estado
+        return idx
+
+
+class IndiceConsumos:
+    """
+    Índice ordenado de consumos por (instancia_id, fecha_hora). Se guarda una
+    lista ordenada de (timestamp, id) por instancia, así una consulta por
+    rango es un par de bisect y las lecturas horarias casi siempre se
+    anexan al final de la lista.
+    """
+
+    def __init__(self, registros: Iterable[Tuple[int, int, str]] = ()):
+        self.por_instancia: Dict[int, List[Tuple[int, int]]] = {}
+        self._ids = set()
+        for cid, iid, fecha_hora in registros:
+            self.agregar(cid, iid, fecha_hora)
+
+    def agregar(self, consumo_id: int, instancia_id: int, fecha_hora: str) -> None:
+        if consumo_id in self._ids:
+            return  # el mismo consumo puede estar en el log y en consumos.xml
+        self._ids.add(consumo_id)
+        try:
+            ts = ts_fecha_hora(fecha_hora)
+        except ValueError:
+            ts = 0
+        lista = self.por_instancia.setdefault(instancia_id, [])
+        clave = (ts, consumo_id)
+        if not lista or lista[-1] <= clave:
+            lista.append(clave)
+        else:
+            bisect.insort(lista, clave)
+
+    def rango(self, instancia_id: int, desde: Optional[int] = None, hasta: Optional[int] = None) -> List[int]:
+        """Ids de consumos de la instancia con desde <= ts <= hasta (timestamps)."""
+        lista = self.por_instancia.get(instancia_id, [])
+        a = 0 if desde is None else bisect.bisect_left(lista, (desde, -1))
+        b = len(lista) if hasta is None else bisect.bisect_right(lista, (hasta, float("inf")))
+        return [cid for _, cid in lista[a:b]]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def estado(self) -> tuple:
+        return self.por_instancia, self._ids
+
+    @classmethod
+    def desde_estado(cls, estado: tuple) -> "IndiceConsumos":
+        idx = cls()
+        idx.por_instancia, idx._ids = estado
+        return idx
+
+
+def registros_consumo_xml(root: ET.Element) -> Iterable[Tuple[int, int, str]]:
+    for e in root.findall("./consumo"):
+        yield _int(e.get("id")), _int(e.findtext("instancia_id")), e.findtext("fecha_hora") or ""
@@ -0,0 +1,268 @@
+# backend/data/inventario.py
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from data.archivos import BloqueoArchivo, escribir_atomico, firma
+
+# Productos de inventario.json. Se tienen en memoria en un dict por id (get,
+# update y delete O(1)); cada cambio se anexa a un diario de sólo-anexar
+# (una línea JSON por operación) y el diario se compacta hacia
+# inventario.json en segundo plano.
+INVENTARIO_PATH = os.environ.get(
+    "INVENTARIO_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "inventario.json"))
+# operaciones en el diario que disparan una compactación
+INVENTARIO_COMPACTAR_CADA = int(os.environ.get("INVENTARIO_COMPACTAR_CADA", "500"))
+
+CAMPOS = ("nombre", "categoria", "descripcion", "precio", "cantidad", "fecha_vencimiento")
+FECHA_RX = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def validar(datos: Dict, parcial: bool = False) -> Dict:
+    """Campos conocidos de un producto con su tipo; ValueError si algo no sirve."""
+    if not isinstance(datos, dict):
+        raise ValueError("se esperaba un objeto JSON")
+    res = {}
+    for campo in CAMPOS:
+        if campo not in datos:
+            continue
+        v = datos[campo]
+        if campo in ("precio", "cantidad"):
+            # bool es int para Python, pero true no es un precio
+            if isinstance(v, bool) or not isinstance(v, (int, float, str)):
+                raise ValueError(f"{campo} debe ser un número")
+            try:
+                v = float(v)
+            except (ValueError, OverflowError):
+                raise ValueError(f"{campo} debe ser un número") from None
+            # nan/inf no son JSON válido
+            if not math.isfinite(v):
+                raise ValueError(f"{campo} debe ser un número finito")
+            if campo == "cantidad":
+                if not v.is_integer():
+                    raise ValueError("cantidad debe ser un número entero")
+                v = int(v)
+            if v < 0:
+                raise ValueError("El precio no puede ser negativo" if campo == "precio"
+                                 else "La cantidad no puede ser negativa")
+        elif campo == "fecha_vencimiento":
+            v = "" if v is None else v
+            if not isinstance(v, str) or (v and not FECHA_RX.match(v)):
+                raise ValueError("fecha_vencimiento debe ser yyyy-mm-dd")
+        elif not isinstance(v, str):
+            # str() haría "None" o "True" de un null o un booleano
+            raise ValueError(f"{campo} debe ser texto")
+        res[campo] = v
+    if not parcial:
+        faltan = [c for c in ("nombre", "precio", "cantidad") if not res.get(c) and res.get(c) != 0]
+        if faltan:
+            raise ValueError(f"faltan campos: {', '.join(faltan)}")
+    return res
+
+
+class Inventario:
+    """
+    Productos indexados por id. Las lecturas salen de memoria; si otro
+    proceso escribió el diario o compactó, se lee lo nuevo antes de
+    responder (sólo la cola del diario si el archivo es el mismo).
+    """
+
+    def __init__(self, path: str, compactar_cada: int = INVENTARIO_COMPACTAR_CADA):
+        self.path = path
+        self.diario = path + ".diario"
+        self.rotado = path + ".diario.compactando"  # diario ya cerrado, en compactación
+        self.compactar_cada = compactar_cada
+        self.lock = threading.RLock()
+        self._bloqueo = BloqueoArchivo(path + ".lock")
+        self._productos: Dict[str, Dict] = {}
+        self._firmas = None  # (inventario.json, diario rotado, diario) al último leerlos
+        self._offset = 0  # bytes del diario ya aplicados
+        self.en_diario = 0  # operaciones en el diario sin compactar
+        self._compactando = threading.Lock()
+
+    # --------- Carga ---------
+    def _leer_diario(self, path: str, desde: int = 0) -> int:
+        """Aplica las operaciones del diario desde un offset; devuelve hasta dónde leyó."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            f.seek(desde)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea a medias (corte o escritura en curso): queda para después
+                desde += len(linea)
+                try:
+                    op = json.loads(linea)
+                    if op["op"] == "put":
+                        self._productos[op["producto"]["id"]] = op["producto"]
+                    else:
+                        self._productos.pop(op["id"], None)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.en_diario += 1
+        return desde
+
+    def _cargar(self) -> None:
+        firmas = (firma(self.path), firma(self.rotado), firma(self.diario))
+        if firmas == self._firmas:
+            return
+        previas = self._firmas
+        if (previas is not None and firmas[:2] == previas[:2] and previas[2] is not None
+                and firmas[2] is not None and firmas[2][0] == previas[2][0]):
+            # mismo diario que creció: sólo la cola
+            self._offset = self._leer_diario(self.diario, self._offset)
+        else:
+            self._productos = {}
+            self.en_diario = 0
+            if firmas[0] is not None:
+                with open(self.path, encoding="utf-8") as f:
+                    for p in json.load(f):
+                        self._productos[p["id"]] = p
+            self._leer_diario(self.rotado)
+            self._offset = self._leer_diario(self.diario)
+        self._firmas = (firma(self.path), firma(self.rotado), firma(self.diario))
+
+    # --------- Lectura ---------
+    def listar(self) -> List[Dict]:
+        with self.lock:
+            self._cargar()
+            return [dict(p) for p in self._productos.values()]
+
+    def obtener(self, id_: str) -> Optional[Dict]:
+        with self.lock:
+            self._cargar()
+            p = self._productos.get(id_)
+            return dict(p) if p is not None else None
+
+    # --------- Escritura ---------
+    def _anexar(self, op: Dict) -> None:
+        linea = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.diario, "ab") as f:
+            f.write(linea)
+            f.flush()
+            os.fsync(f.fileno())
+        self._offset += len(linea)
+        self.en_diario += 1
+        self._firmas = self._firmas[:2] + (firma(self.diario),)
+
+    def _escribir(self, fn):
+        # bajo el bloqueo entre procesos: se lee lo de los demás, se aplica y se anexa
+        with self.lock:
+            self._bloqueo.tomar()
+            try:
+                self._cargar()
+                res = fn()
+            finally:
+                self._bloqueo.soltar()
+            pendientes = self.en_diario
+        if pendientes >= self.compactar_cada and not self._compactando.locked():
+            threading.Thread(target=self.compactar, name="inventario-compactar", daemon=True).start()
+        return res
+
+    def crear(self, datos: Dict) -> Dict:
+        producto = {"id": str(uuid.uuid4())}
+        producto.update(validar(datos))
+
+        def op():
+            self._anexar({"op": "put", "producto": producto})
+            self._productos[producto["id"]] = producto
+            return dict(producto)
+        return self._escribir(op)
+
+    def actualizar(self, id_: str, datos: Dict) -> Optional[Dict]:
+        """Actualiza los campos dados; None si el producto no existe."""
+        cambios = validar(datos, parcial=True)
+
+        def op():
+            actual = self._productos.get(id_)
+            if actual is None:
+                return None
+            producto = dict(actual, **cambios)
+            self._anexar({"op": "put", "producto": producto})
+            self._productos[id_] = producto
+            return dict(producto)
+        return self._escribir(op)
+
+    def eliminar(self, id_: str) -> bool:
+        def op():
+            if id_ not in self._productos:
+                return False
+            self._anexar({"op": "del", "id": id_})
+            del self._productos[id_]
+            return True
+        return self._escribir(op)
+
+    # --------- Compactación ---------
+    def compactar(self) -> int:
+        """
+        Vuelca el estado a inventario.json y borra el diario. Devuelve cuántas
+        operaciones se compactaron. Las escrituras siguen durante el volcado:
+        el diario se cierra (renombra) y las nuevas van a uno nuevo.
+        """
+        with self._compactando:
+            with self.lock:
+                self._bloqueo.tomar()
+                try:
+                    self._cargar()
+                    n = self.en_diario
+                    if n == 0:
+                        return 0
+                    productos = [dict(p) for p in self._productos.values()]
+                    if os.path.exists(self.diario):
+                        if os.path.exists(self.rotado):
+                            # quedó uno de una compactación cortada: se juntan en orden
+                            with open(self.diario, "rb") as src, open(self.rotado, "ab") as dst:
+                                dst.write(src.read())
+                                dst.flush()
+                                os.fsync(dst.fileno())
+                            os.remove(self.diario)
+                        else:
+                            os.replace(self.diario, self.rotado)
+                    self._offset = 0
+                    self.en_diario = 0
+                    self._firmas = (firma(self.path), firma(self.rotado), None)
+                    rotado = self._firmas[1]
+                finally:
+                    self._bloqueo.soltar()
+            # el JSON se arma sin bloquear a nadie; un corte antes de escribirlo
+            # deja inventario.json viejo + el rotado, que se vuelve a aplicar al cargar
+            datos = (json.dumps(productos, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+            with self.lock:
+                self._bloqueo.tomar()
+                try:
+                    if firma(self.rotado) != rotado:
+                        return 0  # otro proceso ya lo compactó junto con lo suyo
+                    escribir_atomico(self.path, datos)
+                    os.remove(self.rotado)
+                    self._firmas = (firma(self.path), None) + self._firmas[2:]
+                finally:
+                    self._bloqueo.soltar()
+            return n
+
+
+_inventario = None
+_creando = threading.Lock()
+
+
+def _tras_fork() -> None:
+    global _inventario, _creando
+    _inventario = None
+    _creando = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def get_inventario() -> Inventario:
+    global _inventario
+    with _creando:
+        if _inventario is None:
+            _inventario = Inventario(INVENTARIO_PATH)
+        return _inventario
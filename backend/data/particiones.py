@@ -0,0 +1,174 @@
+# backend/data/particiones.py
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from data.archivos import escribir_varios, firma
+from models.entidades import fecha_hora_de_ts
+
+# Archivo de partición: cabecera + columnas contiguas (little-endian)
+#   <4s magic><I filas> | id q | instancia_id q | recurso_id q | horas d | fecha_ts q
+# Al lado, <archivo>.fact guarda el flag facturado (1 byte por fila); es lo
+# único que cambia después de escrito el archivo.
+MAGIC = b"CPR1"
+CABECERA = struct.Struct("<4sI")
+COLUMNAS = (
+    ("id", "<i8"),
+    ("instancia_id", "<i8"),
+    ("recurso_id", "<i8"),
+    ("horas", "<f8"),
+    ("fecha_ts", "<i8"),
+)
+PART_RX = re.compile(r'^(\d{4})-(\d{2})\.([a-z0-9]+)\.bin$')
+
+# (id, instancia_id, recurso_id, horas, fecha_ts, facturado)
+FilaParticion = Tuple[int, int, int, float, int, int]
+
+
+def mes_de_ts(ts: int) -> str:
+    d = fecha_hora_de_ts(ts)
+    return f"{d[6:10]}-{d[3:5]}"
+
+
+class ParticionesConsumos:
+    """
+    Consumos particionados por mes en archivos binarios columnares. Cada
+    archivo es inmutable una vez escrito (los consumos tardíos de un mes van
+    a un archivo nuevo); lo cacheado se valida con la firma del archivo y de
+    su .fact, que otro proceso pudo reescribir. Una consulta por rango sólo
+    abre los meses que se traslapan.
+    """
+
+    def __init__(self, carpeta: str, max_cache: int = 64):
+        self.carpeta = carpeta
+        self.max_cache = max_cache
+        self.lock = threading.RLock()
+        # nombre -> (firma .bin, firma .fact, columnas)
+        self._cache: "OrderedDict[str, Tuple]" = OrderedDict()
+
+    # --------- Archivos ---------
+    def archivos(self) -> List[Tuple[str, str]]:
+        """(mes 'yyyy-mm', nombre) de todas las particiones, ordenadas."""
+        if not os.path.isdir(self.carpeta):
+            return []
+        res = []
+        for nombre in os.listdir(self.carpeta):
+            m = PART_RX.match(nombre)
+            if m:
+                res.append((f"{m.group(1)}-{m.group(2)}", nombre))
+        return sorted(res)
+
+    def existe(self) -> bool:
+        return os.path.isdir(self.carpeta)
+
+    def escribir(self, filas: Iterable[FilaParticion], sufijo: str) -> List[str]:
+        """
+        Reparte las filas por mes y escribe un archivo '<mes>.<sufijo>.bin' por
+        cada mes. Con el mismo sufijo el resultado es el mismo archivo, así
+        repetir una compactación interrumpida no duplica filas.
+        """
+        por_mes: Dict[str, List[FilaParticion]] = {}
+        for f in filas:
+            por_mes.setdefault(mes_de_ts(f[4]), []).append(f)
+        os.makedirs(self.carpeta, exist_ok=True)
+        escritos, archivos = [], []
+        for mes, lista in por_mes.items():
+            lista.sort(key=lambda f: (f[4], f[0]))
+            nombre = f"{mes}.{sufijo}.bin"
+            path = os.path.join(self.carpeta, nombre)
+            datos = CABECERA.pack(MAGIC, len(lista)) + b"".join(
+                np.asarray([f[k] for f in lista], dtype=dtype).tobytes() for k, (_, dtype) in enumerate(COLUMNAS))
+            # el .fact se renombra antes que su .bin: una partición visible ya tiene sus marcas
+            archivos.append((path + ".fact", np.asarray([f[5] for f in lista], dtype=np.int8).tobytes()))
+            archivos.append((path, datos))
+            escritos.append(nombre)
+        escribir_varios(archivos)
+        with self.lock:
+            for nombre in escritos:
+                self._cache.pop(nombre, None)
+        return escritos
+
+    def _leer(self, nombre: str) -> Dict[str, np.ndarray]:
+        path = os.path.join(self.carpeta, nombre)
+        fact = path + ".fact"
+        firmas = (firma(path), firma(fact))
+        with self.lock:
+            entrada = self._cache.get(nombre)
+            if entrada is not None and entrada[:2] == firmas:
+                self._cache.move_to_end(nombre)
+                return entrada[2]
+        with open(path, "rb") as fh:
+            magic, n = CABECERA.unpack(fh.read(CABECERA.size))
+            if magic != MAGIC:
+                raise ValueError(f"partición inválida: {nombre}")
+            cols = {col: np.fromfile(fh, dtype=dtype, count=n) for col, dtype in COLUMNAS}
+        cols["facturado"] = (np.fromfile(fact, dtype=np.int8) if firmas[1] is not None
+                             else np.zeros(n, dtype=np.int8))
+        with self.lock:
+            self._cache[nombre] = firmas + (cols,)
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return cols
+
+    # --------- Consultas ---------
+    def rango(self, desde_ts: int, hasta_ts: int) -> Dict[str, np.ndarray]:
+        """
+        Consumos con desde_ts <= fecha_ts <= hasta_ts. Además de las columnas
+        devuelve '_archivo' (índice en '_archivos') y '_pos' para poder marcar
+        facturados después.
+        """
+        desde_mes, hasta_mes = mes_de_ts(desde_ts), mes_de_ts(hasta_ts)
+        partes, nombres = [], []
+        for mes, nombre in self.archivos():
+            if desde_mes <= mes <= hasta_mes:
+                cols = self._leer(nombre)
+                ts = cols["fecha_ts"]  # cada archivo está ordenado por fecha
+                a = int(np.searchsorted(ts, desde_ts, side="left"))
+                b = int(np.searchsorted(ts, hasta_ts, side="right"))
+                if b > a:
+                    sel = {k: v[a:b] for k, v in cols.items()}
+                    sel["_archivo"] = np.full(b - a, len(nombres), dtype=np.int64)
+                    sel["_pos"] = np.arange(a, b, dtype=np.int64)
+                    partes.append(sel)
+                    nombres.append(nombre)
+        if not partes:
+            res = {col: np.empty(0, dtype=dtype) for col, dtype in COLUMNAS}
+            res["facturado"] = np.empty(0, dtype=np.int8)
+            res["_archivo"] = res["_pos"] = np.empty(0, dtype=np.int64)
+        else:
+            res = {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+        res["_archivos"] = nombres
+        return res
+
+    def marcar_facturados(self, sel: Dict[str, np.ndarray], filas: np.ndarray) -> None:
+        """Pone facturado=1 en las filas `filas` de un resultado de rango()."""
+        archivos = sel["_archivos"]
+        marcados = []
+        for k in np.unique(sel["_archivo"][filas]):
+            nombre = archivos[int(k)]
+            pos = sel["_pos"][filas][sel["_archivo"][filas] == k]
+            cols = self._leer(nombre)
+            facturado = cols["facturado"].copy()  # la caché no cambia si la escritura falla
+            facturado[pos] = 1
+            marcados.append((nombre, cols, facturado))
+        escribir_varios([(os.path.join(self.carpeta, nombre) + ".fact", facturado.tobytes())
+                         for nombre, _, facturado in marcados])
+        for nombre, cols, facturado in marcados:
+            cols["facturado"] = facturado
+            path = os.path.join(self.carpeta, nombre)
+            with self.lock:
+                if nombre in self._cache:
+                    self._cache[nombre] = (firma(path), firma(path + ".fact"), cols)
+
+    def reiniciar(self) -> None:
+        with self.lock:
+            self._cache.clear()
+            if os.path.isdir(self.carpeta):
+                for nombre in os.listdir(self.carpeta):
+                    os.remove(os.path.join(self.carpeta, nombre))
+            os.makedirs(self.carpeta, exist_ok=True)
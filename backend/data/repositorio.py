@@ -0,0 +1,616 @@
+# backend/data/repositorio.py
+import atexit
+import io
+import os
+import queue
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data import cache_xml, codec_xml
+from data.archivos import BloqueoArchivo, escribir_varios, escribir_atomico, firma
+from data.diario import Diario
+from data.indices import IdsOrdenados
+from servicios.metricas import (
+    DIARIO_REGISTROS, DIARIO_SINCRONIZACION, XML_CARGA, XML_ESCRITOS_BYTES, XML_ESCRITURA, XML_ESCRITURAS,
+    XML_LECTURAS, XML_LEIDOS_BYTES,
+)
+
+# Políticas de escritura diferida:
+#   commit    -> cada commit() espera a que sus cambios estén en disco
+#   intervalo -> un hilo escribe las colecciones sucias cada N ms
+#   cierre    -> sólo se escribe al llamar flush() o al terminar el proceso
+#   diario    -> cada commit() espera al fsync del diario (WAL, data/diario.py);
+#                los XML se escriben como instantánea cada N ms o al llenarse el diario
+# Con varios procesos: commit suelta el bloqueo entre procesos al terminar
+# cada commit y diario al escribir la instantánea (a lo sumo N ms después).
+# intervalo y cierre dejan cambios sólo en memoria, así que son de un solo
+# proceso: el primero que escribe se queda con el bloqueo hasta cerrar() y
+# otro proceso que quiera escribir falla en vez de esperarlo.
+POLITICAS = ("commit", "intervalo", "cierre", "diario")
+
+
+def _serializar(tree: ET.ElementTree) -> bytes:
+    return codec_xml.tostring(tree)
+
+
+def _max_ids(root: ET.Element) -> Dict[str, int]:
+    """Mayor atributo id por tag en todo el árbol."""
+    res: Dict[str, int] = {}
+    for e in root.iter():
+        v = e.get("id")
+        if v is None:
+            continue
+        try:
+            v = int(v)
+        except ValueError:
+            continue
+        if v > res.get(e.tag, 0):
+            res[e.tag] = v
+    return res
+
+
+class Coleccion:
+    """
+    Un archivo XML en memoria, con sus elementos de primer nivel indexados
+    por id. Con `leer`, el árbol se lee recién en el primer acceso a
+    tree/root/por_id/ids; hasta entonces sirve lo que vino de la caché
+    (índice secundario, máximos ids).
+    """
+
+    def __init__(self, key: str, tree: ET.ElementTree = None,
+                 leer: Callable[["Coleccion"], ET.ElementTree] = None):
+        self.key = key
+        self._leer = leer
+        self._tree = None
+        self._root = None
+        self._por_id: Dict[int, ET.Element] = {}
+        self._ids = IdsOrdenados()  # para paginar por id
+        self.indice = None  # índice secundario (ver data/indices.py); muere con la colección
+        self.sucio = False
+        self.firma = None  # versión del archivo en disco que refleja la memoria
+        self.hash = None  # hash de esa versión (clave de la caché)
+        self.cache: Optional[Dict[str, Any]] = None  # datos de la caché válidos para `firma`
+        if tree is not None:
+            self._poner(tree)
+
+    @property
+    def cargada(self) -> bool:
+        return self._tree is not None
+
+    def _cargar(self) -> None:
+        if self._tree is None:
+            self._poner(self._leer(self))
+
+    @property
+    def tree(self) -> ET.ElementTree:
+        self._cargar()
+        return self._tree
+
+    @property
+    def root(self) -> ET.Element:
+        self._cargar()
+        return self._root
+
+    @property
+    def por_id(self) -> Dict[int, ET.Element]:
+        self._cargar()
+        return self._por_id
+
+    @property
+    def ids(self) -> IdsOrdenados:
+        self._cargar()
+        return self._ids
+
+    def _poner(self, tree: ET.ElementTree) -> None:
+        self._tree = tree
+        self._root = tree.getroot()
+        self.reindexar()
+
+    def reindexar(self) -> None:
+        por_id = {}
+        for e in self.root:
+            try:
+                por_id[int(e.get("id", ""))] = e
+            except ValueError:
+                pass
+        self._por_id = por_id
+        self._ids = IdsOrdenados(por_id)
+
+    def reemplazar(self, tree: ET.ElementTree) -> None:
+        self._poner(tree)
+        self.indice = None
+        self.cache = None
+
+    def agregar(self, tag: str, id_: int, **attrs) -> ET.Element:
+        e = codec_xml.SubElement(self.root, tag, id=str(id_), **attrs)
+        self._por_id[id_] = e
+        self._ids.agregar(id_)
+        return e
+
+    def get(self, id_: int) -> Optional[ET.Element]:
+        return self.por_id.get(int(id_))
+
+    def max_id(self, tag: str) -> int:
+        """Mayor id de los elementos <tag> (de la caché si el árbol no se leyó)."""
+        if self._tree is None and self.cache is not None:
+            return self.cache["max_ids"].get(tag, 0)
+        return _max_ids(self.root).get(tag, 0)
+
+
+class Pedido:
+    __slots__ = ("version", "listo", "error")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.listo = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class Escritor:
+    """
+    Hilo único que escribe a disco. Cada commit() deja un pedido en la cola y
+    espera; el hilo toma todos los pedidos acumulados y los resuelve con una
+    sola escritura (group commit): con más hilos hay menos fsync por operación.
+    """
+
+    def __init__(self, persistir: Callable[[], None], fallo: Callable[[int], Optional[BaseException]]):
+        self._persistir = persistir
+        self._fallo = fallo
+        self._cola: "queue.Queue[Pedido]" = queue.Queue()
+        self.pasadas = 0  # escrituras hechas
+        self.pedidos = 0  # commits atendidos
+        self._hilo = threading.Thread(target=self._ciclo, name="xml-escritor", daemon=True)
+        self._hilo.start()
+
+    def esperar(self, version: int) -> None:
+        """Bloquea hasta que lo modificado hasta `version` esté en disco."""
+        p = Pedido(version)
+        self._cola.put(p)
+        p.listo.wait()
+        if p.error is not None:
+            raise p.error
+
+    def _ciclo(self) -> None:
+        while True:
+            lote = [self._cola.get()]
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._persistir()
+                error = None
+            except BaseException as e:
+                error = e
+            self.pasadas += 1
+            self.pedidos += len(lote)
+            for p in lote:
+                p.error = error or self._fallo(p.version)
+                p.listo.set()
+
+
+class Repositorio:
+    """
+    Mantiene cada archivo XML parseado una sola vez en memoria y escribe
+    a disco únicamente las colecciones modificadas, según la política.
+
+    Las modificaciones se hacen dentro de escritura() (o transaccion()), que
+    además del lock del proceso toma un bloqueo de archivo entre procesos;
+    ese bloqueo se mantiene hasta que lo modificado quedó en disco, y al
+    tomarlo se descartan las colecciones que otro proceso cambió. Con
+    intervalo y cierre se mantiene hasta cerrar() (ver POLITICAS).
+
+    Con política diario los cambios hechos con registrar() van además al
+    diario, y lo que está sólo en el diario se vuelve a aplicar al cargar
+    cada colección; los cambios hechos con marcar() (sin registro) se
+    escriben con una instantánea en el commit, como con política commit.
+    """
+
+    def __init__(self, ruta: Callable[[str], str], raices: Dict[str, str],
+                 politica: str = "commit", intervalo_ms: int = 1000, bloqueo: str = None,
+                 diario: str = None, diario_max: int = 10000,
+                 aplicar: Callable[[Coleccion, Dict], bool] = None, cache: bool = False):
+        if politica not in POLITICAS:
+            raise ValueError(f"política de escritura inválida: {politica}")
+        if politica == "diario" and not diario:
+            raise ValueError("la política diario necesita la carpeta del diario")
+        self._ruta = ruta
+        self._raices = raices
+        self.politica = politica
+        self.intervalo_ms = intervalo_ms
+        self.lock = threading.RLock()
+        # las escrituras a disco salen en el orden en que se tomaron las
+        # instantáneas; siempre se toma después de self.lock
+        self._escribiendo = threading.Lock()
+        self._local = threading.local()  # profundidad de escritura() del hilo
+        self._bloqueo = BloqueoArchivo(bloqueo) if bloqueo else None
+        # intervalo y cierre: el bloqueo se toma sin esperar y no se suelta hasta cerrar()
+        self._dueno = self._bloqueo is not None and politica in ("intervalo", "cierre")
+        self._cols: Dict[str, Coleccion] = {}
+        self._nivel = 0  # profundidad de transacciones abiertas
+        self.version = 0  # sube con cada marcar()
+        self._fallo: Tuple[int, Optional[BaseException]] = (0, None)
+        # (ruta, bytes) que se escriben junto con los datos, antes que ellos
+        # (p.ej. las secuencias de ids); devuelven None si no hay cambios
+        self.instantaneas: List[Callable[[], Optional[Tuple[str, bytes]]]] = []
+        # se llaman al tomar el bloqueo entre procesos y tras un fallo de escritura
+        self.al_refrescar: List[Callable[[], None]] = []
+        self.diario = Diario(diario) if politica == "diario" else None
+        self.diario_max = diario_max  # registros en el diario que adelantan la instantánea
+        # aplica un registro del diario a una colección; True si la cambió
+        self.aplicar = aplicar
+        self._sin_registro = False  # hay cambios que sólo se guardan con una instantánea
+        self.cache = cache  # caché binaria junto a cada XML (data/cache_xml.py)
+        # por colección: de dónde salió y cuánto tardó (caché / parse del XML)
+        self.cargas: Dict[str, Dict[str, Any]] = {}
+        self._cache_hilos: List[threading.Thread] = []  # escrituras de caché en curso
+        self._escritor = Escritor(self._guardar if self.diario else self._persistir, self._fallo_de)
+        self._parar = threading.Event()
+        self._despertar = threading.Event()
+        self._abandonado = False
+        self._hilo = None
+        if politica in ("intervalo", "diario"):
+            self._hilo = threading.Thread(target=self._ciclo, name="xml-flush", daemon=True)
+            self._hilo.start()
+        atexit.register(self.cerrar)
+
+    # --------- Carga ---------
+    def coleccion(self, key: str) -> Coleccion:
+        """La colección en memoria; el XML se parsea en el primer uso del árbol."""
+        with self.lock:
+            col = self._cols.get(key)
+            if col is None:
+                t0 = time.perf_counter()
+                path = self._ruta(key)
+                col = Coleccion(key, leer=self._leer)
+                col.firma = firma(path)
+                guardado = cache_xml.leer(path, col.firma) if self.cache else None
+                if guardado is not None:
+                    col.cache, col.hash = guardado
+                    seg = time.perf_counter() - t0
+                    XML_CARGA.observar(seg, key, "cache")
+                    self.cargas[key] = {"origen": "cache", "ms": round(seg * 1000, 3),
+                                        "bytes": col.firma[1], "parse_ms": None}
+                else:
+                    self.cargas[key] = {"origen": "xml", "ms": None,
+                                        "bytes": col.firma[1] if col.firma else 0, "parse_ms": None}
+                self._cols[key] = col
+                if self.diario is not None:
+                    self._reaplicar(col)
+            return col
+
+    def _leer(self, col: Coleccion) -> ET.ElementTree:
+        """Lee y parsea el XML de una colección (en su primer uso)."""
+        t0 = time.perf_counter()
+        path = self._ruta(col.key)
+        fir = firma(path)  # antes de leer: si cambia en el medio, se nota después
+        if fir is None:
+            tree = codec_xml.ElementTree(codec_xml.Element(self._raices[col.key]))
+            datos = _serializar(tree)
+            escribir_atomico(path, datos)
+            fir = firma(path)
+        else:
+            with open(path, "rb") as f:
+                datos = f.read()
+            tree = codec_xml.parse(io.BytesIO(datos))
+        if fir != col.firma:
+            # cambió desde que se abrió la colección: lo que vino de la caché no vale
+            col.indice = None
+            col.cache = None
+        col.firma = fir
+        col.hash = cache_xml.hash_de(datos)
+        seg = time.perf_counter() - t0
+        XML_LECTURAS.sumar(1, col.key)
+        XML_LEIDOS_BYTES.sumar(len(datos), col.key)
+        XML_CARGA.observar(seg, col.key, "xml")
+        carga = self.cargas.setdefault(col.key, {"origen": "xml", "ms": None, "bytes": len(datos)})
+        carga["parse_ms"] = round(seg * 1000, 3)
+        if carga["ms"] is None:
+            carga["ms"] = carga["parse_ms"]
+        return tree
+
+    def guardar_cache(self, col: Coleccion, esperar: bool = False) -> bool:
+        """
+        Escribe la caché de una colección sin cambios pendientes cuyo XML no
+        la tiene al día. El contenido se arma bajo el lock; la escritura va en
+        otro hilo salvo con esperar=True.
+        """
+        with self.lock:
+            if (not self.cache or col.sucio or not col.cargada
+                    or col.hash is None or col.firma is None or self._cols.get(col.key) is not col):
+                return False
+            if col.cache is not None and (col.cache["indice"] is not None or col.indice is None):
+                return False  # la caché en disco ya tiene todo lo que hay en memoria
+            datos = {"max_ids": _max_ids(col.root), "indice": None}
+            if col.indice is not None and hasattr(col.indice, "estado"):
+                datos["indice"] = (type(col.indice).__name__, col.indice.estado())
+            contenido = cache_xml.empaquetar(col.firma, col.hash, datos)
+            col.cache = {"max_ids": datos["max_ids"], "indice": True if datos["indice"] else None}
+            path = self._ruta(col.key)
+        if esperar:
+            cache_xml.escribir(path, contenido)
+        else:
+            hilo = threading.Thread(target=cache_xml.escribir, args=(path, contenido), name="xml-cache", daemon=True)
+            with self.lock:
+                self._cache_hilos = [h for h in self._cache_hilos if h.is_alive()] + [hilo]
+                hilo.start()
+        return True
+
+    def _reaplicar(self, col: Coleccion) -> int:
+        """Aplica a una colección recién leída los registros del diario posteriores al XML."""
+        n = 0
+        for reg in self.diario.de(col.key):
+            if reg["op"] == "init":
+                for e in list(col.root):
+                    col.root.remove(e)
+                col.reindexar()
+                n += 1
+            elif self.aplicar(col, reg):
+                n += 1
+        if n:
+            col.sucio = True  # la memoria ya no es el XML en disco: va en la próxima instantánea
+            col.cache = None
+        return n
+
+    def _cargar_pendientes(self) -> None:
+        # cargar la colección es lo que aplica sus registros
+        claves = self.diario.claves()
+        for key in (self._raices if "*" in claves else claves):
+            self.coleccion(key)
+
+    def descartar(self, key: str = None) -> None:
+        """Olvida la copia en memoria (sin escribirla); se vuelve a leer en el próximo acceso."""
+        with self.lock:
+            if key is None:
+                self._cols.clear()
+            else:
+                self._cols.pop(key, None)
+
+    # --------- Bloqueo entre procesos ---------
+    @contextmanager
+    def escritura(self):
+        """Bloque que modifica colecciones: lock del proceso + bloqueo entre procesos."""
+        with self.lock:
+            if self._bloqueo is not None and not self._bloqueo.tomado:
+                if not self._bloqueo.tomar(esperar=not self._dueno):
+                    raise RuntimeError(
+                        f"XML_FLUSH={self.politica} admite un solo proceso escribiendo y otro tiene "
+                        f"{self._bloqueo.path}; con varios workers usar commit o diario")
+                self._refrescar()
+            prof = getattr(self._local, "prof", 0)
+            self._local.prof = prof + 1
+            try:
+                yield self
+            finally:
+                self._local.prof = prof
+                if prof == 0:
+                    self._soltar_bloqueo()
+
+    def _refrescar(self) -> None:
+        """Descarta lo que otro proceso cambió en disco desde que se leyó."""
+        for key, col in list(self._cols.items()):
+            if not col.sucio and col.firma != firma(self._ruta(key)):
+                del self._cols[key]
+        if self.diario is not None and self.diario.recargar():
+            # registros que dejó otro proceso sin instantánea: se vuelven a aplicar
+            claves = self.diario.claves()
+            for key in [k for k, c in self._cols.items() if not c.sucio and (k in claves or "*" in claves)]:
+                del self._cols[key]
+        for hook in self.al_refrescar:
+            hook()
+
+    def refrescar(self, key: str) -> None:
+        """
+        Para lecturas: descarta la colección si otro proceso reescribió su
+        archivo. No toma el bloqueo entre procesos (los archivos se reemplazan
+        enteros, nunca se leen a medio escribir).
+        """
+        with self.lock:
+            col = self._cols.get(key)
+            if col is not None and not col.sucio and col.firma != firma(self._ruta(key)):
+                del self._cols[key]
+
+    def ruta(self, key: str) -> str:
+        return self._ruta(key)
+
+    def _soltar_bloqueo(self) -> None:
+        if (self._bloqueo is not None and self._bloqueo.tomado and not self._dueno and self._nivel == 0
+                and not getattr(self._local, "prof", 0)
+                and not any(c.sucio for c in self._cols.values())):
+            self._bloqueo.soltar()
+
+    # --------- Escritura ---------
+    def marcar(self, key: str) -> None:
+        with self.lock:
+            col = self.coleccion(key)
+            col.sucio = True
+            col.cache = None
+            self.version += 1
+            self._sin_registro = True
+
+    def registrar(self, key: str, op: str, **datos) -> None:
+        """
+        Como marcar(), con el cambio descrito para el diario (lo que necesite
+        `aplicar` para repetirlo). Sin diario, o dentro de una transacción
+        (que se escribe entera al final), equivale a marcar().
+        """
+        with self.lock:
+            if self.diario is None or self._nivel:
+                self.marcar(key)
+                return
+            col = self.coleccion(key)
+            col.sucio = True
+            col.cache = None
+            self.version += 1
+            self.diario.anexar(key, op, **datos)
+            DIARIO_REGISTROS.sumar(1, op)
+            if len(self.diario.registros) >= self.diario_max:
+                self._despertar.set()
+
+    def commit(self) -> None:
+        """Con política commit o diario, vuelve cuando lo modificado por este hilo está en disco."""
+        if self.politica not in ("commit", "diario"):
+            return
+        if getattr(self._local, "prof", 0):
+            # este hilo tiene el lock (el escritor no podría tomarlo): se escribe aquí
+            if self._nivel == 0:
+                self._guardar() if self.diario else self._persistir()
+        else:
+            self._escritor.esperar(self.version)
+
+    def _guardar(self) -> None:
+        """Commit con diario: fsync del diario, e instantánea si hay cambios sin registro."""
+        if self.diario.sin_sincronizar:
+            with DIARIO_SINCRONIZACION.medir():
+                self.diario.sincronizar()
+        if self._sin_registro:
+            self._persistir()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._nivel:
+                return
+            self._persistir()
+
+    def guardar_instantaneas(self) -> None:
+        """Escribe ya sólo las instantáneas (secuencias), sin las colecciones."""
+        with self.lock, self._escribiendo:
+            archivos = [x for x in (f() for f in self.instantaneas) if x]
+            escribir_varios(archivos)
+        self._contar_escritos(archivos)
+
+    def _persistir(self) -> None:
+        """
+        Serializa lo pendiente bajo el lock y lo escribe a disco. Si quien llama
+        no tiene el lock (el hilo escritor), los demás hilos pueden seguir
+        modificando mientras dura la E/S.
+        """
+        with self.lock:
+            lsn = None
+            if self.diario is not None:
+                if self._bloqueo is None or self._bloqueo.tomado:
+                    self._cargar_pendientes()  # lo que esté sólo en el diario entra en la instantánea
+                self._sin_registro = False
+            sucias = [c for c in self._cols.values() if c.sucio]
+            if not sucias:
+                self._soltar_bloqueo()
+                return
+            archivos = [x for x in (f() for f in self.instantaneas) if x]
+            datos = [_serializar(c.tree) for c in sucias]
+            archivos += [(self._ruta(c.key), d) for c, d in zip(sucias, datos)]
+            if self.diario is not None:
+                # el punto va último: si está en disco, los XML que cubre también
+                lsn = self.diario.rotar()
+                archivos.append(self.diario.instantanea(lsn))
+            for c in sucias:
+                c.sucio = False
+            self._escribiendo.acquire()
+        try:
+            with XML_ESCRITURA.medir():
+                escribir_varios(archivos)
+        except BaseException as e:
+            self._escribiendo.release()
+            with self.lock:
+                # disco intacto: se vuelve a él y fallan todos los commits hasta aquí
+                for c in sucias:
+                    if self._cols.get(c.key) is c:
+                        del self._cols[c.key]
+                self._revertir()
+                for hook in self.al_refrescar:
+                    hook()
+                self._fallo = (self.version, e)
+                self._soltar_bloqueo()
+            raise
+        self._escribiendo.release()
+        self._contar_escritos(archivos)
+        with self.lock:
+            for c, d in zip(sucias, datos):
+                c.firma = firma(self._ruta(c.key))
+                c.hash = cache_xml.hash_de(d)
+                c.cache = None
+            if lsn is not None:
+                self.diario.truncar(lsn)
+            self._soltar_bloqueo()
+
+    @staticmethod
+    def _contar_escritos(archivos: List[Tuple[str, bytes]]) -> None:
+        for path, datos in archivos:
+            etiqueta = os.path.splitext(os.path.basename(path))[0]
+            XML_ESCRITURAS.sumar(1, etiqueta)
+            XML_ESCRITOS_BYTES.sumar(len(datos), etiqueta)
+
+    def _fallo_de(self, version: int) -> Optional[BaseException]:
+        hasta, error = self._fallo
+        return error if version <= hasta else None
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa varias inserciones: nada se escribe hasta salir del bloque y
+        cada archivo modificado se escribe una sola vez. Si el bloque o la
+        escritura fallan, se descartan los cambios y los archivos quedan intactos.
+        """
+        with self.escritura():
+            if self._nivel == 0:
+                self.flush()  # lo pendiente de antes no debe perderse en un rollback
+            self._nivel += 1
+            try:
+                yield self
+            except BaseException:
+                self._nivel -= 1
+                if self._nivel == 0:
+                    self._revertir()
+                raise
+            self._nivel -= 1
+            if self._nivel or self._local.prof > 1:
+                externa = False
+                if self._nivel == 0:
+                    self._persistir()  # dentro de otro bloque de escritura: aquí mismo
+            else:
+                externa = True
+        if externa:
+            self._escritor.esperar(self.version)
+
+    def _revertir(self) -> None:
+        for key in [k for k, c in self._cols.items() if c.sucio]:
+            del self._cols[key]
+
+    def _ciclo(self) -> None:
+        while True:
+            # con diario, registrar() lo despierta antes si el diario se llenó
+            self._despertar.wait(self.intervalo_ms / 1000.0)
+            self._despertar.clear()
+            if self._parar.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def abandonar(self) -> None:
+        """En el hijo de un fork: los hilos y bloqueos son del padre, no se usa más."""
+        self._abandonado = True
+        self._parar.set()
+        self._despertar.set()
+
+    def cerrar(self) -> None:
+        self._parar.set()
+        self._despertar.set()
+        if not self._abandonado:
+            self.flush()
+            if self.diario is not None:
+                self.diario.cerrar()
+            # el próximo arranque sale de la caché para lo que quedó en memoria
+            for hilo in list(self._cache_hilos):
+                hilo.join()
+            for col in list(self._cols.values()):
+                try:
+                    self.guardar_cache(col, esperar=True)
+                except OSError:
+                    pass
+            if self._dueno:
+                self._bloqueo.soltar()
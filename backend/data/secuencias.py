@@ -0,0 +1,119 @@
+# backend/data/secuencias.py
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from data import codec_xml
+from data.archivos import escribir_atomico
+
+# tipo de entidad -> (archivo, tag) de donde se reconstruye el máximo id
+ORIGENES = {
+    "recurso": ("recursos", "recurso"),
+    "categoria": ("categorias", "categoria"),
+    "configuracion": ("configuraciones", "configuracion"),
+    "cliente": ("clientes_instancias", "cliente"),
+    "instancia": ("clientes_instancias", "instancia"),
+    "consumo": ("consumos", "consumo"),
+    "factura": ("facturas", "factura"),
+    "linea": ("facturas", "linea"),
+}
+
+
+class Secuencias:
+    """
+    Generador de ids por tipo de entidad. Guarda el último id entregado
+    (high-water mark) en un XML propio; si falta un tipo, se reconstruye
+    una sola vez recorriendo el archivo de datos correspondiente.
+    """
+
+    def __init__(self, path: str, max_actual: Callable[[str], int], lock=None):
+        self.path = path
+        self._max_actual = max_actual  # tipo -> mayor id presente en los datos
+        self._valores: Dict[str, int] = {}
+        self._cargado = False
+        self.sucio = False
+        # se comparte el lock del repositorio para no cruzar el orden de bloqueo
+        self.lock = lock or threading.RLock()
+
+    def _cargar(self) -> None:
+        if self._cargado:
+            return
+        self._valores = {}
+        if os.path.exists(self.path):
+            try:
+                for e in codec_xml.parse(self.path).getroot().findall("./secuencia"):
+                    self._valores[e.get("nombre")] = int(e.get("valor", "0"))
+            except (*codec_xml.ParseError, ValueError):
+                self._valores = {}  # archivo dañado: se reconstruye desde los datos
+        self._cargado = True
+
+    def _valor(self, tipo: str) -> int:
+        self._cargar()
+        if tipo not in self._valores:
+            self._valores[tipo] = self._max_actual(tipo)
+            self.sucio = True
+        return self._valores[tipo]
+
+    def siguiente(self, tipo: str) -> int:
+        return self.reservar(tipo, 1).start
+
+    def reservar(self, tipo: str, n: int) -> range:
+        """Aparta un bloque de n ids consecutivos (útil para cargas masivas)."""
+        if n < 1:
+            raise ValueError("n debe ser >= 1")
+        with self.lock:
+            inicio = self._valor(tipo) + 1
+            self._valores[tipo] = inicio + n - 1
+            self.sucio = True
+            return range(inicio, inicio + n)
+
+    def avanzar(self, tipo: str, valor: int) -> None:
+        """Lleva la secuencia al menos hasta `valor` (ids que vuelven del diario)."""
+        with self.lock:
+            self._cargar()
+            if tipo in self._valores and self._valores[tipo] < valor:
+                self._valores[tipo] = valor
+                self.sucio = True
+
+    def actual(self, tipo: str) -> int:
+        with self.lock:
+            return self._valor(tipo)
+
+    def reconstruir(self) -> Dict[str, int]:
+        """Recalcula todos los valores desde los archivos de datos."""
+        with self.lock:
+            self._valores = {tipo: self._max_actual(tipo) for tipo in ORIGENES}
+            self._cargado = True
+            self.sucio = True
+            return dict(self._valores)
+
+    def reiniciar(self) -> None:
+        with self.lock:
+            self._valores = {}
+            self._cargado = True
+            self.sucio = False
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def recargar(self) -> None:
+        """Vuelve a leer el archivo en el próximo uso (otro proceso pudo cambiarlo)."""
+        with self.lock:
+            self._cargado = False
+            self.sucio = False
+
+    def instantanea(self) -> Optional[Tuple[str, bytes]]:
+        """(ruta, contenido) a escribir si hubo cambios; los da por guardados."""
+        with self.lock:
+            if not self.sucio:
+                return None
+            root = codec_xml.Element("secuencias")
+            for tipo in sorted(self._valores):
+                codec_xml.SubElement(root, "secuencia", nombre=tipo, valor=str(self._valores[tipo]))
+            self.sucio = False
+            return self.path, codec_xml.tostring(root)
+
+    def guardar(self) -> None:
+        with self.lock:
+            datos = self.instantanea()
+            if datos is not None:
+                escribir_atomico(*datos)
@@ -1,7 +1,26 @@
 # backend/data/xml_tienda.py
+import math
 import os
+import threading
 import xml.etree.ElementTree as ET
-from typing import Tuple, Dict, Any, List
+
+import numpy as np
+from typing import Tuple, Dict, Any, List, Optional
+
+from data import cache_xml, codec_xml
+from data.archivos import escribir_atomico, firma
+from data.repositorio import Repositorio
+from data.secuencias import Secuencias, ORIGENES
+from data.consumos_log import LogConsumos, RegistroConsumo
+from data.particiones import ParticionesConsumos
+from data.agregados import Agregados, Deltas, combinar, deltas_consumos, deltas_costo, deltas_facturas
+from models.entidades import (
+    Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, LineaFactura,
+    ts_fecha_hora, parse_float
+)
+from data.indices import (
+    IndiceClientes, IndiceConfiguraciones, IndiceConsumos, registros_consumo_xml
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = BASE_DIR  # ya estás en backend/data/
@@ -15,6 +34,22 @@ FILES = {
     "facturas": "facturas.xml",
 }
 
+# high-water mark de ids por tipo de entidad
+SECUENCIAS_FILE = "secuencias.xml"
+# bloqueo entre procesos (varios workers sobre la misma carpeta de datos)
+BLOQUEO_FILE = ".tienda.lock"
+# segmentos de sólo-anexar con consumos aún no compactados en consumos.xml
+CONSUMOS_LOG_DIR = "consumos_log"
+# consumos particionados por mes (columnas binarias) para consultas por rango
+CONSUMOS_PART_DIR = "consumos_part"
+# totales por categoría/configuración/recurso/mes para los reportes
+AGREGADOS_FILE = "agregados.xml"
+# diario (WAL) del repositorio con XML_FLUSH=diario
+DIARIO_DIR = "diario"
+# cambios de costo_hora para los cachés de cada proceso: un recurso_id por
+# línea, "*" = todo (init); sólo se anexa, init no lo borra
+CAMBIOS_COSTOS_FILE = "costos.cambios"
+
 ROOTS = {
     "recursos": "recursos",
     "categorias": "categorias",
@@ -24,31 +59,400 @@ ROOTS = {
     "facturas": "facturas",
 }
 
+# Política de escritura del repositorio en memoria: commit | intervalo | cierre | diario
+# (intervalo y cierre, un solo proceso escribiendo: ver data/repositorio.py)
+XML_FLUSH = os.environ.get("XML_FLUSH", "commit")
+XML_FLUSH_MS = int(os.environ.get("XML_FLUSH_MS", "1000"))
+# con política diario: registros en el diario que adelantan la instantánea de los XML
+XML_DIARIO_MAX = int(os.environ.get("XML_DIARIO_MAX", "10000"))
+# caché binaria de índices junto a cada XML (<archivo>.xml.cache, ver data/cache_xml.py)
+XML_CACHE = os.environ.get("XML_CACHE", "1") == "1"
+# cantidad de consumos pendientes en el log que dispara una compactación
+CONSUMOS_COMPACTAR_CADA = int(os.environ.get("CONSUMOS_COMPACTAR_CADA", "50000"))
+
+_repo = None
+_secuencias = None
+_log_consumos = None
+_particiones = None
+_agregados = None
+_creando = threading.RLock()  # los singletons se crean una sola vez aunque haya hilos
+
 def _full(path_key: str) -> str:
     return os.path.join(DATA_DIR, FILES[path_key])
 
 def _ensure_file(path_key: str) -> None:
     path = _full(path_key)
     if not os.path.exists(path):
-        root = ET.Element(ROOTS[path_key])
-        ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+        escribir_atomico(path, codec_xml.tostring(codec_xml.Element(ROOTS[path_key])))
+
+def _tras_fork() -> None:
+    # el hijo de un fork (p.ej. gunicorn --preload) hereda los objetos pero no
+    # los hilos del padre: se arman de nuevo en el primer uso
+    global _repo, _secuencias, _log_consumos, _particiones, _agregados, _creando
+    if _repo is not None:
+        _repo.abandonar()
+    _repo = _secuencias = _log_consumos = _particiones = _agregados = None
+    _creando = threading.RLock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+def get_repo() -> Repositorio:
+    """Repositorio compartido por todo el proceso (se crea en el primer uso)."""
+    global _repo
+    with _creando:
+        if _repo is None:
+            _repo = Repositorio(_full, ROOTS, politica=XML_FLUSH, intervalo_ms=XML_FLUSH_MS,
+                                bloqueo=os.path.join(DATA_DIR, BLOQUEO_FILE),
+                                diario=os.path.join(DATA_DIR, DIARIO_DIR), diario_max=XML_DIARIO_MAX,
+                                aplicar=_aplicar_registro, cache=XML_CACHE)
+        return _repo
+
+def get_secuencias() -> Secuencias:
+    """Secuencias de ids; se persisten junto con cada escritura del repositorio."""
+    global _secuencias
+    if _secuencias is not None:
+        return _secuencias
+    repo = get_repo()
+    # mismo orden de locks que el resto (repositorio y luego _creando)
+    with repo.escritura(), _creando:
+        if _secuencias is None:
+            sec = Secuencias(os.path.join(DATA_DIR, SECUENCIAS_FILE), _max_id, lock=repo.lock)
+            repo.instantaneas.append(sec.instantanea)
+            repo.al_refrescar.append(sec.recargar)
+            if repo.diario is not None:
+                repo.al_refrescar.append(lambda: _avanzar_secuencias(repo, sec))
+                # tras un corte: se ponen al día con el diario antes de entregar ids
+                _avanzar_secuencias(repo, sec)
+            _secuencias = sec
+        return _secuencias
+
+def _avanzar_secuencias(repo: Repositorio, sec: Secuencias) -> None:
+    # secuencias.xml pudo quedar antes que el diario (corte): no se repiten esos ids
+    for reg in repo.diario.registros:
+        if reg["op"] in ORIGENES:
+            sec.avanzar(reg["op"], reg["id"])
+
+def get_agregados() -> Agregados:
+    """Agregados de reportes; se guardan después de cada lote de consumos o facturación."""
+    global _agregados
+    with _creando:
+        if _agregados is None:
+            _agregados = Agregados(os.path.join(DATA_DIR, AGREGADOS_FILE), get_secuencias().actual,
+                                   _agregados_pendientes, lock=get_repo().lock)
+        return _agregados
+
+def get_log_consumos() -> LogConsumos:
+    global _log_consumos
+    with _creando:
+        if _log_consumos is None:
+            _log_consumos = LogConsumos(os.path.join(DATA_DIR, CONSUMOS_LOG_DIR))
+        return _log_consumos
+
+def get_particiones() -> ParticionesConsumos:
+    """Particiones mensuales de consumos; si no existen se arman desde consumos.xml."""
+    global _particiones
+    if _particiones is not None:
+        return _particiones
+    # mismo orden de locks que el resto (repositorio y luego _creando)
+    with get_repo().escritura(), _creando:
+        if _particiones is None:
+            part = ParticionesConsumos(os.path.join(DATA_DIR, CONSUMOS_PART_DIR))
+            _particiones = part
+            if not part.existe():
+                reconstruir_particiones()
+        return _particiones
+
+def reconstruir_particiones() -> int:
+    """Vuelve a generar las particiones a partir de consumos.xml (fuente de verdad)."""
+    part = get_particiones()
+    with get_repo().escritura():
+        root = get_repo().coleccion("consumos").root
+        filas = []
+        for e in root.findall("./consumo"):
+            try:
+                filas.append((int(e.get("id")), int(e.findtext("instancia_id")), int(e.findtext("recurso_id")),
+                              parse_float(e.findtext("horas") or "0"), ts_fecha_hora(e.findtext("fecha_hora") or ""),
+                              1 if e.findtext("facturado") == "true" else 0))
+            except (TypeError, ValueError):
+                continue
+        part.reiniciar()
+        part.escribir(filas, "base")
+    return len(filas)
+
+def consumos_rango(desde: str, hasta: str):
+    """
+    Columnas (numpy) de los consumos compactados entre dos fechas
+    'dd/mm/yyyy[ hh:mm]' inclusive; una fecha sin hora en `hasta` cubre el día.
+    """
+    d = ts_fecha_hora(desde)
+    h = ts_fecha_hora(hasta) + (86399 if len(hasta.strip()) <= 10 else 59)
+    part = get_particiones()
+    cols = part.rango(d, h)
+    # el flag de las particiones se escribe después de consumos.xml: un corte
+    # en el medio deja como pendientes filas ya facturadas. Se comparan las
+    # pendientes con el XML y se corrigen los .fact atrasados
+    repo = get_repo()
+    atrasadas = []
+    with repo.lock:
+        consumos = repo.coleccion("consumos")
+        for k in np.flatnonzero(cols["facturado"] == 0):
+            e = consumos.get(int(cols["id"][k]))
+            if e is not None and e.findtext("facturado") == "true":
+                atrasadas.append(k)
+    if atrasadas:
+        filas = np.asarray(atrasadas, dtype=np.int64)
+        part.marcar_facturados(cols, filas)
+        cols["facturado"][filas] = 1
+    return cols
+
+def _max_id(tipo: str) -> int:
+    key, tag = ORIGENES[tipo]
+    max_id = get_repo().coleccion(key).max_id(tag)
+    if tipo == "consumo":
+        max_id = max(max_id, get_log_consumos().max_id())
+    return max_id
+
+# --------- Índices secundarios ---------
+# Cada índice vive en su Coleccion: si la colección se descarta (rollback,
+# init_all) el índice se reconstruye desde el XML en el próximo acceso. Si
+# la caché del XML es válida se restaura de ahí, sin parsear el XML.
+def _indice(col, cls, construir):
+    if col.indice is None:
+        guardado = col.cache.get("indice") if col.cache is not None else None
+        if isinstance(guardado, tuple) and guardado[0] == cls.__name__:
+            col.indice = cls.desde_estado(guardado[1])
+            col.cache["indice"] = True  # en la caché y ahora en el índice vivo
+        else:
+            col.indice = construir()
+            get_repo().guardar_cache(col)  # el próximo arranque no necesita el XML
+    return col.indice
+
+def _indice_clientes() -> IndiceClientes:
+    col = get_repo().coleccion("clientes_instancias")
+    return _indice(col, IndiceClientes, lambda: IndiceClientes(col.root))
+
+def _indice_configuraciones() -> IndiceConfiguraciones:
+    col = get_repo().coleccion("configuraciones")
+    return _indice(col, IndiceConfiguraciones, lambda: IndiceConfiguraciones(col.root))
+
+def _indice_consumos() -> IndiceConsumos:
+    col = get_repo().coleccion("consumos")
+    if col.indice is None:
+        idx = _indice(col, IndiceConsumos, lambda: IndiceConsumos(registros_consumo_xml(col.root)))
+        # los del log no están en el XML (ni en su caché); agregar es idempotente
+        for cid, iid, _, _, fecha in get_log_consumos().leer():
+            idx.agregar(cid, iid, fecha)
+    return col.indice
+
+def cargar_indices() -> Dict[str, Dict[str, Any]]:
+    """
+    Al arrancar: restaura los índices con caché válida. Los demás se
+    construyen en el primer uso de su colección (sin caché, XML_CACHE=0,
+    se construyen todos acá). Devuelve la carga de cada colección.
+    """
+    repo = get_repo()
+    with repo.lock:
+        for key, indice in (("clientes_instancias", _indice_clientes),
+                            ("configuraciones", _indice_configuraciones),
+                            ("consumos", _indice_consumos)):
+            if not repo.cache or repo.coleccion(key).cache is not None:
+                indice()
+        return reporte_carga()
+
+def reporte_carga() -> Dict[str, Dict[str, Any]]:
+    """Por colección: origen (cache|xml), ms de carga, bytes del XML y ms del parse (si ya se leyó)."""
+    repo = get_repo()
+    with repo.lock:
+        return {k: dict(v) for k, v in repo.cargas.items()}
+
+def existe_instancia(instancia_id: int) -> bool:
+    with get_repo().lock:
+        return int(instancia_id) in _indice_clientes().cliente_de_instancia
+
+def configuracion(configuracion_id: int) -> Optional[Configuracion]:
+    with get_repo().lock:
+        e = get_repo().coleccion("configuraciones").get(configuracion_id)
+        return _configuracion_de(e) if e is not None else None
+
+def configuracion_de_instancia(instancia_id: int) -> Optional[int]:
+    with get_repo().lock:
+        return _indice_clientes().config_de_instancia.get(int(instancia_id))
+
+def costo_recurso(recurso_id: int) -> Optional[float]:
+    with get_repo().lock:
+        e = get_repo().coleccion("recursos").get(recurso_id)
+        return parse_float(e.findtext("costo_hora") or "0") if e is not None else None
+
+def existe_recurso(recurso_id: int) -> bool:
+    with get_repo().lock:
+        return get_repo().coleccion("recursos").get(recurso_id) is not None
+
+def cliente_por_nit(nit: str) -> Optional[int]:
+    with get_repo().lock:
+        return _indice_clientes().por_nit.get(nit.strip().upper())
+
+def configuracion_por_nombre(nombre: str) -> Optional[int]:
+    with get_repo().lock:
+        return _indice_configuraciones().por_nombre.get(nombre)
+
+def instancias_de_cliente(cliente_id: int) -> List[int]:
+    with get_repo().lock:
+        return list(_indice_clientes().instancias_por_cliente.get(int(cliente_id), []))
+
+def instancias_de_configuracion(configuracion_id: int) -> List[int]:
+    with get_repo().lock:
+        return list(_indice_clientes().instancias_por_config.get(int(configuracion_id), []))
+
+def consumos_de_instancia(instancia_id: int, desde: str = None, hasta: str = None) -> List[int]:
+    """Ids de consumos de una instancia, opcionalmente entre dos 'dd/mm/yyyy hh:mm'."""
+    d = ts_fecha_hora(desde) if desde else None
+    h = ts_fecha_hora(hasta) if hasta else None
+    with get_repo().lock:
+        return _indice_consumos().rango(int(instancia_id), d, h)
+
+# --------- Listados paginados ---------
+# colecciones que se listan por páginas; el cursor es el último id entregado
+PAGINABLES = ("clientes", "instancias", "consumos", "facturas")
+
+def pagina(coleccion: str, despues: int = 0, limite: int = 100) -> List[Any]:
+    """Hasta `limite` entidades de la colección con id > despues, en orden de id."""
+    repo = get_repo()
+    if coleccion == "instancias":
+        with repo.lock:
+            idx = _indice_clientes()
+            root = repo.coleccion("clientes_instancias").root
+            return [_instancia_de(idx.instancia(i, root), idx.cliente_de_instancia[i])
+                    for i in idx.ids_instancias.despues(despues, limite)]
+    if coleccion == "consumos":
+        return _pagina_consumos(despues, limite)
+    key, conv = {"clientes": ("clientes_instancias", _cliente_de), "facturas": ("facturas", _factura_de)}[coleccion]
+    with repo.lock:
+        col = repo.coleccion(key)
+        return [conv(col.por_id[i]) for i in col.ids.despues(despues, limite)]
+
+def _pagina_consumos(despues: int, limite: int) -> List[Consumo]:
+    """
+    Los consumos del log tienen ids mayores que los de consumos.xml: si la
+    página llega hasta ellos se completa leyendo el log, sin compactar (eso
+    lo hace el hilo que arranca add_consumos). Sólo se lee lo pendiente.
+    """
+    repo = get_repo()
+    while True:
+        # otro proceso pudo compactar: sus consumos ya no están en el log
+        repo.refrescar("consumos")
+        with repo.lock:  # una compactación de este proceso no se mete en el medio
+            col = repo.coleccion("consumos")
+            fir = col.firma
+            res = [_consumo_de(col.por_id[i]) for i in col.ids.despues(despues, limite)]
+            if len(res) == limite:
+                return res
+            # un corte entre volcar y borrar deja en el log ids ya compactados
+            desde = max(despues, col.ids.ultimo())
+            res += [Consumo(cid, iid, rid, horas, fecha) for cid, iid, rid, horas, fecha in get_log_consumos().leer()
+                    if cid > desde]
+        if firma(repo.ruta("consumos")) == fir:
+            res.sort(key=lambda c: c.id)
+            return res[:limite]
+        # otro proceso compactó mientras se leía el log: se vuelve a armar
+
+# --------- Agregados para reportes ---------
+def _config_de_instancia(instancia_id: int) -> int:
+    return _indice_clientes().config_de_instancia.get(instancia_id, 0)
+
+def _categoria_de_config(configuracion_id: int) -> int:
+    cfg = get_repo().coleccion("configuraciones").get(configuracion_id)
+    return int(cfg.findtext("categoria_id") or 0) if cfg is not None else 0
+
+def _costo_de_recurso(recurso_id: int) -> float:
+    rec = get_repo().coleccion("recursos").get(recurso_id)
+    return parse_float(rec.findtext("costo_hora") or "0") if rec is not None else 0.0
+
+def _registros_consumo(desde_id: int = 0):
+    """(instancia_id, recurso_id, horas, fecha_hora) de los consumos con id > desde_id (XML y log)."""
+    col = get_repo().coleccion("consumos")
+    for cid, e in col.por_id.items():
+        if cid > desde_id:
+            yield int(e.findtext("instancia_id")), int(e.findtext("recurso_id")), \
+                parse_float(e.findtext("horas") or "0"), e.findtext("fecha_hora") or ""
+    for cid, iid, rid, horas, fecha in get_log_consumos().leer():
+        if cid > desde_id and cid not in col.por_id:
+            yield iid, rid, horas, fecha
+
+def _facturas(desde_id: int = 0):
+    for e in get_repo().coleccion("facturas").root.findall("./factura"):
+        fid = int(e.get("id"))
+        if fid > desde_id:
+            f = Factura(fid, "", 0, "", e.findtext("fecha") or "", 0.0)
+            for le in e.findall("./lineas/linea"):
+                f.lineas.append(LineaFactura(int(le.get("id")), fid, int(le.findtext("instancia_id")),
+                                             int(le.findtext("recurso_id")), parse_float(le.findtext("horas") or "0"),
+                                             parse_float(le.findtext("monto") or "0")))
+            yield f
+
+def _agregados_pendientes(tipo: str, desde_id: int) -> Deltas:
+    if tipo == "consumo":
+        return deltas_consumos(_registros_consumo(desde_id), _config_de_instancia,
+                               _categoria_de_config, _costo_de_recurso)
+    return deltas_facturas(_facturas(desde_id), _config_de_instancia, _categoria_de_config)
+
+def calcular_agregados() -> Tuple[Deltas, Dict[str, int]]:
+    """Agregados recalculados desde cero a partir de consumos y facturas, y hasta qué ids cubren."""
+    with get_repo().escritura():
+        celdas = combinar(_agregados_pendientes("consumo", 0), _agregados_pendientes("factura", 0))
+        sec = get_secuencias()
+        return celdas, {t: sec.actual(t) for t in Agregados.TIPOS}
+
+def reemplazar_agregados(celdas: Deltas, hasta: Dict[str, int]) -> None:
+    with get_repo().escritura():
+        agg = get_agregados()
+        agg.reemplazar(celdas, hasta)
+        agg.guardar()
 
 def init_all() -> Dict[str, str]:
     """Reinicia todos los XML con su elemento raíz."""
-    for key in FILES:
-        path = _full(key)
-        if os.path.exists(path):
-            os.remove(path)
-        _ensure_file(key)
+    repo = get_repo()
+    with repo.escritura():
+        if repo.diario is not None:
+            # si se corta a mitad, al recuperar el init se repite sobre los XML
+            repo.diario.anexar("*", "init")
+            repo.diario.sincronizar()
+        get_log_consumos().reiniciar()
+        repo.descartar()
+        get_secuencias().reiniciar()
+        for key in FILES:
+            path = _full(key)
+            if os.path.exists(path):
+                os.remove(path)
+            cache_xml.borrar(path)
+            _ensure_file(key)
+        get_particiones().reiniciar()
+        get_agregados().reiniciar()
+        _anotar_cambio_costos("*")
+        if repo.diario is not None:
+            repo.diario.reiniciar()  # los XML vacíos son el nuevo punto de partida
     return {"status": "ok", "message": "XML inicializados"}
 
+def transaccion():
+    """Carga masiva: las inserciones del bloque se escriben juntas al final."""
+    return get_repo().transaccion()
+
+def exclusivo():
+    """Bloque de lectura-modificación sin otros escritores (hilos ni procesos)."""
+    return get_repo().escritura()
+
 def get_tree(path_key: str) -> Tuple[ET.ElementTree, ET.Element]:
-    _ensure_file(path_key)
-    tree = ET.parse(_full(path_key))
-    return tree, tree.getroot()
+    col = get_repo().coleccion(path_key)
+    return col.tree, col.root
 
 def save_tree(path_key: str, tree: ET.ElementTree) -> None:
-    tree.write(_full(path_key), encoding="utf-8", xml_declaration=True)
+    repo = get_repo()
+    with repo.escritura():
+        col = repo.coleccion(path_key)
+        if tree is not col.tree:
+            col.reemplazar(tree)
+        repo.marcar(path_key)
+    repo.commit()
 
 def next_id(parent: ET.Element, tag: str = None) -> int:
     """Saca el siguiente id entero buscando atributos id."""
@@ -62,75 +466,429 @@ def next_id(parent: ET.Element, tag: str = None) -> int:
             pass
     return max_id + 1
 
+# --------- Elementos XML por entidad ---------
+def _e_recurso(col, rid: int, nombre: str, tipo: str, costo_hora: float) -> ET.Element:
+    e = col.agregar("recurso", rid)
+    codec_xml.SubElement(e, "nombre").text = nombre
+    codec_xml.SubElement(e, "tipo").text = tipo
+    codec_xml.SubElement(e, "costo_hora").text = f"{costo_hora}"
+    return e
+
+def _e_categoria(col, cid: int, nombre: str, descripcion: str) -> ET.Element:
+    e = col.agregar("categoria", cid)
+    codec_xml.SubElement(e, "nombre").text = nombre
+    codec_xml.SubElement(e, "descripcion").text = descripcion
+    return e
+
+def _e_config(col, cfg_id: int, nombre: str, categoria_id: int, precio_base: float, recursos: List[int]) -> ET.Element:
+    e = col.agregar("configuracion", cfg_id)
+    codec_xml.SubElement(e, "nombre").text = nombre
+    codec_xml.SubElement(e, "categoria_id").text = str(categoria_id)
+    codec_xml.SubElement(e, "precio_base").text = f"{precio_base}"
+    recs = codec_xml.SubElement(e, "recursos")
+    for r in recursos:
+        codec_xml.SubElement(recs, "recurso_id").text = str(r)
+    return e
+
+def _e_cliente(col, cid: int, nombre: str, nit: str) -> ET.Element:
+    # estructura: <clientes_instancias><cliente id=""><nombre/><nit/><instancias/></cliente>...</clientes_instancias>
+    cliente = col.agregar("cliente", cid)
+    codec_xml.SubElement(cliente, "nombre").text = nombre
+    codec_xml.SubElement(cliente, "nit").text = nit
+    codec_xml.SubElement(cliente, "instancias")  # vacío
+    return cliente
+
+def _e_instancia(cliente: ET.Element, iid: int, configuracion_id: int, estado: str,
+                 fecha_inicio: str, fecha_fin: str = None) -> ET.Element:
+    ins = codec_xml.SubElement(cliente.find("./instancias"), "instancia", id=str(iid))
+    codec_xml.SubElement(ins, "configuracion_id").text = str(configuracion_id)
+    codec_xml.SubElement(ins, "estado").text = estado
+    codec_xml.SubElement(ins, "fecha_inicio").text = fecha_inicio
+    if fecha_fin:
+        codec_xml.SubElement(ins, "fecha_fin").text = fecha_fin
+    return ins
+
+def _e_consumo(col, cid: int, instancia_id: int, recurso_id: int, horas: float,
+               fecha_hora: str, facturado: bool = False) -> ET.Element:
+    e = col.agregar("consumo", cid)
+    codec_xml.SubElement(e, "instancia_id").text = str(instancia_id)
+    codec_xml.SubElement(e, "recurso_id").text = str(recurso_id)
+    codec_xml.SubElement(e, "horas").text = f"{horas}"
+    codec_xml.SubElement(e, "fecha_hora").text = fecha_hora
+    codec_xml.SubElement(e, "facturado").text = "true" if facturado else "false"
+    return e
+
+def _e_factura(col, f: Factura) -> ET.Element:
+    e = col.agregar("factura", f.id)
+    codec_xml.SubElement(e, "numero").text = f.numero
+    codec_xml.SubElement(e, "cliente_id").text = str(f.cliente_id)
+    codec_xml.SubElement(e, "nit").text = f.nit
+    codec_xml.SubElement(e, "fecha").text = f.fecha
+    codec_xml.SubElement(e, "total").text = f"{f.total}"
+    lineas = codec_xml.SubElement(e, "lineas")
+    for ln in f.lineas:
+        le = codec_xml.SubElement(lineas, "linea", id=str(ln.id))
+        codec_xml.SubElement(le, "instancia_id").text = str(ln.instancia_id)
+        codec_xml.SubElement(le, "recurso_id").text = str(ln.recurso_id)
+        codec_xml.SubElement(le, "horas").text = f"{ln.horas}"
+        codec_xml.SubElement(le, "monto").text = f"{ln.monto}"
+    return e
+
 # --------- Inserciones simples ---------
 def add_recurso(nombre: str, tipo: str, costo_hora: float) -> int:
-    tree, root = get_tree("recursos")
-    rid = next_id(root, "recurso")
-    e = ET.SubElement(root, "recurso", id=str(rid))
-    ET.SubElement(e, "nombre").text = nombre
-    ET.SubElement(e, "tipo").text = tipo
-    ET.SubElement(e, "costo_hora").text = f"{costo_hora}"
-    save_tree("recursos", tree)
+    repo = get_repo()
+    with repo.escritura():
+        rid = get_secuencias().siguiente("recurso")
+        _e_recurso(repo.coleccion("recursos"), rid, nombre, tipo, costo_hora)
+        repo.registrar("recursos", "recurso", id=rid, nombre=nombre, tipo=tipo, costo_hora=costo_hora)
+    repo.commit()
     return rid
 
 def add_categoria(nombre: str, descripcion: str = "") -> int:
-    tree, root = get_tree("categorias")
-    cid = next_id(root, "categoria")
-    e = ET.SubElement(root, "categoria", id=str(cid))
-    ET.SubElement(e, "nombre").text = nombre
-    ET.SubElement(e, "descripcion").text = descripcion
-    save_tree("categorias", tree)
+    repo = get_repo()
+    with repo.escritura():
+        cid = get_secuencias().siguiente("categoria")
+        _e_categoria(repo.coleccion("categorias"), cid, nombre, descripcion)
+        repo.registrar("categorias", "categoria", id=cid, nombre=nombre, descripcion=descripcion)
+    repo.commit()
     return cid
 
 def add_config(nombre: str, categoria_id: int, precio_base: float, recursos: List[int]) -> int:
-    tree, root = get_tree("configuraciones")
-    cfg_id = next_id(root, "configuracion")
-    e = ET.SubElement(root, "configuracion", id=str(cfg_id))
-    ET.SubElement(e, "nombre").text = nombre
-    ET.SubElement(e, "categoria_id").text = str(categoria_id)
-    ET.SubElement(e, "precio_base").text = f"{precio_base}"
-    recs = ET.SubElement(e, "recursos")
-    for r in recursos:
-        ET.SubElement(recs, "recurso_id").text = str(r)
-    save_tree("configuraciones", tree)
+    repo = get_repo()
+    with repo.escritura():
+        cfg_id = get_secuencias().siguiente("configuracion")
+        _e_config(repo.coleccion("configuraciones"), cfg_id, nombre, categoria_id, precio_base, recursos)
+        _indice_configuraciones().agregar(cfg_id, nombre)
+        repo.registrar("configuraciones", "configuracion", id=cfg_id, nombre=nombre, categoria_id=categoria_id,
+                       precio_base=precio_base, recursos=list(recursos))
+    repo.commit()
     return cfg_id
 
 def add_cliente(nombre: str, nit: str) -> int:
-    tree, root = get_tree("clientes_instancias")
-    # estructura: <clientes_instancias><cliente id=""><nombre/><nit/><instancias/></cliente>...</clientes_instancias>
-    cliente = ET.SubElement(root, "cliente")
-    cid = next_id(root, "cliente")
-    cliente.set("id", str(cid))
-    ET.SubElement(cliente, "nombre").text = nombre
-    ET.SubElement(cliente, "nit").text = nit
-    ET.SubElement(cliente, "instancias")  # vacío
-    save_tree("clientes_instancias", tree)
+    repo = get_repo()
+    with repo.escritura():
+        col = repo.coleccion("clientes_instancias")
+        idx = _indice_clientes()
+        if nit.upper() in idx.por_nit:
+            raise ValueError(f"NIT {nit} ya registrado")
+        cid = get_secuencias().siguiente("cliente")
+        _e_cliente(col, cid, nombre, nit)
+        idx.agregar_cliente(cid, nit)
+        repo.registrar("clientes_instancias", "cliente", id=cid, nombre=nombre, nit=nit)
+    repo.commit()
     return cid
 
 def add_instancia(cliente_id: int, configuracion_id: int, estado: str, fecha_inicio: str, fecha_fin: str = None) -> int:
-    tree, root = get_tree("clientes_instancias")
-    cliente = root.find(f"./cliente[@id='{cliente_id}']")
-    if cliente is None:
-        raise ValueError("Cliente no existe")
-    instancias = cliente.find("./instancias")
-    iid = next_id(instancias, "instancia")
-    ins = ET.SubElement(instancias, "instancia", id=str(iid))
-    ET.SubElement(ins, "configuracion_id").text = str(configuracion_id)
-    ET.SubElement(ins, "estado").text = estado
-    ET.SubElement(ins, "fecha_inicio").text = fecha_inicio
-    if fecha_fin:
-        ET.SubElement(ins, "fecha_fin").text = fecha_fin
-    save_tree("clientes_instancias", tree)
+    repo = get_repo()
+    with repo.escritura():
+        col = repo.coleccion("clientes_instancias")
+        cliente = col.get(cliente_id)
+        if cliente is None:
+            raise ValueError("Cliente no existe")
+        iid = get_secuencias().siguiente("instancia")
+        ins = _e_instancia(cliente, iid, configuracion_id, estado, fecha_inicio, fecha_fin)
+        _indice_clientes().agregar_instancia(ins, int(cliente_id))
+        repo.registrar("clientes_instancias", "instancia", id=iid, cliente_id=int(cliente_id),
+                       configuracion_id=configuracion_id, estado=estado, fecha_inicio=fecha_inicio,
+                       fecha_fin=fecha_fin)
+    repo.commit()
     return iid
 
+def _aplicar_registro(col, reg: Dict[str, Any]) -> bool:
+    """Repite un add_* (o un cambio) del diario sobre su colección, salvo que ya esté en el XML."""
+    op, id_ = reg["op"], reg["id"]
+    if op == "costo_recurso":
+        e = col.get(id_)
+        costo = f"{reg['costo_hora']}"
+        if e is None or e.findtext("costo_hora") == costo:
+            return False
+        e.find("costo_hora").text = costo
+    elif op == "instancia":
+        cliente = col.get(reg["cliente_id"])
+        if cliente is None or cliente.find(f"./instancias/instancia[@id='{id_}']") is not None:
+            return False
+        _e_instancia(cliente, id_, reg["configuracion_id"], reg["estado"], reg["fecha_inicio"], reg["fecha_fin"])
+    elif id_ in col.por_id:
+        return False
+    elif op == "recurso":
+        _e_recurso(col, id_, reg["nombre"], reg["tipo"], reg["costo_hora"])
+    elif op == "categoria":
+        _e_categoria(col, id_, reg["nombre"], reg["descripcion"])
+    elif op == "configuracion":
+        _e_config(col, id_, reg["nombre"], reg["categoria_id"], reg["precio_base"], reg["recursos"])
+    elif op == "cliente":
+        _e_cliente(col, id_, reg["nombre"], reg["nit"])
+    else:
+        raise ValueError(f"registro del diario desconocido: {op}")
+    return True
+
+# --------- Cambios ---------
+def _anotar_cambio_costos(linea: str) -> None:
+    # bajo escritura(): un solo proceso anexa a la vez. Sin fsync: sirve a los
+    # procesos vivos (que comparten la caché de páginas), no a un arranque
+    with open(os.path.join(DATA_DIR, CAMBIOS_COSTOS_FILE), "ab") as f:
+        f.write(linea.encode("ascii") + b"\n")
+
+def cambios_costos(desde: int) -> Tuple[int, List[Optional[int]]]:
+    """Cambios de costo_hora anotados después del byte `desde` (ver Almacen.cambios_costos)."""
+    path = os.path.join(DATA_DIR, CAMBIOS_COSTOS_FILE)
+    try:
+        tam = os.path.getsize(path)
+    except FileNotFoundError:
+        tam = 0
+    if tam == desde:
+        return desde, []
+    if tam < desde:
+        return tam, [None]  # el archivo se borró o reemplazó
+    with open(path, "rb") as f:
+        f.seek(desde)
+        datos = f.read(tam - desde)
+    fin = datos.rfind(b"\n") + 1  # sólo líneas completas
+    lineas = datos[:fin].split()
+    if lineas:
+        # pudo ser otro proceso: las colecciones en memoria se ponen al día
+        with get_repo().escritura():
+            pass
+    return desde + fin, [None if x == b"*" else int(x) for x in lineas]
+
+def actualizar_costo_recurso(recurso_id: int, costo_hora: float) -> bool:
+    """
+    Nuevo costo_hora de un recurso. El `costo` de los agregados se recalcula
+    al precio nuevo (como lo haría reconstruir_agregados.py); las facturas ya
+    emitidas no cambian. Un corte entre el commit y el guardado de los
+    agregados los deja al precio viejo hasta reconstruirlos.
+    """
+    repo = get_repo()
+    with repo.escritura():
+        e = repo.coleccion("recursos").get(recurso_id)
+        if e is None:
+            return False
+        agg = get_agregados()
+        agg.cargar()  # lo pendiente entra al precio viejo; la corrección abarca todo
+        viejo = parse_float(e.findtext("costo_hora") or "0")
+        e.find("costo_hora").text = f"{costo_hora}"
+        repo.registrar("recursos", "costo_recurso", id=int(recurso_id), costo_hora=costo_hora)
+        _anotar_cambio_costos(str(int(recurso_id)))
+        repo.commit()
+        agg.ajustar(deltas_costo(_registros_consumo(), int(recurso_id), costo_hora - viejo,
+                                 _config_de_instancia, _categoria_de_config))
+        agg.guardar()
+    return True
+
 def add_consumo(instancia_id: int, recurso_id: int, horas: float, fecha_hora: str) -> int:
-    tree, root = get_tree("consumos")
-    cid = next_id(root, "consumo")
-    e = ET.SubElement(root, "consumo", id=str(cid))
-    ET.SubElement(e, "instancia_id").text = str(instancia_id)
-    ET.SubElement(e, "recurso_id").text = str(recurso_id)
-    ET.SubElement(e, "horas").text = f"{horas}"
-    ET.SubElement(e, "fecha_hora").text = fecha_hora
-    ET.SubElement(e, "facturado").text = "false"
-    save_tree("consumos", tree)
-    return cid
+    return add_consumos([(instancia_id, recurso_id, horas, fecha_hora)])[0]
+
+def reservar_ids(tipo: str, n: int) -> range:
+    """Aparta n ids de un tipo y los deja en disco antes de devolverlos."""
+    repo = get_repo()
+    with repo.escritura():
+        ids = get_secuencias().reservar(tipo, n)
+        repo.guardar_instantaneas()
+    return ids
+
+# --------- Consumos (log de sólo-anexar) ---------
+def add_consumos(registros: List[Tuple[int, int, float, str]]) -> List[int]:
+    """
+    Inserta un lote de consumos (instancia_id, recurso_id, horas, fecha_hora).
+    Se anexan al log de consumos; consumos.xml se actualiza al compactar.
+    """
+    if not registros:
+        return []
+    for _, _, h, f in registros:
+        # un registro mal formado en el log haría fallar cada compactación
+        if not math.isfinite(float(h)) or float(h) < 0:
+            raise ValueError(f"horas inválidas: {h!r}")
+        ts_fecha_hora(f)
+    repo = get_repo()
+    log = get_log_consumos()
+    # bajo el bloqueo entre procesos: una compactación de otro worker no
+    # puede leer y borrar un segmento mientras se anexa a él
+    with repo.escritura():
+        # el id debe quedar reservado antes de existir en el log
+        ids = reservar_ids("consumo", len(registros))
+        filas = [(cid, int(i), int(r), float(h), f) for cid, (i, r, h, f) in zip(ids, registros)]
+        log.anexar(filas)
+        idx = _indice_consumos()
+        for cid, instancia_id, _, _, fecha_hora in filas:
+            idx.agregar(cid, instancia_id, fecha_hora)
+        # después del log: si se corta aquí, los agregados se ponen al día al cargarse
+        agg = get_agregados()
+        agg.aplicar(deltas_consumos(((i, r, h, f) for _, i, r, h, f in filas), _config_de_instancia,
+                                    _categoria_de_config, _costo_de_recurso), "consumo", ids[-1])
+        agg.guardar()
+    if log.pendientes >= CONSUMOS_COMPACTAR_CADA:
+        threading.Thread(target=compactar_consumos, name="consumos-compactar", daemon=True).start()
+    return list(ids)
+
+def _volcar_consumos(registros: List[RegistroConsumo], segmentos: List[int]) -> None:
+    # 1) particiones: el nombre sale del primer segmento, repetir sobrescribe
+    ts_cache: Dict[str, int] = {}
+    filas = []
+    for cid, instancia_id, recurso_id, horas, fecha_hora in registros:
+        ts = ts_cache.get(fecha_hora)
+        if ts is None:
+            ts = ts_cache[fecha_hora] = ts_fecha_hora(fecha_hora)
+        filas.append((cid, instancia_id, recurso_id, horas, ts, 0))
+    get_particiones().escribir(filas, f"s{segmentos[0]:06d}")
+
+    # 2) consumos.xml
+    repo = get_repo()
+    with repo.escritura():
+        col = repo.coleccion("consumos")
+        for cid, instancia_id, recurso_id, horas, fecha_hora in registros:
+            if cid in col.por_id:
+                continue  # ya compactado en una corrida anterior
+            _e_consumo(col, cid, instancia_id, recurso_id, horas, fecha_hora)
+        repo.marcar("consumos")
+        repo.flush()  # el XML debe estar en disco antes de borrar los segmentos
+
+def compactar_consumos() -> int:
+    """Pasa los consumos del log a consumos.xml. Devuelve cuántos se movieron."""
+    with get_repo().escritura():
+        return get_log_consumos().compactar(_volcar_consumos)
+
+# --------- Facturación ---------
+def costos_recursos() -> Dict[int, float]:
+    with get_repo().lock:
+        return {rid: parse_float(e.findtext("costo_hora") or "0")
+                for rid, e in get_repo().coleccion("recursos").por_id.items()}
+
+def nits_clientes() -> Dict[int, str]:
+    with get_repo().lock:
+        return {cid: cl.findtext("nit") or ""
+                for cid, cl in get_repo().coleccion("clientes_instancias").por_id.items()}
+
+def cliente_de_instancias() -> Dict[int, int]:
+    with get_repo().lock:
+        return dict(_indice_clientes().cliente_de_instancia)
+
+def registrar_facturacion(facturas: List[Factura], cols: Dict[str, Any], filas) -> None:
+    """Guarda las facturas y marca como facturadas las filas `filas` de consumos_rango()."""
+    repo = get_repo()
+    with repo.escritura():
+        # dentro de escritura() la transacción se escribe al cerrarse, antes
+        # de tocar las particiones
+        with repo.transaccion():
+            if facturas:
+                col = repo.coleccion("facturas")
+                for f in facturas:
+                    _e_factura(col, f)
+                repo.marcar("facturas")
+            consumos = repo.coleccion("consumos")
+            for cid in cols["id"][filas]:
+                e = consumos.get(int(cid))
+                if e is not None:
+                    e.find("facturado").text = "true"
+            if len(filas):
+                repo.marcar("consumos")
+        # consumos.xml es la fuente de verdad; el flag de las particiones y
+        # los agregados se actualizan sólo si la transacción se escribió bien.
+        # Si se corta acá, consumos_rango corrige los .fact en la próxima lectura
+        get_particiones().marcar_facturados(cols, filas)
+        if facturas:
+            agg = get_agregados()
+            agg.aplicar(deltas_facturas(facturas, _config_de_instancia, _categoria_de_config),
+                        "factura", max(f.id for f in facturas))
+            agg.guardar()
+
+# --------- Exportar / importar (migración entre almacenes) ---------
+ENTIDADES = ("recursos", "categorias", "configuraciones", "clientes", "instancias", "consumos", "facturas")
+
+def _recurso_de(e: ET.Element) -> Recurso:
+    return Recurso(int(e.get("id")), e.findtext("nombre") or "", e.findtext("tipo") or "",
+                   parse_float(e.findtext("costo_hora") or "0"))
+
+def _categoria_de(e: ET.Element) -> Categoria:
+    return Categoria(int(e.get("id")), e.findtext("nombre") or "", e.findtext("descripcion") or "")
+
+def _configuracion_de(e: ET.Element) -> Configuracion:
+    return Configuracion(int(e.get("id")), e.findtext("nombre") or "", int(e.findtext("categoria_id") or 0),
+                         parse_float(e.findtext("precio_base") or "0"),
+                         [int(r.text) for r in e.findall("./recursos/recurso_id")])
+
+def _cliente_de(e: ET.Element) -> Cliente:
+    return Cliente(int(e.get("id")), e.findtext("nombre") or "", e.findtext("nit") or "")
+
+def _instancia_de(e: ET.Element, cliente_id: int) -> Instancia:
+    return Instancia(int(e.get("id")), cliente_id, int(e.findtext("configuracion_id") or 0),
+                     e.findtext("estado") or "", e.findtext("fecha_inicio") or "",
+                     e.findtext("fecha_fin") or None)
+
+def _consumo_de(e: ET.Element) -> Consumo:
+    return Consumo(int(e.get("id")), int(e.findtext("instancia_id")), int(e.findtext("recurso_id")),
+                   parse_float(e.findtext("horas") or "0"), e.findtext("fecha_hora") or "",
+                   e.findtext("facturado") == "true")
+
+def _factura_de(e: ET.Element) -> Factura:
+    fid = int(e.get("id"))
+    f = Factura(fid, e.findtext("numero") or "", int(e.findtext("cliente_id") or 0),
+                e.findtext("nit") or "", e.findtext("fecha") or "", parse_float(e.findtext("total") or "0"))
+    for le in e.findall("./lineas/linea"):
+        f.lineas.append(LineaFactura(int(le.get("id")), fid, int(le.findtext("instancia_id")),
+                                     int(le.findtext("recurso_id")), parse_float(le.findtext("horas") or "0"),
+                                     parse_float(le.findtext("monto") or "0")))
+    return f
+
+def exportar_entidades() -> Dict[str, Any]:
+    """Todas las entidades como dataclasses, en orden de dependencias (generadores)."""
+    compactar_consumos()
+    repo = get_repo()
+
+    def de(key: str, tag: str, conv):
+        for e in repo.coleccion(key).root.findall(f"./{tag}"):
+            yield conv(e)
+
+    def instancias():
+        for cl in repo.coleccion("clientes_instancias").root.findall("./cliente"):
+            for e in cl.findall("./instancias/instancia"):
+                yield _instancia_de(e, int(cl.get("id")))
+
+    return {
+        "recursos": de("recursos", "recurso", _recurso_de),
+        "categorias": de("categorias", "categoria", _categoria_de),
+        "configuraciones": de("configuraciones", "configuracion", _configuracion_de),
+        "clientes": de("clientes_instancias", "cliente", _cliente_de), "instancias": instancias(),
+        "consumos": de("consumos", "consumo", _consumo_de), "facturas": de("facturas", "factura", _factura_de),
+    }
+
+def importar_entidades(datos: Dict[str, Any]) -> Dict[str, int]:
+    """Reemplaza todos los XML con las entidades dadas, conservando sus ids."""
+    repo = get_repo()
+    cnt = {k: 0 for k in ENTIDADES}
+    with repo.escritura():
+        init_all()
+        with repo.transaccion():
+            col = repo.coleccion("recursos")
+            for r in datos.get("recursos", ()):
+                _e_recurso(col, r.id, r.nombre, r.tipo, r.costo_hora)
+                cnt["recursos"] += 1
+            col = repo.coleccion("categorias")
+            for c in datos.get("categorias", ()):
+                _e_categoria(col, c.id, c.nombre, c.descripcion)
+                cnt["categorias"] += 1
+            col = repo.coleccion("configuraciones")
+            for c in datos.get("configuraciones", ()):
+                _e_config(col, c.id, c.nombre, c.categoria_id, c.precio_base, c.recursos)
+                cnt["configuraciones"] += 1
+            col = repo.coleccion("clientes_instancias")
+            for c in datos.get("clientes", ()):
+                _e_cliente(col, c.id, c.nombre, c.nit)
+                cnt["clientes"] += 1
+            for i in datos.get("instancias", ()):
+                _e_instancia(col.get(i.cliente_id), i.id, i.configuracion_id, i.estado, i.fecha_inicio, i.fecha_fin)
+                cnt["instancias"] += 1
+            col = repo.coleccion("consumos")
+            for c in datos.get("consumos", ()):
+                _e_consumo(col, c.id, c.instancia_id, c.recurso_id, c.horas, c.fecha_hora, c.facturado)
+                cnt["consumos"] += 1
+            col = repo.coleccion("facturas")
+            for f in datos.get("facturas", ()):
+                _e_factura(col, f)
+                cnt["facturas"] += 1
+            for key in FILES:
+                repo.coleccion(key).indice = None
+                repo.marcar(key)
+            get_secuencias().reconstruir()
+        reconstruir_particiones()
+        reemplazar_agregados(*calcular_agregados())
+    return cnt
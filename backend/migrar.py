@@ -0,0 +1,29 @@
+# backend/migrar.py
+"""
+Copia todos los datos de un almacén a otro conservando los ids.
+Uso (desde backend/):
+    python migrar.py xml sqlite     # XML de backend/data -> SQLITE_PATH
+    python migrar.py sqlite xml     # de vuelta a los XML
+"""
+import json
+import sys
+import time
+
+from data.almacen import crear_almacen
+
+TIPOS = ("xml", "sqlite")
+
+
+def migrar(origen: str, destino: str) -> dict:
+    if origen == destino:
+        raise ValueError("origen y destino son el mismo almacén")
+    t0 = time.perf_counter()
+    cnt = crear_almacen(destino).importar(crear_almacen(origen).exportar())
+    return {"origen": origen, "destino": destino, "cantidades": cnt,
+            "segundos": round(time.perf_counter() - t0, 3)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in TIPOS or sys.argv[2] not in TIPOS:
+        sys.exit(__doc__)
+    print(json.dumps(migrar(sys.argv[1], sys.argv[2]), ensure_ascii=False))
@@ -1,23 +1,24 @@
 # backend/models/entidades.py
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, is_dataclass
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 # --------- Entidades de dominio ---------
-@dataclass
+# slots=True: sin __dict__ por instancia (importa con millones de consumos)
+@dataclass(slots=True)
 class Recurso:
     id: int
     nombre: str
     tipo: str  # "Hardware" | "Software"
     costo_hora: float
 
-@dataclass
+@dataclass(slots=True)
 class Categoria:
     id: int
     nombre: str
     descripcion: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class Configuracion:
     id: int
     nombre: str
@@ -27,13 +28,13 @@ class Configuracion:
     # Recursos asociados a la configuración (recurso_id -> factor/multiplicador si aplica)
     recursos: List[int] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class Cliente:
     id: int
     nombre: str
     nit: str
 
-@dataclass
+@dataclass(slots=True)
 class Instancia:
     id: int
     cliente_id: int
@@ -42,7 +43,7 @@ class Instancia:
     fecha_inicio: str  # dd/mm/yyyy
     fecha_fin: Optional[str] = None  # requerido si "Cancelada"
 
-@dataclass
+@dataclass(slots=True)
 class Consumo:
     id: int
     instancia_id: int
@@ -52,7 +53,7 @@ class Consumo:
     fecha_hora: str  # dd/mm/yyyy hh:mm
     facturado: bool = False  # flag para ciclo de facturación
 
-@dataclass
+@dataclass(slots=True)
 class LineaFactura:
     id: int
     factura_id: int
@@ -61,7 +62,7 @@ class LineaFactura:
     horas: float
     monto: float
 
-@dataclass
+@dataclass(slots=True)
 class Factura:
     id: int
     numero: str
@@ -81,15 +82,34 @@ def parse_float(s: str, default: float = 0.0) -> float:
     except Exception:
         return default
 
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def ts_fecha_hora(s: str) -> int:
+    """'dd/mm/yyyy hh:mm' (o sólo 'dd/mm/yyyy') -> segundos desde 01/01/1970, sin zona horaria."""
+    s = s.strip()
+    d = datetime.strptime(s, "%d/%m/%Y %H:%M" if len(s) > 10 else "%d/%m/%Y")
+    return (d.toordinal() - _EPOCH_ORDINAL) * 86400 + d.hour * 3600 + d.minute * 60
+
+def fecha_hora_de_ts(ts: int) -> str:
+    """Inverso de ts_fecha_hora."""
+    dias, resto = divmod(int(ts), 86400)
+    d = datetime.fromordinal(dias + _EPOCH_ORDINAL)
+    return f"{d.day:02d}/{d.month:02d}/{d.year:04d} {resto // 3600:02d}:{resto % 3600 // 60:02d}"
+
 def now_str() -> str:
     return datetime.now().strftime("%d/%m/%Y %H:%M")
 
 def to_dict(obj) -> Dict[str, Any]:
-    if hasattr(obj, "__dict__"):
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if is_dataclass(obj):
+        d = {f.name: getattr(obj, f.name) for f in fields(obj)}
+    elif hasattr(obj, "__dict__"):
         d = obj.__dict__.copy()
-        # convertir listas de dataclasses
-        for k, v in d.items():
-            if isinstance(v, list):
-                d[k] = [to_dict(x) if hasattr(x, "__dict__") else x for x in v]
-        return d
-    return obj
+    else:
+        return obj
+    # convertir listas de dataclasses
+    for k, v in d.items():
+        if isinstance(v, list):
+            d[k] = [to_dict(x) if (is_dataclass(x) or hasattr(x, "__dict__")) else x for x in v]
+    return d
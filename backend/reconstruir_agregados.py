@@ -0,0 +1,40 @@
+# backend/reconstruir_agregados.py
+"""
+Recalcula desde cero los agregados de los reportes (a partir de consumos y
+facturas), los compara con los mantenidos en forma incremental y los
+reemplaza por los recalculados.
+Uso (desde backend/):
+    python reconstruir_agregados.py              # compara y reemplaza
+    python reconstruir_agregados.py --verificar  # sólo compara (sale con 1 si difieren)
+"""
+import json
+import sys
+import time
+
+from data.agregados import diferencias
+from data.almacen import get_almacen
+
+MAX_DETALLE = 20
+
+
+def reconstruir(reemplazar: bool = True) -> dict:
+    almacen = get_almacen()
+    t0 = time.perf_counter()
+    # sin escritores en el medio: lo recalculado y lo comparado son del mismo estado
+    with almacen.exclusivo():
+        celdas, hasta = almacen.calcular_agregados()
+        difs = diferencias(celdas, almacen.agregados())
+        if reemplazar:
+            almacen.reemplazar_agregados(celdas, hasta)
+    return {"almacen": almacen.nombre, "celdas": len(celdas), "diferencias": len(difs),
+            "detalle": difs[:MAX_DETALLE], "reemplazado": reemplazar,
+            "segundos": round(time.perf_counter() - t0, 3)}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args not in ([], ["--verificar"]):
+        sys.exit(__doc__)
+    res = reconstruir(reemplazar=not args)
+    print(json.dumps(res, ensure_ascii=False))
+    sys.exit(1 if args and res["diferencias"] else 0)
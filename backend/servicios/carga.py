@@ -0,0 +1,354 @@
+# backend/servicios/carga.py
+import math
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Tuple
+
+from data import codec_xml
+from data.almacen import get_almacen
+from models.entidades import parse_float, DATETIME_RX as _DATETIME_RX
+
+DATE_RX = re.compile(r'(\b\d{2}/\d{2}/\d{4}\b)')
+NIT_RX = re.compile(r'^\d+-([0-9]|K)$', re.IGNORECASE)
+DATETIME_RX = re.compile(_DATETIME_RX)
+
+# Validación de <clientes>: desde CARGA_PARALELA_MIN clientes se reparte en un
+# pool de procesos, en bloques de CARGA_BLOQUE; por debajo (o con un solo
+# CPU) se hace aquí mismo
+CARGA_PARALELA_MIN = int(os.environ.get("CARGA_PARALELA_MIN", "5000"))
+CARGA_BLOQUE = int(os.environ.get("CARGA_BLOQUE", "1000"))
+CARGA_PROCESOS = int(os.environ.get("CARGA_PROCESOS", "0")) or os.cpu_count() or 1
+
+# (nombre, nit, [(configuracion, estado, fecha_inicio, fecha_fin), ...]) tal como vienen en el XML
+ClienteXML = Tuple[Optional[str], Optional[str], List[Tuple[Optional[str], ...]]]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CARGA_PROCESOS)
+        return _pool
+
+
+def _descartar_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _tras_fork() -> None:
+    global _pool, _pool_lock
+    _pool, _pool_lock = None, threading.Lock()  # los procesos del pool son del padre
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def fecha_hora_valida(s: str) -> bool:
+    """'dd/mm/yyyy hh:mm' completo y con una fecha y hora que existen."""
+    if not DATETIME_RX.fullmatch(s):
+        return False
+    try:
+        datetime.strptime(s, "%d/%m/%Y %H:%M")
+    except ValueError:
+        return False
+    return True
+
+
+def datos_cliente(cl: ET.Element) -> ClienteXML:
+    """Extrae un <cliente> a tuplas simples (baratas de enviar a otro proceso)."""
+    return (cl.get("nombre"), cl.get("nit"),
+            [(ins.get("configuracion"), ins.get("estado"), ins.get("fecha_inicio"), ins.get("fecha_fin"))
+             for ins in cl.findall("./instancias/instancia")])
+
+
+def validar_clientes(bloque: List[ClienteXML], nombre_config_id: Dict[str, int]) -> List[tuple]:
+    """
+    Valida un bloque de clientes sin tocar el almacén (puede correr en otro
+    proceso). Devuelve, en el mismo orden, (nombre_xml, nombre, nit, error,
+    instancias) con instancias = [(args de add_instancia sin cliente_id, error)].
+    """
+    res = []
+    for nombre_xml, nit_xml, instancias in bloque:
+        nombre = (nombre_xml or "").strip()
+        nit = (nit_xml or "").strip()
+        if not NIT_RX.match(nit):
+            res.append((nombre_xml, nombre, nit, "NIT no cumple el formato general 0000000-0/K", []))
+            continue
+        validas = []
+        for cfg_nombre, estado, fecha_inicio, fecha_fin in instancias:
+            cfg_nombre = (cfg_nombre or "").strip()
+            estado = (estado or "Vigente").strip()
+            fecha_inicio = (fecha_inicio or "").strip()
+            fecha_fin = (fecha_fin or "").strip() or None
+            if estado not in ("Vigente", "Cancelada"):
+                error = "estado inválido (Vigente|Cancelada)"
+            elif not DATE_RX.search(fecha_inicio):
+                error = "fecha_inicio no válida (dd/mm/yyyy)"
+            elif estado == "Cancelada" and not (fecha_fin and DATE_RX.search(fecha_fin)):
+                error = "fecha_fin requerida si estado=Cancelada"
+            elif cfg_nombre not in nombre_config_id:
+                error = f"configuracion '{cfg_nombre}' no registrada"
+            else:
+                validas.append(((nombre_config_id[cfg_nombre], estado, fecha_inicio, fecha_fin), None))
+                continue
+            validas.append((None, error))
+        res.append((nombre_xml, nombre, nit, None, validas))
+    return res
+
+
+class CargaConfig:
+    """
+    Procesa los elementos de un XML de configuración uno por uno.
+    Los errores de cada elemento se acumulan y no detienen la carga.
+    """
+
+    def __init__(self):
+        # Mapas por nombre -> id para poder referenciar por nombre en el XML de entrada
+        self.nombre_recurso_id: Dict[str, int] = {}
+        self.nombre_categoria_id: Dict[str, int] = {}
+        self.nombre_config_id: Dict[str, int] = {}
+        self.cnt = {"recursos": 0, "categorias": 0, "configuraciones": 0, "clientes": 0, "instancias": 0}
+        self.errores: List[str] = []
+        self.almacen = get_almacen()
+        self._clientes: List[ClienteXML] = []  # aún sin validar
+        self._paralelo = False
+        self._futuros = deque()  # (bloque, futuro) en orden de documento
+        # segundos por fase: cada sección (su handler) y el resto del recorrido (parse)
+        self.fases = {"parse": 0.0, "recursos": 0.0, "categorias": 0.0, "configuraciones": 0.0, "clientes": 0.0}
+
+    def procesar(self, fuente) -> None:
+        """
+        Recorre el XML de forma incremental (iterparse): cada <recurso>,
+        <categoria>, <configuracion> y <cliente> de primer nivel se procesa en
+        cuanto se cierra y luego se descarta, así la memoria no depende del
+        tamaño del archivo. Las referencias por nombre deben aparecer antes en
+        el documento (mismo orden de secciones que el formato de entrada).
+        Los clientes se validan por bloques (ver validar_clientes) y se
+        insertan en orden de documento al cerrarse cada bloque.
+        """
+        handlers = {
+            ("recursos", "recurso"): self.recurso,
+            ("categorias", "categoria"): self.categoria,
+            ("configuraciones", "configuracion"): self.configuracion,
+            ("clientes", "cliente"): self.cliente,
+        }
+        pila: List[ET.Element] = []
+        fases = self.fases
+        reloj = time.perf_counter
+        inicio = reloj()
+        for evento, elem in codec_xml.iterparse(fuente, events=("start", "end")):
+            if evento == "start":
+                pila.append(elem)
+                continue
+            pila.pop()
+            if len(pila) == 2:
+                handler = handlers.get((pila[1].tag, elem.tag))
+                if handler:
+                    t0 = reloj()
+                    handler(elem)
+                    fases[pila[1].tag] += reloj() - t0
+            if len(pila) == 1 and elem.tag == "clientes":
+                t0 = reloj()
+                self._cerrar_clientes()
+                fases["clientes"] += reloj() - t0
+            if 1 <= len(pila) <= 2:
+                # hijo de la raíz o de una sección: ya no se necesita
+                pila[-1].remove(elem)
+        t0 = reloj()
+        self._cerrar_clientes()
+        fases["clientes"] += reloj() - t0
+        fases["parse"] = reloj() - inicio - sum(v for k, v in fases.items() if k != "parse")
+
+    def resultado(self) -> Dict[str, Any]:
+        return {"cargados": self.cnt, "errores": self.errores}
+
+    # --------- Recursos ---------
+    def recurso(self, r: ET.Element) -> None:
+        try:
+            nombre = (r.get("nombre") or "").strip()
+            tipo = (r.get("tipo") or "").strip()
+            costo = parse_float(r.get("costo_hora") or "0")
+            if tipo not in ("Hardware", "Software"):
+                raise ValueError("tipo debe ser Hardware o Software")
+            rid = self.almacen.add_recurso(nombre, tipo, costo)
+            self.nombre_recurso_id[nombre] = rid
+            self.cnt["recursos"] += 1
+        except Exception as ex:
+            self.errores.append(f"recurso '{r.get('nombre')}': {ex}")
+
+    # --------- Categorías ---------
+    def categoria(self, c: ET.Element) -> None:
+        try:
+            nombre = (c.get("nombre") or "").strip()
+            descripcion = (c.get("descripcion") or "").strip()
+            cid = self.almacen.add_categoria(nombre, descripcion)
+            self.nombre_categoria_id[nombre] = cid
+            self.cnt["categorias"] += 1
+        except Exception as ex:
+            self.errores.append(f"categoria '{c.get('nombre')}': {ex}")
+
+    # --------- Configuraciones ---------
+    def configuracion(self, cfg: ET.Element) -> None:
+        try:
+            nombre = (cfg.get("nombre") or "").strip()
+            cat_nombre = (cfg.get("categoria") or "").strip()
+            precio_base = parse_float(cfg.get("precio_base") or "0")
+            if cat_nombre not in self.nombre_categoria_id:
+                raise ValueError(f"categoría '{cat_nombre}' no registrada")
+            recursos_ids = []
+            for rr in cfg.findall("./recursos/recurso"):
+                rn = (rr.get("nombre") or "").strip()
+                if rn not in self.nombre_recurso_id:
+                    raise ValueError(f"recurso '{rn}' no registrado")
+                recursos_ids.append(self.nombre_recurso_id[rn])
+            cfg_id = self.almacen.add_config(nombre, self.nombre_categoria_id[cat_nombre], precio_base, recursos_ids)
+            self.nombre_config_id[nombre] = cfg_id
+            self.cnt["configuraciones"] += 1
+        except Exception as ex:
+            self.errores.append(f"configuracion '{cfg.get('nombre')}': {ex}")
+
+    # --------- Clientes + Instancias ---------
+    def cliente(self, cl: ET.Element) -> None:
+        self._clientes.append(datos_cliente(cl))
+        if not self._paralelo and CARGA_PROCESOS > 1 and len(self._clientes) >= CARGA_PARALELA_MIN:
+            self._paralelo = True
+        if self._paralelo and len(self._clientes) >= CARGA_BLOQUE:
+            self._enviar()
+
+    def _enviar(self) -> None:
+        bloque, self._clientes = self._clientes, []
+        try:
+            futuro = _get_pool().submit(validar_clientes, bloque, dict(self.nombre_config_id))
+        except (BrokenProcessPool, RuntimeError):
+            _descartar_pool()
+            futuro = None
+        self._futuros.append((bloque, futuro))
+        # no acumular más resultados de los que el pool puede ir produciendo
+        while len(self._futuros) > 2 * CARGA_PROCESOS:
+            self._aplicar_siguiente()
+
+    def _aplicar_siguiente(self) -> None:
+        bloque, futuro = self._futuros.popleft()
+        try:
+            res = futuro.result() if futuro is not None else None
+        except BrokenProcessPool:
+            _descartar_pool()
+            res = None
+        if res is None:  # sin pool: se valida aquí
+            res = validar_clientes(bloque, self.nombre_config_id)
+        self._insertar(res)
+
+    def _cerrar_clientes(self) -> None:
+        """Fin de la sección: valida lo que quede e inserta todo en orden."""
+        if self._paralelo:
+            if self._clientes:
+                self._enviar()
+            while self._futuros:
+                self._aplicar_siguiente()
+        elif self._clientes:
+            bloque, self._clientes = self._clientes, []
+            self._insertar(validar_clientes(bloque, self.nombre_config_id))
+
+    def _insertar(self, validados: List[tuple]) -> None:
+        for nombre_xml, nombre, nit, error, instancias in validados:
+            if error is None:
+                try:
+                    cliente_id = self.almacen.add_cliente(nombre, nit)
+                except Exception as exc:
+                    error = exc
+            if error is not None:
+                self.errores.append(f"cliente '{nombre_xml}': {error}")
+                continue
+            self.cnt["clientes"] += 1
+            for args, error in instancias:
+                if error is None:
+                    try:
+                        self.almacen.add_instancia(cliente_id, *args)
+                        self.cnt["instancias"] += 1
+                        continue
+                    except Exception as exi:
+                        error = exi
+                self.errores.append(f"instancia cliente '{nombre}': {error}")
+
+
+class CargaConsumos:
+    """
+    Procesa un lote XML de consumos en streaming:
+    <consumos>
+      <consumo instancia_id="" recurso_id="" horas="" fecha_hora="dd/mm/yyyy hh:mm"/>
+    </consumos>
+    Los consumos válidos se insertan por bloques en el log de consumos.
+    """
+
+    LOTE = 5000
+
+    def __init__(self):
+        self.cnt = {"consumos": 0}
+        self.errores: List[str] = []
+        self.invalidos = 0  # rechazados por horas o fecha_hora mal formadas (la respuesta es 400)
+        self.almacen = get_almacen()
+        self._lote: List[tuple] = []
+
+    def procesar(self, fuente) -> None:
+        n = 0
+        pila: List[ET.Element] = []
+        for evento, elem in codec_xml.iterparse(fuente, events=("start", "end")):
+            if evento == "start":
+                pila.append(elem)
+                continue
+            pila.pop()
+            if len(pila) == 1:
+                if elem.tag == "consumo":
+                    n += 1
+                    self.consumo(n, elem)
+                pila[0].remove(elem)
+        self._vaciar()
+
+    def resultado(self) -> Dict[str, Any]:
+        return {"cargados": self.cnt, "errores": self.errores}
+
+    def consumo(self, n: int, c: ET.Element) -> None:
+        try:
+            try:
+                instancia_id = int(c.get("instancia_id") or "")
+                recurso_id = int(c.get("recurso_id") or "")
+            except ValueError:
+                raise ValueError("instancia_id y recurso_id deben ser enteros")
+            horas = parse_float(c.get("horas") or "", default=-1.0)
+            fecha_hora = " ".join((c.get("fecha_hora") or "").split())
+            if not (math.isfinite(horas) and horas >= 0):
+                self.invalidos += 1
+                raise ValueError("horas debe ser un número >= 0")
+            if not fecha_hora_valida(fecha_hora):
+                self.invalidos += 1
+                raise ValueError("fecha_hora no válida (dd/mm/yyyy hh:mm)")
+            if not self.almacen.existe_instancia(instancia_id):
+                raise ValueError(f"instancia {instancia_id} no existe")
+            if not self.almacen.existe_recurso(recurso_id):
+                raise ValueError(f"recurso {recurso_id} no existe")
+            self._lote.append((instancia_id, recurso_id, horas, fecha_hora))
+            if len(self._lote) >= self.LOTE:
+                self._vaciar()
+        except Exception as ex:
+            self.errores.append(f"consumo #{n}: {ex}")
+
+    def _vaciar(self) -> None:
+        if self._lote:
+            self.almacen.add_consumos(self._lote)
+            self.cnt["consumos"] += len(self._lote)
+            self._lote = []
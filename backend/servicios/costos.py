@@ -0,0 +1,198 @@
+# backend/servicios/costos.py
+"""
+Modelo de costos memoizado: costo por hora de cada configuración
+(precio_base + costo_hora de sus recursos) y de cada instancia (el de su
+configuración). Las entradas viven en un LRU acotado y cada una recuerda de
+qué recursos y configuración sale, así que cambiar el precio de un recurso
+invalida sólo lo que depende de él.
+
+  COSTOS_CAPACIDAD    entradas del LRU (configuraciones + instancias)
+  COSTOS_REVISAR_MS  cada cuánto se miran los cambios de precio de otros
+                     procesos (0 = en cada consulta)
+
+Los cambios de precio e init/importar quedan anotados en el almacén
+(almacen.cambios_costos): cada proceso los lee desde la última posición
+que vio e invalida lo que corresponde, así que otro worker deja de servir
+un precio viejo a lo sumo COSTOS_REVISAR_MS después.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from data.almacen import get_almacen
+from servicios.metricas import COSTOS_CACHE
+
+COSTOS_CAPACIDAD = int(os.environ.get("COSTOS_CAPACIDAD", "10000"))
+COSTOS_REVISAR_MS = float(os.environ.get("COSTOS_REVISAR_MS", "20"))
+# aciertos y fallos pasan a /api/metrics cada tantas consultas (no en cada una:
+# el contador compartido costaba más que el acierto mismo)
+PUBLICAR_CADA = 1024
+
+Clave = Tuple[str, int]  # ("configuracion" | "instancia", id)
+
+_modelo = None
+_creando = threading.Lock()
+
+
+class ModeloCostos:
+    def __init__(self, almacen, capacidad: int = COSTOS_CAPACIDAD):
+        self.almacen = almacen
+        self.capacidad = max(1, capacidad)
+        self.lock = threading.Lock()
+        self._valores: "OrderedDict[Clave, float]" = OrderedDict()
+        # fuente ("recurso"|"configuracion", id) -> entradas que salen de ella, y al revés
+        self._dependientes: Dict[Clave, Set[Clave]] = {}
+        self._fuentes: Dict[Clave, List[Clave]] = {}
+        # sube con cada invalidación: un cálculo que empezó antes no se guarda
+        self._generacion = 0
+        self.aciertos = self.fallos = self.desalojos = self.invalidaciones = 0
+        self._publicados = (0, 0)  # aciertos y fallos ya sumados a COSTOS_CACHE
+        # hasta dónde se leyeron los cambios de precio del almacén, y cuándo
+        self._posicion = almacen.cambios_costos(0)[0]
+        self._revisado = time.monotonic()
+        self._revisando = threading.Lock()
+
+    # --------- Consultas ---------
+    def costo_configuracion(self, configuracion_id: int) -> Optional[float]:
+        """Costo por hora de la configuración; None si no existe."""
+        res = self._configuracion(int(configuracion_id))
+        return res[0] if res is not None else None
+
+    def costo_instancia(self, instancia_id: int) -> Optional[float]:
+        """Costo por hora de la instancia (el de su configuración); None si no existe."""
+        self.al_dia()
+        clave = ("instancia", int(instancia_id))
+        valor, _, gen = self._buscar(clave)
+        if valor is not None:
+            return valor
+        cfg_id = self.almacen.configuracion_de_instancia(clave[1])
+        res = self._configuracion(cfg_id) if cfg_id is not None else None
+        if res is None:
+            return None
+        # depende directo de los recursos: sigue valiendo aunque se desaloje la configuración
+        self._guardar(clave, res[0], res[1], gen)
+        return res[0]
+
+    def _configuracion(self, cfg_id: int) -> Optional[Tuple[float, List[Clave]]]:
+        self.al_dia()
+        clave = ("configuracion", cfg_id)
+        valor, fuentes, gen = self._buscar(clave)
+        if valor is not None:
+            return valor, fuentes
+        cfg = self.almacen.configuracion(cfg_id)
+        if cfg is None:
+            return None  # no se memoriza: puede crearse después
+        valor = cfg.precio_base + sum(self.almacen.costo_recurso(r) or 0.0 for r in cfg.recursos)
+        fuentes = [clave] + [("recurso", r) for r in sorted(set(cfg.recursos))]
+        self._guardar(clave, valor, fuentes, gen)
+        return valor, fuentes
+
+    def _buscar(self, clave: Clave) -> Tuple[Optional[float], List[Clave], int]:
+        with self.lock:
+            valor = self._valores.get(clave)
+            if valor is None:
+                self.fallos += 1
+                res = None, [], self._generacion
+            else:
+                self._valores.move_to_end(clave)
+                self.aciertos += 1
+                res = valor, self._fuentes[clave], self._generacion
+            if (self.aciertos + self.fallos) % PUBLICAR_CADA == 0:
+                self._publicar()
+            return res
+
+    def _publicar(self) -> None:
+        aciertos, fallos = self._publicados
+        COSTOS_CACHE.sumar(self.aciertos - aciertos, "acierto")
+        COSTOS_CACHE.sumar(self.fallos - fallos, "fallo")
+        self._publicados = (self.aciertos, self.fallos)
+
+    def _guardar(self, clave: Clave, valor: float, fuentes: List[Clave], gen: int) -> None:
+        with self.lock:
+            if gen != self._generacion:
+                return  # hubo una invalidación mientras se calculaba
+            self._quitar(clave)
+            self._valores[clave] = valor
+            self._fuentes[clave] = fuentes
+            for f in fuentes:
+                self._dependientes.setdefault(f, set()).add(clave)
+            while len(self._valores) > self.capacidad:
+                self._quitar(next(iter(self._valores)))
+                self.desalojos += 1
+                COSTOS_CACHE.sumar(1, "desalojo")
+
+    def _quitar(self, clave: Clave) -> bool:
+        if self._valores.pop(clave, None) is None:
+            return False
+        for f in self._fuentes.pop(clave, ()):
+            deps = self._dependientes.get(f)
+            if deps is not None:
+                deps.discard(clave)
+                if not deps:
+                    del self._dependientes[f]
+        return True
+
+    # --------- Invalidación ---------
+    def al_dia(self, forzar: bool = False) -> None:
+        """Aplica los cambios de precio anotados por cualquier proceso desde la última revisión."""
+        ahora = time.monotonic()
+        if not forzar and (ahora - self._revisado) * 1000 < COSTOS_REVISAR_MS:
+            return
+        self._revisado = ahora
+        with self._revisando:  # de a un hilo: nadie avanza la posición antes de invalidar
+            posicion, cambios = self.almacen.cambios_costos(self._posicion)
+            if None in cambios:
+                self.limpiar()
+            else:
+                for rid in set(cambios):
+                    self.invalidar_recurso(rid)
+            self._posicion = posicion
+
+    def _invalidar(self, fuente: Clave) -> int:
+        with self.lock:
+            self._generacion += 1
+            n = sum(self._quitar(c) for c in list(self._dependientes.get(fuente, ())))
+            self.invalidaciones += n
+            COSTOS_CACHE.sumar(n, "invalidacion")
+            return n
+
+    def invalidar_recurso(self, recurso_id: int) -> int:
+        """Olvida las configuraciones e instancias que usan el recurso; devuelve cuántas."""
+        return self._invalidar(("recurso", int(recurso_id)))
+
+    def invalidar_configuracion(self, configuracion_id: int) -> int:
+        return self._invalidar(("configuracion", int(configuracion_id)))
+
+    def limpiar(self) -> None:
+        with self.lock:
+            self._generacion += 1
+            self._valores.clear()
+            self._dependientes.clear()
+            self._fuentes.clear()
+
+    def estadisticas(self) -> Dict[str, float]:
+        with self.lock:
+            self._publicar()
+            consultas = self.aciertos + self.fallos
+            return {"capacidad": self.capacidad, "entradas": len(self._valores),
+                    "aciertos": self.aciertos, "fallos": self.fallos, "desalojos": self.desalojos,
+                    "invalidaciones": self.invalidaciones,
+                    "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None}
+
+
+def get_modelo_costos() -> ModeloCostos:
+    global _modelo
+    with _creando:
+        if _modelo is None:
+            _modelo = ModeloCostos(get_almacen())
+        return _modelo
+
+
+def actualizar_costo_recurso(recurso_id: int, costo_hora: float) -> bool:
+    """Cambia el precio en el almacén e invalida lo que dependía de él."""
+    if not get_almacen().actualizar_costo_recurso(recurso_id, costo_hora):
+        return False
+    get_modelo_costos().invalidar_recurso(recurso_id)
+    return True
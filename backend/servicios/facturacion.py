@@ -0,0 +1,132 @@
+# backend/servicios/facturacion.py
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from data.almacen import get_almacen
+from models.entidades import Factura, LineaFactura
+
+_facturando = threading.Lock()
+
+
+def fecha_ordinal(s: str) -> int:
+    """'dd/mm/yyyy' o 'dd/mm/yyyy hh:mm' -> número de día (date.toordinal)."""
+    return datetime.strptime(s.strip()[:10], "%d/%m/%Y").toordinal()
+
+
+def agrupar(cliente: np.ndarray, instancia: np.ndarray, recurso: np.ndarray,
+            horas: np.ndarray, costo_hora: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Agrupa filas de consumo por (cliente, instancia, recurso) con operaciones
+    vectorizadas. `costo_hora` es un arreglo indexado por recurso_id.
+    Devuelve (cliente, instancia, recurso, horas, monto) de cada grupo,
+    ordenado por cliente.
+    """
+    if len(horas) == 0:
+        vacio_i = np.empty(0, dtype=np.int64)
+        vacio_f = np.empty(0, dtype=np.float64)
+        return vacio_i, vacio_i, vacio_i, vacio_f, vacio_f
+    monto = horas * costo_hora[recurso]
+
+    # Cada instancia pertenece a un solo cliente, así que (instancia, recurso)
+    # ya identifica el grupo. Si el espacio de claves es denso se agrupa con
+    # bincount en O(n); si no, se ordena.
+    n_rec = int(recurso.max()) + 1
+    clave = instancia * n_rec + recurso
+    espacio = int(clave.max()) + 1
+    if espacio <= max(4 * len(clave), 1 << 20):
+        presentes = np.flatnonzero(np.bincount(clave, minlength=espacio))
+        g_horas = np.bincount(clave, weights=horas, minlength=espacio)[presentes]
+        g_monto = np.bincount(clave, weights=monto, minlength=espacio)[presentes]
+        cliente_de = np.empty(espacio, dtype=np.int64)
+        cliente_de[clave] = cliente
+        g_cli = cliente_de[presentes]
+        orden = np.argsort(g_cli, kind="stable")
+        return (g_cli[orden], (presentes // n_rec)[orden], (presentes % n_rec)[orden],
+                g_horas[orden], g_monto[orden])
+
+    orden = np.lexsort((recurso, instancia, cliente))
+    c, i, r = cliente[orden], instancia[orden], recurso[orden]
+    cambio = np.empty(len(c), dtype=bool)
+    cambio[0] = True
+    cambio[1:] = (c[1:] != c[:-1]) | (i[1:] != i[:-1]) | (r[1:] != r[:-1])
+    inicios = np.flatnonzero(cambio)
+    return (c[inicios], i[inicios], r[inicios],
+            np.add.reduceat(horas[orden], inicios),
+            np.add.reduceat(monto[orden], inicios))
+
+
+def _mapas(almacen) -> Tuple[np.ndarray, np.ndarray, Dict[int, str]]:
+    """costo_hora por recurso_id, cliente_id por instancia_id y NIT por cliente."""
+    costos = almacen.costos_recursos()
+    costo = np.full(max(costos, default=0) + 1, np.nan)
+    for rid, c in costos.items():
+        costo[rid] = c
+    pares = almacen.cliente_de_instancias()
+    cliente_de = np.full(max(pares, default=0) + 1, -1, dtype=np.int64)
+    for iid, cid in pares.items():
+        cliente_de[iid] = cid
+    return costo, cliente_de, almacen.nits_clientes()
+
+
+def facturar(fecha_inicio: str, fecha_fin: str) -> Dict[str, Any]:
+    """
+    Genera las facturas de los consumos no facturados entre fecha_inicio y
+    fecha_fin (inclusive, dd/mm/yyyy): una Factura por cliente con una
+    LineaFactura por (instancia, recurso). Las facturas y el flag facturado
+    de los consumos usados se guardan juntos en una sola transacción.
+    """
+    ini, fin = fecha_ordinal(fecha_inicio), fecha_ordinal(fecha_fin)
+    if fin < ini:
+        raise ValueError("fecha_fin es anterior a fecha_inicio")
+
+    almacen = get_almacen()
+    # dos corridas simultáneas (hilos o workers) facturarían los mismos consumos
+    with _facturando, almacen.exclusivo():
+        cols = almacen.consumos_rango(fecha_inicio, fecha_fin)
+        costo, cliente_de, nits = _mapas(almacen)
+
+        ins, rec = cols["instancia_id"], cols["recurso_id"]
+        sel = cols["facturado"] == 0
+        sel &= (ins < len(cliente_de)) & (rec < len(costo))
+        cliente = np.where(sel, cliente_de[np.where(sel, ins, 0)], -1)
+        sel &= cliente >= 0
+        sel &= ~np.isnan(costo[np.where(sel, rec, 0)])
+        filas = np.flatnonzero(sel)
+
+        g_cli, g_ins, g_rec, g_horas, g_monto = agrupar(
+            cliente[filas], ins[filas], rec[filas], cols["horas"][filas], costo)
+
+        facturas: List[Factura] = []
+        if len(g_cli):
+            limites = np.flatnonzero(np.r_[True, g_cli[1:] != g_cli[:-1], True])
+            fids = almacen.reservar_ids("factura", len(limites) - 1)
+            lids = iter(almacen.reservar_ids("linea", len(g_cli)))
+            fecha = datetime.fromordinal(fin).strftime("%d/%m/%Y")
+            for fid, a, b in zip(fids, limites[:-1], limites[1:]):
+                cid = int(g_cli[a])
+                f = Factura(id=fid, numero=f"F-{fid:06d}", cliente_id=cid, nit=nits.get(cid, ""),
+                            fecha=fecha, total=0.0)
+                for k in range(a, b):
+                    f.lineas.append(LineaFactura(
+                        id=next(lids), factura_id=fid, instancia_id=int(g_ins[k]),
+                        recurso_id=int(g_rec[k]), horas=float(g_horas[k]),
+                        monto=round(float(g_monto[k]), 2)))
+                # el total es la suma de las líneas tal como se imprimen
+                f.total = round(sum(ln.monto for ln in f.lineas), 2)
+                facturas.append(f)
+
+        almacen.registrar_facturacion(facturas, cols, filas)
+
+    return {
+        "facturas": len(facturas),
+        "lineas": sum(len(f.lineas) for f in facturas),
+        "consumos": int(len(filas)),
+        "total": round(sum(f.total for f in facturas), 2),
+        "detalle": [
+            {"id": f.id, "numero": f.numero, "cliente_id": f.cliente_id, "nit": f.nit, "total": f.total}
+            for f in facturas
+        ],
+    }
@@ -0,0 +1,143 @@
+# backend/servicios/metricas.py
+"""
+Métricas del proceso en formato de texto de Prometheus (/api/metrics).
+Contadores e histogramas con etiquetas; registrar una observación es un
+lock y una búsqueda binaria, así se pueden dejar siempre activas. Cada
+worker expone las suyas (Prometheus las suma por instancia).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# buckets por defecto (segundos), de 1 ms a 1 min
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registro: List["Metrica"] = []
+_registro_lock = threading.Lock()
+
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.lock = threading.Lock()
+        with _registro_lock:
+            _registro.append(self)
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def sumar(self, valor: float = 1, *etiquetas) -> None:
+        with self.lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + valor
+
+    def valor(self, *etiquetas) -> float:
+        with self.lock:
+            return self._valores.get(etiquetas, 0)
+
+    def exponer(self) -> List[str]:
+        lineas = super().exponer()
+        with self.lock:
+            for et, v in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, et)} {_numero(v)}")
+        return lineas
+
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (), buckets=BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteo por bucket (no acumulado) + desborde, suma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, *etiquetas) -> None:
+        i = bisect.bisect_left(self.buckets, valor)
+        with self.lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, *etiquetas):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - t0, *etiquetas)
+
+    def exponer(self) -> List[str]:
+        lineas = super().exponer()
+        with self.lock:
+            series = [(et, list(c), s) for et, (c, s) in sorted(self._series.items())]
+        for et, conteos, suma in series:
+            acum = 0
+            for limite, c in zip(self.buckets + (float("inf"),), conteos):
+                acum += c
+                le = 'le="%s"' % ("+Inf" if limite == float("inf") else _numero(limite))
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, et, le)} {acum}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, et)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, et)} {acum}")
+        return lineas
+
+
+def exponer() -> str:
+    """Todas las métricas registradas, en formato de texto de Prometheus 0.0.4."""
+    with _registro_lock:
+        metricas = list(_registro)
+    lineas = []
+    for m in metricas:
+        lineas.extend(m.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+# --------- Métricas del backend ---------
+HTTP_DURACION = Histograma("backend_http_duracion_seconds", "Duración de las solicitudes HTTP por ruta.",
+                           ("ruta", "metodo", "estado"))
+CONFIG_FASE = Histograma("backend_config_fase_seconds",
+                         "Tiempo de cada fase de /api/config (parse, secciones, escritura).", ("fase",))
+XML_LECTURAS = Contador("backend_xml_lecturas_total", "Archivos XML leídos y parseados.", ("coleccion",))
+XML_LEIDOS_BYTES = Contador("backend_xml_leidos_bytes_total", "Bytes de XML leídos.", ("coleccion",))
+XML_CARGA = Histograma("backend_xml_carga_seconds",
+                       "Carga de cada colección del repositorio: de la caché binaria o parse del XML.",
+                       ("coleccion", "origen"))
+XML_ESCRITURAS = Contador("backend_xml_escrituras_total", "Archivos XML escritos a disco.", ("coleccion",))
+XML_ESCRITOS_BYTES = Contador("backend_xml_escritos_bytes_total", "Bytes de XML escritos.", ("coleccion",))
+XML_ESCRITURA = Histograma("backend_xml_escritura_seconds",
+                           "Duración de cada escritura a disco del repositorio (fsync incluido).")
+DIARIO_REGISTROS = Contador("backend_diario_registros_total", "Cambios anexados al diario (política diario).", ("op",))
+DIARIO_SINCRONIZACION = Histograma("backend_diario_sincronizacion_seconds",
+                                   "Duración de cada fsync del diario (un fsync resuelve varios commits).")
+COSTOS_CACHE = Contador("backend_costos_cache_total",
+                        "Modelo de costos memoizado: aciertos, fallos, desalojos e invalidaciones.", ("evento",))
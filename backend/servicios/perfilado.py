@@ -0,0 +1,125 @@
+# backend/servicios/perfilado.py
+"""
+Perfilado de solicitudes a pedido (cProfile), para ver en qué se va el
+tiempo de una solicitud lenta puntual. Apagado por defecto: si no está
+habilitado no se instala nada y el camino de cada solicitud no cambia.
+
+  PERFIL_MUESTREO  fracción (0..1) de las solicitudes que coinciden con
+                   PERFIL_RUTAS que se perfilan; 0 = apagado
+  PERFIL_CABECERA  1 = se acepta la cabecera "X-Perfil: <fracción>" (1 =
+                   siempre) para perfilar solicitudes puntuales
+  PERFIL_RUTAS     regex sobre la ruta (por defecto ^/api/)
+  PERFIL_DIR       carpeta de salida
+  PERFIL_TOP       funciones en el resumen de texto
+  PERFIL_MIN_MS    sólo se guardan las solicitudes que tardan al menos esto
+
+Por cada solicitud perfilada se escriben <nombre>.prof (pstats; se abre con
+snakeviz o pstats) y <nombre>.txt con las funciones más costosas.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+
+PERFIL_MUESTREO = float(os.environ.get("PERFIL_MUESTREO", "0"))
+PERFIL_CABECERA = os.environ.get("PERFIL_CABECERA", "0") == "1"
+PERFIL_RUTAS = os.environ.get("PERFIL_RUTAS", r"^/api/")
+PERFIL_DIR = os.environ.get("PERFIL_DIR", os.path.join(tempfile.gettempdir(), "perfiles-backend"))
+PERFIL_TOP = int(os.environ.get("PERFIL_TOP", "30"))
+PERFIL_MIN_MS = float(os.environ.get("PERFIL_MIN_MS", "0"))
+
+CABECERA = "HTTP_X_PERFIL"  # X-Perfil en el environ de WSGI
+
+log = logging.getLogger(__name__)
+
+
+def habilitado() -> bool:
+    return PERFIL_MUESTREO > 0 or PERFIL_CABECERA
+
+
+class PerfilWSGI:
+    """Middleware WSGI que perfila las solicitudes elegidas."""
+
+    def __init__(self, app, carpeta: str = None, muestreo: float = None, cabecera: bool = None,
+                 rutas: str = None, top: int = None, min_ms: float = None):
+        self.app = app
+        self.carpeta = carpeta or PERFIL_DIR
+        self.muestreo = PERFIL_MUESTREO if muestreo is None else muestreo
+        self.cabecera = PERFIL_CABECERA if cabecera is None else cabecera
+        self.rutas = re.compile(rutas or PERFIL_RUTAS)
+        self.top = top or PERFIL_TOP
+        self.min_ms = PERFIL_MIN_MS if min_ms is None else min_ms
+        # un solo perfil a la vez: cProfile no admite dos activos en el proceso
+        # en todas las versiones, y dos a la vez se estorban en la medición
+        self._activo = threading.Lock()
+        self.perfiladas = 0
+
+    def _elegir(self, environ) -> bool:
+        if not self.rutas.search(environ.get("PATH_INFO", "")):
+            return False
+        fraccion = self.muestreo
+        if self.cabecera and CABECERA in environ:
+            try:
+                fraccion = float(environ[CABECERA])
+            except ValueError:
+                pass
+        return fraccion > 0 and (fraccion >= 1 or random.random() < fraccion)
+
+    def __call__(self, environ, start_response):
+        if not self._elegir(environ) or not self._activo.acquire(blocking=False):
+            return self.app(environ, start_response)
+        perfil = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            perfil.enable()
+            try:
+                # se consume la respuesta dentro del perfil (incluye vistas en streaming)
+                respuesta = self.app(environ, start_response)
+                try:
+                    cuerpo = list(respuesta)
+                finally:
+                    if hasattr(respuesta, "close"):
+                        respuesta.close()
+            finally:
+                perfil.disable()
+        finally:
+            self._activo.release()
+        ms = (time.perf_counter() - t0) * 1000
+        if ms >= self.min_ms:
+            try:
+                self._guardar(perfil, environ, ms)
+            except OSError as e:
+                log.warning("no se pudo guardar el perfil: %s", e)
+        return cuerpo
+
+    def _guardar(self, perfil: cProfile.Profile, environ, ms: float) -> str:
+        os.makedirs(self.carpeta, exist_ok=True)
+        ruta = re.sub(r"[^A-Za-z0-9_.-]+", "_", environ.get("PATH_INFO", "").strip("/")) or "raiz"
+        nombre = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{environ.get('REQUEST_METHOD', '')}"
+                  f"-{ruta}-{int(ms)}ms")
+        base = os.path.join(self.carpeta, nombre)
+        perfil.dump_stats(base + ".prof")
+        texto = io.StringIO()
+        texto.write(f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+                    f"{'?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING') else ''}  {ms:.1f} ms\n\n")
+        stats = pstats.Stats(perfil, stream=texto)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(texto.getvalue())
+        self.perfiladas += 1
+        log.info("perfil guardado: %s (%.1f ms)", base, ms)
+        return base
+
+
+def instalar(app) -> None:
+    """Envuelve la app Flask si el perfilado está habilitado; si no, no hace nada."""
+    if habilitado():
+        app.wsgi_app = PerfilWSGI(app.wsgi_app)
+        log.warning("perfilado activo: muestreo=%s cabecera=%s -> %s", PERFIL_MUESTREO, PERFIL_CABECERA, PERFIL_DIR)
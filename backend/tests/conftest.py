@@ -0,0 +1,69 @@
+# backend/tests/conftest.py
+"""
+Pruebas del backend. Uso (desde backend/):  python -m pytest tests
+La fixture `tienda` deja xml_tienda (y el almacén y el modelo de costos)
+sobre tmp_path con sus singletons nuevos; reiniciar() simula el fin del
+proceso, ordenado o por un corte, y el próximo uso vuelve a leer de disco.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+from data import almacen, xml_tienda  # noqa: E402
+from servicios import costos  # noqa: E402
+
+SINGLETONS = (
+    (xml_tienda, ("_repo", "_secuencias", "_log_consumos", "_particiones", "_agregados")),
+    (almacen, ("_almacen",)),
+    (costos, ("_modelo",)),
+)
+
+# lo que un corte deja abierto: no se cierra ni se vacía, como con os._exit
+_cortados = []
+
+
+def reiniciar(corte: bool = False) -> None:
+    """Termina el "proceso": con corte no se escribe nada más de lo que ya estaba en disco."""
+    repo = xml_tienda._repo
+    if repo is not None:
+        if corte:
+            repo.abandonar()
+            if repo.diario is not None and repo.diario._fh is not None:
+                _cortados.append(repo.diario._fh)
+                repo.diario._fh = None
+            if repo._bloqueo is not None:
+                repo._bloqueo.soltar()  # el sistema suelta el flock de un proceso que muere
+        else:
+            repo.cerrar()
+            repo.abandonar()  # atexit ya no tiene nada que hacer
+    if almacen._almacen is not None and hasattr(almacen._almacen, "cerrar") and not corte:
+        almacen._almacen.cerrar()
+    for modulo, nombres in SINGLETONS:
+        for nombre in nombres:
+            setattr(modulo, nombre, None)
+
+
+@pytest.fixture
+def tienda(tmp_path, monkeypatch):
+    """xml_tienda sobre tmp_path; se configura con monkeypatch (p.ej. XML_FLUSH) antes del primer uso."""
+    monkeypatch.setattr(xml_tienda, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(almacen, "SQLITE_PATH", str(tmp_path / "tienda.sqlite3"))
+    for modulo, nombres in SINGLETONS:
+        for nombre in nombres:
+            monkeypatch.setattr(modulo, nombre, None)
+    yield xml_tienda
+    reiniciar()
+
+
+@pytest.fixture
+def cliente(tienda):
+    """Cliente de prueba de la app Flask sobre la tienda temporal, recién inicializada."""
+    import app as app_mod
+    c = app_mod.app.test_client()
+    assert c.post("/api/init").status_code == 200
+    return c
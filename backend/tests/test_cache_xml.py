@@ -0,0 +1,61 @@
+# backend/tests/test_cache_xml.py
+import os
+
+import pytest
+
+from conftest import reiniciar
+
+
+@pytest.fixture
+def xt(tienda):
+    tienda.init_all()
+    r = tienda.add_recurso("cpu", "Hardware", 2.5)
+    c = tienda.add_categoria("web", "d")
+    k = tienda.add_config("cfg", c, 10, [r])
+    for n in range(20):
+        tienda.add_instancia(tienda.add_cliente(f"A{n}", f"N{n}"), k, "Vigente", "01/01/2024")
+    tienda.cargar_indices()
+    reiniciar()  # al cerrar se escriben las cachés
+    return tienda
+
+
+def _origen(xt, key="clientes_instancias"):
+    return xt.cargar_indices()[key]["origen"]
+
+
+def test_arranque_desde_la_cache(xt, tmp_path):
+    assert (tmp_path / "clientes_instancias.xml.cache").exists()
+    assert _origen(xt) == "cache"
+    assert not xt.get_repo().coleccion("clientes_instancias").cargada  # sin parsear el XML
+    assert xt.cliente_por_nit("N7") == 8
+    assert xt.instancias_de_cliente(8) == [8]
+
+
+def test_xml_editado_a_mano_invalida_la_cache(xt, tmp_path):
+    p = tmp_path / "clientes_instancias.xml"
+    p.write_text(p.read_text().replace("N3<", "Q3<"))
+    assert _origen(xt) == "xml"
+    assert xt.cliente_por_nit("Q3") == 4
+    assert xt.cliente_por_nit("N3") is None
+    reiniciar()
+    assert _origen(xt) == "cache"  # se rehízo para la versión nueva
+
+
+def test_mismo_tamano_y_mtime_pero_otro_contenido(xt, tmp_path):
+    p = tmp_path / "clientes_instancias.xml"
+    st = os.stat(p)
+    p.write_text(p.read_text().replace("N3<", "Q3<"))  # mismo largo
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert _origen(xt) == "xml"
+    assert xt.cliente_por_nit("Q3") == 4
+
+
+def test_cache_danada_se_ignora(xt, tmp_path):
+    (tmp_path / "clientes_instancias.xml.cache").write_bytes(b"basura")
+    assert _origen(xt) == "xml"
+    assert xt.cliente_por_nit("N3") == 4
+
+
+def test_sin_cache_con_xml_cache_0(xt, monkeypatch):
+    monkeypatch.setattr(xt, "XML_CACHE", False)
+    assert _origen(xt) != "cache"
@@ -0,0 +1,67 @@
+# backend/tests/test_carga.py
+import io
+import math
+
+import pytest
+
+CONFIG = b"""<config><recursos><recurso nombre="cpu" tipo="Hardware" costo_hora="2.5"/></recursos>
+<categorias><categoria nombre="web" descripcion="d"/></categorias>
+<configuraciones><configuracion nombre="small" categoria="web" precio_base="10">
+<recursos><recurso nombre="cpu"/></recursos></configuracion></configuraciones>
+<clientes><cliente nombre="A" nit="123-4"><instancias>
+<instancia configuracion="small" estado="Vigente" fecha_inicio="01/01/2024"/></instancias></cliente></clientes></config>"""
+
+
+def _subir(c, ruta, doc):
+    return c.post(ruta, data={"file": (io.BytesIO(doc), "c.xml")}, content_type="multipart/form-data")
+
+
+def _consumo(horas, fecha_hora):
+    return f'<consumo instancia_id="1" recurso_id="1" horas="{horas}" fecha_hora="{fecha_hora}"/>'
+
+
+@pytest.fixture
+def cargado(cliente):
+    assert _subir(cliente, "/api/config", CONFIG).status_code == 200
+    return cliente
+
+
+@pytest.fixture
+def almacen(cargado):
+    from data.almacen import get_almacen
+    return get_almacen()
+
+
+@pytest.mark.parametrize("horas,fecha_hora", [
+    ("2", "31/02/2025 10:00"),         # no existe
+    ("2", "05/12/2025 24:30"),
+    ("2", "xx 05/12/2025 10:00 yy"),   # fecha válida con basura alrededor
+    ("2", "05/12/2025"),
+    ("nan", "05/12/2025 10:00"),
+    ("inf", "05/12/2025 10:00"),
+    ("-1", "05/12/2025 10:00"),
+    ("", "05/12/2025 10:00"),
+])
+def test_consumo_invalido_se_rechaza(cargado, almacen, horas, fecha_hora):
+    antes = len(almacen.pagina("consumos", 0, 10_000))
+    doc = f"<consumos>{_consumo(horas, fecha_hora)}{_consumo('1.5', '05/12/2025  10:00')}</consumos>"
+    r = _subir(cargado, "/api/consumo", doc.encode())
+    assert r.status_code == 400
+    # el válido del mismo lote se guarda; el inválido no llega al log
+    assert r.get_json()["cargados"]["consumos"] == 1
+    nuevos = almacen.pagina("consumos", 0, 10_000)[antes:]
+    assert [(c.horas, c.fecha_hora) for c in nuevos] == [(1.5, "05/12/2025 10:00")]
+
+
+def test_lote_valido_responde_200(cargado):
+    r = _subir(cargado, "/api/consumo", f"<consumos>{_consumo('0', '29/02/2024 23:59')}</consumos>".encode())
+    assert r.status_code == 200 and r.get_json()["cargados"]["consumos"] == 1
+
+
+@pytest.mark.parametrize("horas,fecha_hora", [
+    (math.nan, "05/12/2025 10:00"), (math.inf, "05/12/2025 10:00"), (-1.0, "05/12/2025 10:00"),
+    (1.0, "31/02/2025 10:00"),
+])
+def test_almacen_rechaza_consumos_invalidos(almacen, horas, fecha_hora):
+    with pytest.raises(ValueError):
+        almacen.add_consumos([(1, 1, horas, fecha_hora)])
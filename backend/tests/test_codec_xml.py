@@ -0,0 +1,48 @@
+# backend/tests/test_codec_xml.py
+import glob
+import io
+import os
+
+import pytest
+
+from data import codec_xml
+
+pytest.importorskip("lxml")
+
+DOCUMENTOS = [
+    b"<a><b /><c></c><d>texto</d></a>",
+    b'<a x="1\t2" y="&lt;&amp;&quot;" />',
+    "<a><nombre>Peña Álvarez €</nombre></a>".encode(),
+    b"<a>\n  <b>1</b>\n  <b>2</b>\n</a>\n",
+    b"<a>l\xc3\xadnea\r\notra</a>",
+    b"<?xml version='1.0' encoding='utf-8'?>\n<!-- comentario --><a><?pi x?><b/></a>",
+]
+
+
+@pytest.fixture(scope="module")
+def codecs():
+    return codec_xml.CodecStdlib(), codec_xml.CodecLxml()
+
+
+@pytest.mark.parametrize("doc", DOCUMENTOS)
+def test_misma_salida_al_reescribir(codecs, doc):
+    stdlib, lxml = codecs
+    assert lxml.tostring(lxml.parse(io.BytesIO(doc))) == stdlib.tostring(stdlib.parse(io.BytesIO(doc)))
+
+
+def test_misma_salida_con_elementos_nuevos(codecs):
+    salidas = []
+    for c in codecs:
+        root = c.Element("clientes")
+        cl = c.SubElement(root, "cliente", id="1")
+        c.SubElement(cl, "nombre").text = "A & B <x>"
+        c.SubElement(cl, "nit").text = ""
+        c.SubElement(cl, "instancias")
+        salidas.append(c.tostring(c.ElementTree(root)))
+    assert salidas[0] == salidas[1]
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(os.path.dirname(codec_xml.__file__), "*.xml"))))
+def test_archivos_de_datos(codecs, path):
+    stdlib, lxml = codecs
+    assert lxml.tostring(lxml.parse(path)) == stdlib.tostring(stdlib.parse(path))
@@ -0,0 +1,66 @@
+# backend/tests/test_diario.py
+import os
+
+import pytest
+
+from conftest import reiniciar
+
+
+@pytest.fixture
+def xt(tienda, monkeypatch):
+    monkeypatch.setattr(tienda, "XML_FLUSH", "diario")
+    monkeypatch.setattr(tienda, "XML_FLUSH_MS", 600_000)  # sin instantáneas en el medio
+    tienda.init_all()
+    return tienda
+
+
+def _datos(xt):
+    r = xt.add_recurso("cpu", "Hardware", 2.5)
+    c = xt.add_categoria("web", "d")
+    k = xt.add_config("cfg", c, 10, [r])
+    xt.add_instancia(xt.add_cliente("A", "1-1"), k, "Vigente", "01/01/2024")
+
+
+def test_se_recupera_lo_confirmado_tras_un_corte(xt, tmp_path):
+    _datos(xt)
+    reiniciar(corte=True)
+    assert "1-1" not in (tmp_path / "clientes_instancias.xml").read_text()
+    assert xt.cliente_por_nit("1-1") == 1
+    assert xt.instancias_de_cliente(1) == [1]
+    assert xt.configuracion_por_nombre("cfg") == 1
+    assert xt.add_cliente("B", "2-2") == 2  # las secuencias siguen después de lo recuperado
+    reiniciar()
+    # al cerrar normal queda la instantánea en los XML
+    assert "2-2" in (tmp_path / "clientes_instancias.xml").read_text()
+
+
+def test_ignora_un_registro_cortado_a_la_mitad(xt):
+    _datos(xt)
+    xt.add_cliente("C", "3-3")
+    d = xt.get_repo().diario
+    d.sincronizar()
+    with open(d._fh.name, "ab") as f:
+        f.write(b'{"lsn": 999, "col": "clientes_in')
+    reiniciar(corte=True)
+    assert xt.cliente_por_nit("3-3") == 2
+    assert xt.add_cliente("D", "4-4") == 3
+
+
+def test_init_cortado_deja_todo_vacio(xt):
+    _datos(xt)
+    reiniciar(corte=True)
+    d = xt.get_repo().diario
+    d.anexar("*", "init")
+    d.sincronizar()
+    reiniciar(corte=True)
+    assert xt.cliente_por_nit("1-1") is None
+    assert xt.add_cliente("E", "5-5") == 1
+
+
+def test_sin_diario_con_flush_por_commit(tienda, tmp_path, monkeypatch):
+    monkeypatch.setattr(tienda, "XML_FLUSH", "commit")
+    tienda.init_all()
+    _datos(tienda)
+    reiniciar(corte=True)
+    assert not os.path.isdir(tmp_path / "diario") or not os.listdir(tmp_path / "diario")
+    assert "1-1" in (tmp_path / "clientes_instancias.xml").read_text()
@@ -0,0 +1,50 @@
+# backend/tests/test_facturacion.py
+import pytest
+
+from data import almacen
+
+
+@pytest.fixture
+def xt(tienda):
+    tienda.init_all()
+    r = tienda.add_recurso("cpu", "Hardware", 2.5)
+    k = tienda.add_config("cfg", tienda.add_categoria("web", "d"), 10, [r])
+    tienda.add_instancia(tienda.add_cliente("A", "1-1"), k, "Vigente", "01/01/2024")
+    tienda.add_consumos([(1, 1, 1.0, f"{d:02d}/01/2024 10:00") for d in range(1, 6)])
+    return tienda
+
+
+def test_corte_antes_de_marcar_las_particiones_no_factura_dos_veces(xt, monkeypatch):
+    if almacen.ALMACEN != "xml":
+        pytest.skip("las particiones son del almacén XML")
+    from servicios.facturacion import facturar
+    part = xt.get_particiones()
+
+    def falla(*_):
+        raise OSError("disco lleno")
+    with monkeypatch.context() as m:
+        m.setattr(part, "marcar_facturados", falla)
+        with pytest.raises(OSError):
+            facturar("01/01/2024", "31/01/2024")
+    # consumos.xml ya dice facturado; los .fact no
+    assert all(c.facturado for c in xt.pagina("consumos", 0, 100))
+    res = facturar("01/01/2024", "31/01/2024")
+    assert res["consumos"] == 0 and res["facturas"] == 0
+    assert len(xt.pagina("facturas", 0, 100)) == 1
+    # los .fact quedaron corregidos
+    assert (xt.consumos_rango("01/01/2024", "31/01/2024")["facturado"] == 1).all()
+
+
+
+def test_total_es_la_suma_de_las_lineas(tienda):
+    from data.almacen import get_almacen
+    from servicios.facturacion import facturar
+    al = get_almacen()
+    al.init_all()
+    k = al.add_config("cfg", al.add_categoria("web", "d"), 0,
+                      [al.add_recurso("a", "Hardware", 0.015), al.add_recurso("b", "Hardware", 0.015)])
+    al.add_instancia(al.add_cliente("A", "1-1"), k, "Vigente", "01/01/2024")
+    al.add_consumos([(1, 1, 1.0, "02/01/2024 10:00"), (1, 2, 1.0, "02/01/2024 10:00")])
+    facturar("01/01/2024", "31/01/2024")
+    f = al.pagina("facturas", 0, 10)[0]
+    assert f.total == round(sum(ln.monto for ln in f.lineas), 2)
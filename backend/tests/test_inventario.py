@@ -0,0 +1,57 @@
+# backend/tests/test_inventario.py
+import json
+
+import pytest
+
+from data import inventario
+
+
+@pytest.fixture
+def productos(tmp_path, monkeypatch):
+    """Cliente de la app con inventario.json en tmp_path y un producto."""
+    ruta = tmp_path / "inventario.json"
+    ruta.write_text(json.dumps([{"id": "p1", "nombre": "Leche", "precio": 5.5, "cantidad": 3}]))
+    monkeypatch.setattr(inventario, "INVENTARIO_PATH", str(ruta))
+    monkeypatch.setattr(inventario, "_inventario", None)
+    import app as app_mod
+    return app_mod.app.test_client()
+
+
+def test_ruta_original_acepta_cuerpo_sin_content_type(productos):
+    r = productos.put("/productos/p1", data=json.dumps({"cantidad": 7}), content_type="text/plain")
+    assert r.status_code == 200
+    assert r.get_json()["cantidad"] == 7
+    assert inventario.get_inventario().obtener("p1")["cantidad"] == 7
+
+
+@pytest.mark.parametrize("ruta,cuerpo,codigo,error", [
+    ("/productos/nada", {"precio": 1}, 404, "No encontrado"),
+    ("/productos/p1", {"precio": -1}, 400, "El precio no puede ser negativo"),
+    ("/productos/p1", {"cantidad": -1}, 400, "La cantidad no puede ser negativa"),
+    ("/api/productos/nada", {"precio": 1}, 404, "Producto no encontrado"),
+])
+def test_textos_de_error(productos, ruta, cuerpo, codigo, error):
+    r = productos.put(ruta, json=cuerpo)
+    assert r.status_code == codigo
+    assert r.get_json() == {"error": error}
+
+
+@pytest.mark.parametrize("campos,error", [
+    ({"nombre": None}, "nombre debe ser texto"),
+    ({"categoria": True}, "categoria debe ser texto"),
+    ({"descripcion": 3}, "descripcion debe ser texto"),
+    ({"precio": True}, "precio debe ser un número"),
+    ({"cantidad": False}, "cantidad debe ser un número"),
+    ({"precio": None}, "precio debe ser un número"),
+    ({"cantidad": 2.7}, "cantidad debe ser un número entero"),
+    ({"cantidad": "2.7"}, "cantidad debe ser un número entero"),
+    ({"fecha_vencimiento": 20250101}, "fecha_vencimiento debe ser yyyy-mm-dd"),
+])
+def test_validar_rechaza_tipos(campos, error):
+    with pytest.raises(ValueError, match=error):
+        inventario.validar(campos, parcial=True)
+
+
+def test_validar_normaliza_numeros():
+    assert inventario.validar({"nombre": "Pan", "precio": "1.5", "cantidad": 2.0}) == {
+        "nombre": "Pan", "precio": 1.5, "cantidad": 2}
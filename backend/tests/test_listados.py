@@ -0,0 +1,66 @@
+# backend/tests/test_listados.py
+import os
+
+import pytest
+
+from conftest import SINGLETONS
+from data import almacen
+
+
+@pytest.fixture
+def xt(cliente, tienda):
+    if almacen.ALMACEN != "xml":
+        pytest.skip("el log de consumos es del almacén XML")
+    r = tienda.add_recurso("cpu", "Hardware", 2.5)
+    k = tienda.add_config("cfg", tienda.add_categoria("web", "d"), 10, [r])
+    tienda.add_instancia(tienda.add_cliente("A", "1-1"), k, "Vigente", "01/01/2024")
+    tienda.add_consumos([(1, 1, 1.0, f"{d:02d}/01/2024 10:00") for d in range(1, 11)])
+    tienda.compactar_consumos()
+    tienda.add_consumos([(1, 1, 2.0, f"{d:02d}/02/2024 10:00") for d in range(1, 11)])  # quedan en el log
+    return tienda
+
+
+def _ids(cliente, query):
+    r = cliente.get(f"/api/consumos?{query}")
+    assert r.status_code == 200
+    j = r.get_json()
+    return [x["id"] for x in j["items"]], j["siguiente"]
+
+
+def _en_otro_proceso(fn):
+    """Corre fn con singletons propios (otro repositorio, otro bloqueo), como otro worker."""
+    guardados = [(m, n, getattr(m, n)) for m, nombres in SINGLETONS for n in nombres]
+    for m, n, _ in guardados:
+        setattr(m, n, None)
+    from data import xml_tienda
+    try:
+        return fn()
+    finally:
+        xml_tienda._repo.cerrar()
+        xml_tienda._repo.abandonar()
+        for m, n, v in guardados:
+            setattr(m, n, v)
+
+
+def test_pagina_que_llega_al_log_no_compacta(cliente, xt, tmp_path):
+    st = os.stat(tmp_path / "consumos.xml")
+    assert _ids(cliente, "despues=5&limite=10") == (list(range(6, 16)), 15)
+    assert _ids(cliente, "despues=15") == ([16, 17, 18, 19, 20], None)
+    assert os.stat(tmp_path / "consumos.xml").st_mtime_ns == st.st_mtime_ns
+    assert xt.get_log_consumos().segmentos()
+
+
+def test_compactacion_de_otro_proceso_no_pierde_consumos(cliente, xt):
+    if xt.XML_FLUSH in ("intervalo", "cierre"):
+        pytest.skip("intervalo y cierre son de un solo proceso")
+    assert _ids(cliente, "limite=5") == ([1, 2, 3, 4, 5], 5)
+    assert _en_otro_proceso(xt.compactar_consumos) == 10
+    assert not xt.get_log_consumos().segmentos()
+    assert _ids(cliente, "limite=100") == (list(range(1, 21)), None)
+
+
+def test_ids_ya_compactados_que_quedaron_en_el_log(cliente, xt):
+    # corte entre volcar a consumos.xml y borrar los segmentos
+    xt.compactar_consumos()
+    xt.get_log_consumos().anexar([(19, 1, 1, 2.0, "19/02/2024 10:00"), (20, 1, 1, 2.0, "20/02/2024 10:00")])
+    assert _ids(cliente, "limite=100") == (list(range(1, 21)), None)
@@ -0,0 +1,53 @@
+# backend/tests/test_repositorio.py
+import threading
+
+import pytest
+
+from data.repositorio import Repositorio
+
+RAICES = {"recursos": "recursos"}
+
+
+def _repo(tmp_path, politica):
+    return Repositorio(lambda key: str(tmp_path / f"{key}.xml"), RAICES, politica=politica,
+                       intervalo_ms=600_000, bloqueo=str(tmp_path / ".lock"))
+
+
+def _escribir(repo, id_):
+    with repo.escritura():
+        repo.coleccion("recursos").agregar("recurso", id_, nombre=f"r{id_}")
+        repo.marcar("recursos")
+    repo.commit()
+
+
+@pytest.mark.parametrize("politica", ["intervalo", "cierre"])
+def test_politica_diferida_es_de_un_solo_proceso(tmp_path, politica):
+    a, b = _repo(tmp_path, politica), _repo(tmp_path, politica)
+    try:
+        _escribir(a, 1)
+        # b es otro "proceso" (otro descriptor del archivo de bloqueo): falla, no espera
+        with pytest.raises(RuntimeError, match="un solo proceso"):
+            _escribir(b, 2)
+        a.cerrar()
+        _escribir(b, 2)
+        b.cerrar()
+        assert sorted(b.coleccion("recursos").por_id) == [1, 2]
+    finally:
+        for r in (a, b):
+            r.abandonar()
+
+
+def test_commit_suelta_el_bloqueo_en_cada_commit(tmp_path):
+    a, b = _repo(tmp_path, "commit"), _repo(tmp_path, "commit")
+    try:
+        _escribir(a, 1)
+        hilo = threading.Thread(target=_escribir, args=(b, 2))
+        hilo.start()
+        hilo.join(5)
+        assert not hilo.is_alive()
+        _escribir(a, 3)
+        assert sorted(a.coleccion("recursos").por_id) == [1, 2, 3]
+    finally:
+        for r in (a, b):
+            r.cerrar()
+            r.abandonar()
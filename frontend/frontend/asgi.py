@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'frontend.settings')
 
 application = get_asgi_application()
+
+# un solo event loop de por vida: el pool de conexiones al backend se reutiliza
+from supermercado import services_async  # noqa: E402  (después de cargar Django)
+
+services_async.compartir_pool()
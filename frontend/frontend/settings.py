@@ -68,6 +68,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "frontend.wsgi.application"
+# las vistas son async: con ASGI (p.ej. uvicorn frontend.asgi:application)
+# esperar al backend no ocupa un hilo por request
+ASGI_APPLICATION = "frontend.asgi.application"
 
 
 # Database
@@ -124,3 +127,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 API_BASE_URL = "http://127.0.0.1:5000"
+
+# Caché de respuestas del backend (supermercado/cache_backend.py).
+# Con varios procesos conviene un caché compartido (Redis/Memcached).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "supermercado",
+    }
+}
+
+# endpoint -> (TTL, ventana en que se sirve vencido mientras se revalida), en segundos
+BACKEND_CACHE_TTL = {
+    "health": (5, 30),
+    "listado": (5, 30),
+}
@@ -0,0 +1,270 @@
+# frontend/supermercado/cache_backend.py
+"""
+Caché de respuestas del backend sobre el framework de caché de Django.
+
+Cada endpoint cacheable tiene su TTL (settings.BACKEND_CACHE_TTL). Pasado el
+TTL la respuesta se sigue sirviendo durante la ventana "stale" mientras se
+pide una nueva en segundo plano; los pedidos simultáneos de una clave que no
+está en caché se resuelven con una sola llamada al backend. Las llamadas que
+modifican datos invalidan todo con invalidar(). acacheado/ainvalida son
+lo mismo para las funciones async de services_async.py (mismas claves).
+"""
+import asyncio
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+log = logging.getLogger(__name__)
+
+# endpoint -> (ttl, ventana stale) en segundos; se puede pisar en settings
+TTL_POR_DEFECTO: Dict[str, Tuple[float, float]] = {
+    "health": (5, 30),
+    # páginas de los listados; las exportaciones las piden sin caché
+    "listado": (5, 30),
+}
+_GENERACION = "backend:generacion"
+
+
+def _cache():
+    return caches[getattr(settings, "BACKEND_CACHE_ALIAS", "default")]
+
+
+def _ttl(endpoint: str) -> Tuple[float, float]:
+    ttl = {**TTL_POR_DEFECTO, **getattr(settings, "BACKEND_CACHE_TTL", {})}.get(endpoint, (0, 0))
+    return ttl if isinstance(ttl, (tuple, list)) else (ttl, 0)
+
+
+# --------- Estadísticas ---------
+_stats = {"aciertos": 0, "vencidos": 0, "fallos": 0, "llamadas": 0, "colapsados": 0, "invalidaciones": 0}
+_stats_lock = threading.Lock()
+
+
+def _contar(campo: str) -> None:
+    with _stats_lock:
+        _stats[campo] += 1
+
+
+def estadisticas() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+# --------- Invalidación ---------
+# La generación vive en la caché (compartida si la caché lo es), pero aun sin
+# timeout la caché puede desalojarla (LocMemCache al pasar MAX_ENTRIES). Si
+# volviera a empezar en 0 se servirían de nuevo las claves viejas de esa
+# generación; por eso arranca en el reloj en ns, mayor que cualquier anterior.
+def _generacion_nueva() -> int:
+    return time.time_ns()
+
+
+def _generacion() -> int:
+    return _cache().get_or_set(_GENERACION, _generacion_nueva, None)
+
+
+def invalidar() -> None:
+    """Deja obsoletas todas las respuestas cacheadas (cambia la generación de las claves)."""
+    c = _cache()
+    try:
+        c.incr(_GENERACION)
+    except ValueError:
+        c.add(_GENERACION, _generacion_nueva(), None)
+    _contar("invalidaciones")
+
+
+def _clave(endpoint: str, args: tuple) -> str:
+    return f"backend:{_generacion()}:{endpoint}:{':'.join(map(str, args))}"
+
+
+# --------- Una sola llamada por clave ---------
+class _Vuelo:
+    """Llamada al backend en curso; los demás pedidos de la misma clave la esperan."""
+    __slots__ = ("listo", "valor", "error")
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_vuelos: Dict[str, _Vuelo] = {}
+_vuelos_lock = threading.Lock()
+
+
+def _cargar(clave: str, ttl: float, stale: float, fn: Callable[[], Any], vuelo: _Vuelo) -> Any:
+    """Hace la llamada (ya registrada como `vuelo`) y guarda la respuesta."""
+    try:
+        _contar("llamadas")
+        vuelo.valor = fn()
+        entrada = {"valor": vuelo.valor, "fresco_hasta": time.time() + ttl}
+        _cache().set(clave, entrada, ttl + stale)
+        return vuelo.valor
+    except BaseException as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _vuelos_lock:
+            _vuelos.pop(clave, None)
+        vuelo.listo.set()
+
+
+def _registrar_vuelo(clave: str) -> Tuple[_Vuelo, bool]:
+    with _vuelos_lock:
+        vuelo = _vuelos.get(clave)
+        if vuelo is not None:
+            return vuelo, False
+        vuelo = _vuelos[clave] = _Vuelo()
+        return vuelo, True
+
+
+def _revalidar(clave: str, ttl: float, stale: float, fn: Callable[[], Any]) -> None:
+    vuelo, nuevo = _registrar_vuelo(clave)
+    if not nuevo:
+        return  # ya hay quien la está pidiendo
+
+    def trabajo():
+        try:
+            _cargar(clave, ttl, stale, fn, vuelo)
+        except Exception as e:
+            log.warning("no se pudo revalidar %s: %s", clave, e)
+
+    threading.Thread(target=trabajo, name="cache-revalidar", daemon=True).start()
+
+
+def cacheado(endpoint: str):
+    """Decorador para funciones de services.py que sólo leen del backend."""
+    def deco(fn):
+        @wraps(fn)
+        def envoltura(*args):
+            ttl, stale = _ttl(endpoint)
+            if ttl <= 0:
+                return fn(*args)
+            clave = _clave(endpoint, args)
+            entrada = _cache().get(clave)
+            if entrada is not None:
+                if time.time() < entrada["fresco_hasta"]:
+                    _contar("aciertos")
+                else:
+                    # vencida pero dentro de la ventana stale: se sirve y se refresca aparte
+                    _contar("vencidos")
+                    _revalidar(clave, ttl, stale, lambda: fn(*args))
+                return entrada["valor"]
+            _contar("fallos")
+            vuelo, nuevo = _registrar_vuelo(clave)
+            if nuevo:
+                return _cargar(clave, ttl, stale, lambda: fn(*args), vuelo)
+            _contar("colapsados")
+            vuelo.listo.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.valor
+        return envoltura
+    return deco
+
+
+def invalida(fn):
+    """Decorador para llamadas que modifican datos en el backend."""
+    @wraps(fn)
+    def envoltura(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # aunque falle, el backend pudo haber aplicado parte de los cambios
+            invalidar()
+    return envoltura
+
+
+# --------- Versión async (vistas ASGI) ---------
+# los vuelos son futures del event loop en que se crearon: con WSGI cada
+# request async corre en su propio loop, así que se separan por loop
+_avuelos: Dict[Tuple[int, str], "asyncio.Future"] = {}
+_tareas = set()  # revalidaciones en curso (se guarda la referencia hasta que terminan)
+
+
+async def ainvalidar() -> None:
+    c = _cache()
+    try:
+        await c.aincr(_GENERACION)
+    except ValueError:
+        await c.aadd(_GENERACION, _generacion_nueva(), None)
+    _contar("invalidaciones")
+
+
+def _registrar_avuelo(clave: str) -> Tuple["asyncio.Future", bool]:
+    loop = asyncio.get_running_loop()
+    vuelo = _avuelos.get((id(loop), clave))
+    if vuelo is not None:
+        return vuelo, False
+    vuelo = _avuelos[(id(loop), clave)] = loop.create_future()
+    return vuelo, True
+
+
+async def _acargar(clave: str, ttl: float, stale: float, fn: Callable[[], Any], vuelo: "asyncio.Future") -> Any:
+    try:
+        _contar("llamadas")
+        valor = await fn()
+        await _cache().aset(clave, {"valor": valor, "fresco_hasta": time.time() + ttl}, ttl + stale)
+        vuelo.set_result(valor)
+        return valor
+    except asyncio.CancelledError:
+        vuelo.cancel()
+        raise
+    except BaseException as e:
+        vuelo.set_exception(e)
+        vuelo.exception()  # marcada como vista aunque nadie más la espere
+        raise
+    finally:
+        _avuelos.pop((id(asyncio.get_running_loop()), clave), None)
+
+
+def acacheado(endpoint: str):
+    """cacheado() para funciones async que sólo leen del backend."""
+    def deco(fn):
+        @wraps(fn)
+        async def envoltura(*args):
+            ttl, stale = _ttl(endpoint)
+            if ttl <= 0:
+                return await fn(*args)
+            c = _cache()
+            clave = f"backend:{await c.aget_or_set(_GENERACION, _generacion_nueva, None)}:{endpoint}:{':'.join(map(str, args))}"
+            entrada = await c.aget(clave)
+            if entrada is not None:
+                if time.time() < entrada["fresco_hasta"]:
+                    _contar("aciertos")
+                else:
+                    _contar("vencidos")
+                    vuelo, nuevo = _registrar_avuelo(clave)
+                    if nuevo:
+                        async def revalidar():
+                            try:
+                                await _acargar(clave, ttl, stale, lambda: fn(*args), vuelo)
+                            except Exception as e:
+                                log.warning("no se pudo revalidar %s: %s", clave, e)
+                        tarea = asyncio.ensure_future(revalidar())
+                        _tareas.add(tarea)
+                        tarea.add_done_callback(_tareas.discard)
+                return entrada["valor"]
+            _contar("fallos")
+            vuelo, nuevo = _registrar_avuelo(clave)
+            if nuevo:
+                return await _acargar(clave, ttl, stale, lambda: fn(*args), vuelo)
+            _contar("colapsados")
+            return await asyncio.shield(vuelo)
+        return envoltura
+    return deco
+
+
+def ainvalida(fn):
+    """invalida() para funciones async."""
+    @wraps(fn)
+    async def envoltura(*args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            await ainvalidar()
+    return envoltura
@@ -1,21 +1,213 @@
 # frontend/supermercado/services.py
+import logging
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterator
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache_backend import cacheado, estadisticas as estadisticas_cache, invalida
 
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:5000/api")
+# conexiones keep-alive que se mantienen abiertas hacia el backend
+BACKEND_POOL = int(os.environ.get("BACKEND_POOL", "10"))
+# reintentos (con espera exponencial) de las llamadas idempotentes
+BACKEND_REINTENTOS = int(os.environ.get("BACKEND_REINTENTOS", "3"))
+BACKEND_BACKOFF = float(os.environ.get("BACKEND_BACKOFF", "0.3"))
+CONNECT_TIMEOUT = 5
+# entidades por página al listar colecciones del backend
+BACKEND_PAGINA = int(os.environ.get("BACKEND_PAGINA", "100"))
+
+log = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Sesión compartida: reutiliza las conexiones TCP entre llamadas."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            reintentos = Retry(
+                total=BACKEND_REINTENTOS,
+                connect=BACKEND_REINTENTOS,
+                backoff_factor=BACKEND_BACKOFF,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),  # sólo idempotentes
+                raise_on_status=False,
+            )
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL, max_retries=reintentos)
+            s.mount("http://", adaptador)
+            s.mount("https://", adaptador)
+            _session = s
+        return _session
+
+
+# --------- Métricas de latencia por endpoint ---------
+class Latencias:
+    """Cuenta, errores y latencias (ms) de las últimas llamadas a un endpoint."""
+
+    MUESTRAS = 1000
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recientes = deque(maxlen=self.MUESTRAS)
+
+    def registrar(self, ms: float, ok: bool) -> None:
+        self.llamadas += 1
+        self.errores += 0 if ok else 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recientes.append(ms)
+
+    def resumen(self) -> Dict[str, Any]:
+        orden = sorted(self.recientes)
+        pct = lambda p: round(orden[min(len(orden) - 1, int(p * len(orden)))], 2) if orden else 0.0
+        return {
+            "llamadas": self.llamadas, "errores": self.errores,
+            "promedio_ms": round(self.total_ms / self.llamadas, 2) if self.llamadas else 0.0,
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": round(self.max_ms, 2),
+        }
+
+
+_latencias: Dict[str, Latencias] = {}
+_latencias_lock = threading.Lock()
+
+
+def registrar_latencia(clave: str, ms: float, ok: bool) -> None:
+    with _latencias_lock:
+        _latencias.setdefault(clave, Latencias()).registrar(ms, ok)
+    log.debug("%s -> %.1f ms (%s)", clave, ms, "ok" if ok else "error")
+
+
+def metricas() -> Dict[str, Dict[str, Any]]:
+    """Resumen de latencia de ida y vuelta al backend, por 'MÉTODO /ruta', y uso de la caché."""
+    with _latencias_lock:
+        datos = {k: v.resumen() for k, v in sorted(_latencias.items())}
+    datos["cache"] = estadisticas_cache()
+    return datos
+
 
+def _llamar(metodo: str, ruta: str, timeout: float, **kwargs) -> Any:
+    clave = f"{metodo} {ruta}"
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        r = get_session().request(metodo, f"{BACKEND_URL}{ruta}", timeout=(CONNECT_TIMEOUT, timeout), **kwargs)
+        r.raise_for_status()
+        datos = r.json()
+        ok = True
+        return datos
+    finally:
+        registrar_latencia(clave, (time.perf_counter() - t0) * 1000, ok)
+
+
+# --------- Subida de archivos en streaming ---------
+class CuerpoMultipart:
+    """
+    Cuerpo multipart/form-data con un solo archivo que se lee por bloques
+    mientras se envía. Tiene longitud conocida, así requests manda
+    Content-Length y no carga el archivo en memoria.
+    """
+
+    BLOQUE = 64 * 1024
+
+    def __init__(self, campo: str, fileobj, nombre: str = None, tipo: str = "application/xml"):
+        self.boundary = uuid.uuid4().hex
+        nombre = nombre or getattr(fileobj, "name", None) or campo
+        self._inicio = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{campo}"; filename="{os.path.basename(nombre)}"\r\n'
+            f"Content-Type: {tipo}\r\n\r\n"
+        ).encode("utf-8")
+        self._fin = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._fileobj = fileobj
+        self._tam = self._tamano(fileobj)
+
+    @staticmethod
+    def _tamano(fileobj) -> int:
+        tam = getattr(fileobj, "size", None)  # UploadedFile de Django
+        if tam is not None:
+            return int(tam)
+        actual = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        tam = fileobj.tell() - actual
+        fileobj.seek(actual)
+        return tam
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._inicio) + self._tam + len(self._fin)
+
+    def __iter__(self):
+        yield self._inicio
+        if hasattr(self._fileobj, "chunks"):
+            yield from self._fileobj.chunks(self.BLOQUE)
+        else:
+            while True:
+                bloque = self._fileobj.read(self.BLOQUE)
+                if not bloque:
+                    break
+                yield bloque
+        yield self._fin
+
+
+def _subir(ruta: str, fileobj, timeout: float) -> Any:
+    cuerpo = CuerpoMultipart("file", fileobj)
+    return _llamar("POST", ruta, timeout, data=cuerpo, headers={"Content-Type": cuerpo.content_type})
+
+
+# --------- Endpoints ---------
+@cacheado("health")
 def api_health():
-    r = requests.get(f"{BACKEND_URL}/health", timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return _llamar("GET", "/health", 30)
 
+@invalida
 def api_init():
-    r = requests.post(f"{BACKEND_URL}/init", timeout=60)
-    r.raise_for_status()
-    return r.json()
+    return _llamar("POST", "/init", 60)
 
+@invalida
 def api_config(fileobj):
-    files = {"file": fileobj}
-    r = requests.post(f"{BACKEND_URL}/config", files=files, timeout=120)
-    r.raise_for_status()
-    return r.json()
+    return _subir("/config", fileobj, 120)
+
+@invalida
+def api_consumo(fileobj):
+    return _subir("/consumo", fileobj, 300)
+
+
+# --------- Listados por páginas ---------
+COLECCIONES = ("clientes", "instancias", "consumos", "facturas")
+
+@cacheado("listado")
+def api_listado(coleccion: str, despues: int = None, limite: int = None) -> Dict[str, Any]:
+    """Una página: {"items": [...], "siguiente": cursor | None}."""
+    return _pagina(coleccion, despues, limite)
+
+def _pagina(coleccion: str, despues: int = None, limite: int = None) -> Dict[str, Any]:
+    params = {"limite": limite or BACKEND_PAGINA}
+    if despues:
+        params["despues"] = despues
+    return _llamar("GET", f"/{coleccion}", 60, params=params)
+
+def recorrer(coleccion: str, limite: int = None) -> Iterator[Dict[str, Any]]:
+    """Todas las entidades de la colección, pidiendo una página a la vez."""
+    despues = None
+    while True:
+        pagina = _pagina(coleccion, despues, limite)  # sin caché: no llenarla con toda la colección
+        yield from pagina["items"]
+        despues = pagina.get("siguiente")
+        if despues is None:
+            return
@@ -0,0 +1,142 @@
+# frontend/supermercado/services_async.py
+"""
+Versión async de services.py para las vistas async (ASGI). Mientras se
+espera al backend no se ocupa ningún hilo, y varias llamadas de una misma
+página se hacen a la vez con asyncio.gather. Con ASGI (frontend/asgi.py
+llama a compartir_pool()) el cliente httpx y su pool de conexiones duran lo
+que el proceso; con WSGI cada request async corre en un loop que se descarta
+al terminar, así que cada llamada abre y cierra su propio cliente. Comparte
+con services.py la configuración, las métricas de latencia y la caché.
+"""
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+from . import services
+from .cache_backend import acacheado, ainvalida
+from .services import CuerpoMultipart, registrar_latencia
+
+# conexiones simultáneas hacia el backend por proceso; cada subida ocupa
+# una mientras dura, por eso es bastante mayor que BACKEND_POOL
+BACKEND_POOL_ASYNC = int(os.environ.get("BACKEND_POOL_ASYNC", "100"))
+REINTENTAR_ESTADOS = (502, 503, 504)
+
+# con pool compartido, un cliente por event loop (un AsyncClient no se puede
+# usar desde otro loop); con ASGI hay uno solo
+_compartido = False
+_clientes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def compartir_pool() -> None:
+    """Para servidores ASGI: el cliente de cada loop se guarda y se reutiliza."""
+    global _compartido
+    _compartido = True
+
+
+def _nuevo_cliente() -> httpx.AsyncClient:
+    limites = httpx.Limits(max_connections=BACKEND_POOL_ASYNC,
+                           max_keepalive_connections=services.BACKEND_POOL)
+    # los reintentos del transporte son sólo de conexión: seguros para cualquier método
+    transporte = httpx.AsyncHTTPTransport(retries=services.BACKEND_REINTENTOS, limits=limites)
+    return httpx.AsyncClient(transport=transporte)
+
+
+@asynccontextmanager
+async def cliente() -> AsyncIterator[httpx.AsyncClient]:
+    """El cliente del loop si el pool es compartido; si no, uno que se cierra al salir."""
+    if not _compartido:
+        async with _nuevo_cliente() as propio:
+            yield propio
+        return
+    loop = asyncio.get_running_loop()
+    compartido = _clientes.get(loop)
+    if compartido is None:
+        compartido = _clientes[loop] = _nuevo_cliente()
+    yield compartido
+
+
+async def cerrar() -> None:
+    """Cierra el cliente del loop actual (p.ej. al apagar el servidor ASGI)."""
+    cliente = _clientes.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+async def _llamar(metodo: str, ruta: str, timeout: float, **kwargs) -> Any:
+    clave = f"{metodo} {ruta}"
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        # pool=timeout: si todas las conexiones están ocupadas se espera turno
+        tiempos = httpx.Timeout(timeout, connect=services.CONNECT_TIMEOUT, pool=timeout)
+        intento = 0
+        async with cliente() as c:
+            while True:
+                r = await c.request(metodo, f"{services.BACKEND_URL}{ruta}", timeout=tiempos, **kwargs)
+                # como en services.py: sólo los GET se repiten ante un 502/503/504
+                if metodo != "GET" or r.status_code not in REINTENTAR_ESTADOS or intento >= services.BACKEND_REINTENTOS:
+                    break
+                await asyncio.sleep(services.BACKEND_BACKOFF * 2 ** intento)
+                intento += 1
+            r.raise_for_status()
+            datos = r.json()
+        ok = True
+        return datos
+    finally:
+        registrar_latencia(clave, (time.perf_counter() - t0) * 1000, ok)
+
+
+async def _bloques(cuerpo: CuerpoMultipart) -> AsyncIterator[bytes]:
+    # los bloques salen del archivo temporal de la subida (lectura local y corta)
+    for bloque in cuerpo:
+        yield bloque
+
+
+async def _subir(ruta: str, fileobj, timeout: float) -> Any:
+    cuerpo = CuerpoMultipart("file", fileobj)
+    return await _llamar("POST", ruta, timeout, content=_bloques(cuerpo),
+                         headers={"Content-Type": cuerpo.content_type, "Content-Length": str(len(cuerpo))})
+
+
+# --------- Endpoints ---------
+@acacheado("health")
+async def api_health():
+    return await _llamar("GET", "/health", 30)
+
+@ainvalida
+async def api_init():
+    return await _llamar("POST", "/init", 60)
+
+@ainvalida
+async def api_config(fileobj):
+    return await _subir("/config", fileobj, 120)
+
+@ainvalida
+async def api_consumo(fileobj):
+    return await _subir("/consumo", fileobj, 300)
+
+@acacheado("listado")
+async def api_listado(coleccion: str, despues: int = None, limite: int = None) -> Dict[str, Any]:
+    return await _pagina(coleccion, despues, limite)
+
+async def _pagina(coleccion: str, despues: int = None, limite: int = None) -> Dict[str, Any]:
+    params = {"limite": limite or services.BACKEND_PAGINA}
+    if despues:
+        params["despues"] = despues
+    return await _llamar("GET", f"/{coleccion}", 60, params=params)
+
+async def recorrer(coleccion: str, limite: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """Todas las entidades de la colección, pidiendo una página a la vez."""
+    despues = None
+    while True:
+        pagina = await _pagina(coleccion, despues, limite)  # sin caché, como en services.py
+        for item in pagina["items"]:
+            yield item
+        despues = pagina.get("siguiente")
+        if despues is None:
+            return
@@ -1,3 +1,39 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from supermercado import cache_backend
+
+
+@override_settings(BACKEND_CACHE_TTL={"listado": (60, 0)})
+class GeneracionDesalojadaTest(SimpleTestCase):
+    """Si la caché desaloja la clave de generación no vuelven respuestas viejas."""
+
+    def setUp(self):
+        cache.clear()
+        self.llamadas = 0
+
+    def _pedir(self, _):
+        self.llamadas += 1
+        return self.llamadas
+
+    def test_sync(self):
+        pedir = cache_backend.cacheado("listado")(self._pedir)
+        self.assertEqual(pedir(1), 1)
+        cache_backend.invalidar()
+        cache.delete(cache_backend._GENERACION)  # lo que hace el culling de LocMemCache
+        self.assertEqual(pedir(1), 2)
+        self.assertEqual(pedir(1), 2)
+
+    def test_async(self):
+        async def pedir_async(x):
+            return self._pedir(x)
+        pedir = cache_backend.acacheado("listado")(pedir_async)
+
+        async def correr():
+            primera = await pedir(1)
+            await cache_backend.ainvalidar()
+            await cache.adelete(cache_backend._GENERACION)
+            return primera, await pedir(1)
+        self.assertEqual(asyncio.run(correr()), (1, 2))
@@ -8,4 +8,8 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("init/", views.init_sistema, name="init"),
     path("cargar-config/", views.cargar_config, name="cargar_config"),
+    path("cargar-consumos/", views.cargar_consumos, name="cargar_consumos"),
+    path("metricas-backend/", views.metricas_backend, name="metricas_backend"),
+    path("listado/<str:coleccion>/", views.listado, name="listado"),
+    path("listado/<str:coleccion>/exportar/", views.exportar_listado, name="exportar_listado"),
 ]
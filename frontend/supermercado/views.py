@@ -1,40 +1,104 @@
 # frontend/supermercado/views.py
+# Vistas async: con ASGI (frontend/asgi.py) esperar al backend no ocupa un
+# hilo, y las llamadas independientes de una página se hacen a la vez.
+import asyncio
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from . import services
+from . import services, services_async
+
+def _backend_ok(request, res) -> bool:
+    if isinstance(res, Exception):
+        messages.error(request, f"Backend no disponible: {res}")
+        return False
+    return res.get("status") == "ok"
 
-def home(request):
+async def home(request):
     # Pequeña verificación del backend
-    ok = False
     try:
-        h = services.api_health()
-        ok = h.get("status") == "ok"
+        res = await services_async.api_health()
     except Exception as e:
-        messages.error(request, f"Backend no disponible: {e}")
+        res = e
+    ok = _backend_ok(request, res)
     return render(request, "supermercado/operaciones.html", {"backend_ok": ok})
 
 @require_http_methods(["POST"])
-def init_sistema(request):
+async def init_sistema(request):
     try:
-        res = services.api_init()
+        res = await services_async.api_init()
         messages.success(request, f"Sistema reiniciado: {res.get('message')}")
     except Exception as e:
         messages.error(request, f"Error al inicializar: {e}")
     return redirect("supermercado:home")
 
-@require_http_methods(["GET", "POST"])
-def cargar_config(request):
+async def _cargar(request, subir, plantilla: str, destino: str, ok: str):
     contexto = {}
     if request.method == "POST":
         f = request.FILES.get("archivo_xml")
         if not f:
             messages.error(request, "Debes adjuntar un archivo XML.")
-            return redirect("supermercado:cargar_config")
+            return redirect(destino)
         try:
-            result = services.api_config(f)
-            contexto["resultado"] = result
-            messages.success(request, "Configuración procesada.")
+            contexto["resultado"] = await subir(f)
+            messages.success(request, ok)
         except Exception as e:
             messages.error(request, f"Error al procesar XML: {e}")
-    return render(request, "supermercado/cargar_config.html", contexto)
+    return render(request, plantilla, contexto)
+
+@require_http_methods(["GET", "POST"])
+async def cargar_config(request):
+    return await _cargar(request, services_async.api_config, "supermercado/cargar_config.html",
+                         "supermercado:cargar_config", "Configuración procesada.")
+
+@require_http_methods(["GET", "POST"])
+async def cargar_consumos(request):
+    return await _cargar(request, services_async.api_consumo, "supermercado/cargar_consumos.html",
+                         "supermercado:cargar_consumos", "Consumos procesados.")
+
+def metricas_backend(request):
+    """Latencia de las llamadas al backend vistas desde el frontend (JSON)."""
+    return JsonResponse(services.metricas())
+
+async def listado(request, coleccion):
+    """Una página de clientes, instancias, consumos o facturas; ?despues=<cursor> para avanzar."""
+    if coleccion not in services.COLECCIONES:
+        raise Http404("Colección desconocida")
+    contexto = {"coleccion": coleccion, "items": [], "columnas": [], "siguiente": None}
+    # estado del backend y la página a la vez
+    salud, pagina = await asyncio.gather(
+        services_async.api_health(),
+        services_async.api_listado(coleccion, request.GET.get("despues")),
+        return_exceptions=True)
+    contexto["backend_ok"] = _backend_ok(request, salud)
+    if isinstance(pagina, Exception):
+        messages.error(request, f"Error al consultar el backend: {pagina}")
+    else:
+        contexto["items"] = pagina["items"]
+        contexto["siguiente"] = pagina.get("siguiente")
+        if pagina["items"]:
+            contexto["columnas"] = [c for c in pagina["items"][0] if c != "lineas"]
+    contexto["filas"] = [[it.get(c) for c in contexto["columnas"]] for it in contexto["items"]]
+    return render(request, "supermercado/listado.html", contexto)
+
+async def exportar_listado(request, coleccion):
+    """La colección completa en JSON Lines; se piden y envían páginas de a una."""
+    if coleccion not in services.COLECCIONES:
+        raise Http404("Colección desconocida")
+
+    if isinstance(request, ASGIRequest):
+        async def lineas():
+            async for it in services_async.recorrer(coleccion):
+                yield json.dumps(it, ensure_ascii=False) + "\n"
+    else:
+        # con WSGI Django juntaría un iterador async entero en memoria: se recorre con services.py
+        def lineas():
+            for it in services.recorrer(coleccion):
+                yield json.dumps(it, ensure_ascii=False) + "\n"
+
+    respuesta = StreamingHttpResponse(lineas(), content_type="application/x-ndjson")
+    respuesta["Content-Disposition"] = f'attachment; filename="{coleccion}.jsonl"'
+    return respuesta